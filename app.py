@@ -4,12 +4,9 @@ import numpy as np
 from datetime import datetime, timedelta
 import plotly.express as px
 import plotly.graph_objects as go
-from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
 from sklearn.preprocessing import LabelEncoder
-from sklearn.metrics import mean_absolute_error, mean_squared_error, mean_absolute_percentage_error
 import warnings
 import io
-import re
 import docx
 import PyPDF2
 import json
@@ -19,6 +16,22 @@ import os
 import hashlib
 import time
 
+from forecasting import (
+    create_features, ForecastService, FORECAST_ENGINES, FORECAST_HORIZON, FORECAST_MODES, MAX_FORECAST_HORIZON,
+    QUANTILE_COLUMNS, service_level_quantity
+)
+from model_store import ModelCache, MODELS_DIR
+from forecast_store import ForecastStore
+from model_backends import MODEL_BACKENDS, resolve_backends
+from tuning import load_tuned_params, tuning_path
+from backtesting import backtest_path
+from drift_monitor import DriftMonitor, model_status, monitor_path
+from ingestion import (
+    PYARROW_AVAILABLE, TARGET_COLUMNS, MappingCache, apply_column_mapping, calculate_missing_columns,
+    clean_and_validate_data, extract_data_from_text, is_columnar, mapping_path, read_columnar, stream_csv,
+    to_parquet_bytes, use_streaming
+)
+
 # Import du module de gestion des sources de données
 try:
     from data_sources import (
@@ -177,6 +190,15 @@ def change_username(old_username, new_username):
     if os.path.exists(old_data_file):
         os.rename(old_data_file, new_data_file)
     
+    # Hyperparamètres trouvés hors ligne (tune_models.py)
+    if os.path.exists(tuning_path(old_username)):
+        os.rename(tuning_path(old_username), tuning_path(new_username))
+    
+    # Backtests (backtest_models.py), suivi des erreurs de prévision et correspondances de colonnes
+    for user_file in (backtest_path, monitor_path, mapping_path):
+        if os.path.exists(user_file(old_username)):
+            os.rename(user_file(old_username), user_file(new_username))
+    
     return True, "Nom d'utilisateur modifié avec succès"
 
 def change_admin_password(new_password):
@@ -209,6 +231,13 @@ def delete_user_account(username):
     if os.path.exists(user_data_file):
         os.remove(user_data_file)
     
+    if os.path.exists(tuning_path(username)):
+        os.remove(tuning_path(username))
+    
+    for user_file in (backtest_path, monitor_path, mapping_path):
+        if os.path.exists(user_file(username)):
+            os.remove(user_file(username))
+    
     return True, f"Compte '{username}' supprimé avec succès"
 
 def save_restaurant_data(username, restaurants_data):
@@ -322,154 +351,22 @@ def calculate_weather_impact(weather_data):
     return impact
 
 @st.cache_data
-def extract_data_from_text(text):
-    lines = text.strip().split('\n')
-    data = []
-    
-    for line in lines:
-        parts = re.split(r'[,;\t|]', line)
-        if len(parts) >= 3:
-            try:
-                date_str = parts[0].strip()
-                plat = parts[1].strip()
-                quantite = parts[2].strip()
-                
-                try:
-                    quantite = int(re.sub(r'[^\d]', '', quantite))
-                except:
-                    continue
-                
-                data.append({
-                    'Date': date_str,
-                    'Plat': plat,
-                    'Quantite': quantite
-                })
-            except:
-                continue
-    
-    return pd.DataFrame(data) if data else None
-
-def map_columns_intelligently(df):
-    """Mapping intelligent de TOUTES les colonnes possibles d'un restaurant"""
-    column_mapping = {}
-    
-    for col in df.columns:
-        col_lower = col.lower().replace('_', ' ').replace('-', ' ')
-        
-        # Colonnes obligatoires
-        if any(word in col_lower for word in ['date', 'jour', 'day']):
-            column_mapping[col] = 'Date'
-        elif any(word in col_lower for word in ['plat', 'produit', 'item', 'nom', 'dish', 'product']):
-            column_mapping[col] = 'Plat'
-        elif any(word in col_lower for word in ['quantit', 'qte', 'qty', 'quantity', 'nombre']):
-            column_mapping[col] = 'Quantite'
-        
-        # Colonnes optionnelles - Catégorie et type
-        elif any(word in col_lower for word in ['categ', 'famille', 'type plat']):
-            column_mapping[col] = 'Categorie'
-        elif any(word in col_lower for word in ['service', 'moment', 'shift', 'periode']):
-            column_mapping[col] = 'Service'
-        
-        # Colonnes financières
-        elif any(word in col_lower for word in ['prix unit', 'pu', 'prix vente', 'tarif']) and 'cout' not in col_lower:
-            column_mapping[col] = 'Prix_unitaire'
-        elif any(word in col_lower for word in ['cout unit', 'coût unit', 'cu', 'prix achat', 'cost']):
-            column_mapping[col] = 'Cout_unitaire'
-        elif any(word in col_lower for word in ['chiffre', 'ca', 'revenue', 'ventes']) and 'affaire' in col_lower:
-            column_mapping[col] = 'Chiffre_affaires'
-        elif 'marge' in col_lower and 'taux' not in col_lower:
-            column_mapping[col] = 'Marge'
-        elif 'tva' in col_lower and 'taux' not in col_lower:
-            column_mapping[col] = 'TVA'
-        
-        # Colonnes contextuelles
-        elif any(word in col_lower for word in ['zone', 'emplacement', 'salle', 'area']):
-            column_mapping[col] = 'Zone'
-        elif any(word in col_lower for word in ['table', 'numero']):
-            column_mapping[col] = 'Table'
-        elif any(word in col_lower for word in ['serveur', 'waiter']):
-            column_mapping[col] = 'Serveur'
-        elif any(word in col_lower for word in ['meteo', 'météo', 'weather', 'temps']) and 'attente' not in col_lower:
-            column_mapping[col] = 'Meteo'
-        elif any(word in col_lower for word in ['temperature', 'temp']) and 'ture' in col_lower:
-            column_mapping[col] = 'Temperature'
-        
-        # Colonnes marketing
-        elif any(word in col_lower for word in ['promotion', 'promo', 'offre']):
-            column_mapping[col] = 'Promotion'
-        elif any(word in col_lower for word in ['remise', 'discount', 'reduction']):
-            column_mapping[col] = 'Remise'
-        elif any(word in col_lower for word in ['canal', 'channel', 'mode vente']):
-            column_mapping[col] = 'Canal'
-        elif any(word in col_lower for word in ['plateforme', 'platform']):
-            column_mapping[col] = 'Plateforme'
-        
-        # Colonnes opérationnelles
-        elif any(word in col_lower for word in ['heure', 'hour', 'time']) and 'attente' not in col_lower:
-            column_mapping[col] = 'Heure'
-        elif any(word in col_lower for word in ['note', 'rating', 'avis', 'satisfaction']):
-            column_mapping[col] = 'Note_client'
-        elif any(word in col_lower for word in ['commentaire', 'comment', 'remarque']):
-            column_mapping[col] = 'Commentaire'
-        
-        # Colonnes analytiques
-        elif 'mois' in col_lower and col_lower == 'mois':
-            column_mapping[col] = 'Mois'
-        elif any(word in col_lower for word in ['annee', 'année', 'year']):
-            column_mapping[col] = 'Annee'
-        elif any(word in col_lower for word in ['trimestre', 'quarter']):
-            column_mapping[col] = 'Trimestre'
-        elif any(word in col_lower for word in ['semaine', 'week']) and 'jour' not in col_lower:
-            column_mapping[col] = 'Semaine'
-        elif any(word in col_lower for word in ['saison', 'season']):
-            column_mapping[col] = 'Saison'
-    
-    return column_mapping
-
-def calculate_missing_columns(df):
-    """Calcule automatiquement les colonnes manquantes si possible"""
-    df = df.copy()
+def load_file(uploaded_file, start=None, end=None, _mapping_cache=None, mapping_version=0):
+    """Charge un fichier importé; `start` / `end` limitent la période des fichiers Parquet / Arrow
     
-    # Création d'une colonne Date si absente mais Mois/Année disponibles
-    if 'Date' not in df.columns:
-        if 'Mois' in df.columns and 'Annee' in df.columns:
-            # Créer une date au 1er jour du mois
-            df['Date'] = pd.to_datetime(df['Annee'].astype(str) + '-' + df['Mois'].astype(str) + '-01', errors='coerce')
-        elif 'Mois' in df.columns:
-            # Si seulement Mois disponible, utiliser l'année en cours
-            current_year = datetime.now().year
-            df['Date'] = pd.to_datetime(str(current_year) + '-' + df['Mois'].astype(str) + '-01', errors='coerce')
-    
-    # Calcul du chiffre d'affaires si manquant
-    if 'Chiffre_affaires' not in df.columns and 'Prix_unitaire' in df.columns and 'Quantite' in df.columns:
-        df['Chiffre_affaires'] = df['Prix_unitaire'] * df['Quantite']
-    
-    # Calcul du coût total si manquant
-    if 'Cout_total' not in df.columns and 'Cout_unitaire' in df.columns and 'Quantite' in df.columns:
-        df['Cout_total'] = df['Cout_unitaire'] * df['Quantite']
-    
-    # Calcul de la marge unitaire si manquant
-    if 'Marge_unitaire' not in df.columns and 'Prix_unitaire' in df.columns and 'Cout_unitaire' in df.columns:
-        df['Marge_unitaire'] = df['Prix_unitaire'] - df['Cout_unitaire']
-    
-    # Calcul de la marge totale si manquant
-    if 'Marge' not in df.columns and 'Marge_unitaire' in df.columns and 'Quantite' in df.columns:
-        df['Marge'] = df['Marge_unitaire'] * df['Quantite']
-    elif 'Marge' not in df.columns and 'Chiffre_affaires' in df.columns and 'Cout_total' in df.columns:
-        df['Marge'] = df['Chiffre_affaires'] - df['Cout_total']
-    
-    # Calcul du taux de marge si manquant
-    if 'Taux_marge' not in df.columns and 'Marge_unitaire' in df.columns and 'Prix_unitaire' in df.columns:
-        df['Taux_marge'] = (df['Marge_unitaire'] / df['Prix_unitaire'] * 100).fillna(0)
-    
-    return df
-
-@st.cache_data
-def load_file(uploaded_file):
+    Les colonnes sont renommées avec les correspondances de l'utilisateur
+    (`_mapping_cache`, voir MappingCache); `mapping_version` invalide le
+    résultat en cache quand une correspondance est épinglée.
+    """
     try:
         file_extension = uploaded_file.name.split('.')[-1].lower()
         
-        if file_extension == 'csv':
+        if is_columnar(uploaded_file.name):
+            # Colonnes reconnues et période demandée seulement, déjà renommées
+            df = read_columnar(uploaded_file, uploaded_file.name, start=start, end=end, mapping_cache=_mapping_cache)
+            return calculate_missing_columns(df) if not df.empty else None
+        
+        elif file_extension == 'csv':
             try:
                 df = pd.read_csv(uploaded_file, encoding='utf-8')
             except:
@@ -504,14 +401,7 @@ def load_file(uploaded_file):
         if df is None or df.empty:
             return None
         
-        df.columns = df.columns.str.strip()
-        
-        column_mapping = map_columns_intelligently(df)
-        df = df.rename(columns=column_mapping)
-        
-        df = calculate_missing_columns(df)
-        
-        return df
+        return apply_column_mapping(df, _mapping_cache)
     
     except Exception as e:
         st.error(f"Erreur de chargement: {str(e)}")
@@ -536,90 +426,6 @@ def safe_format_date(date_value):
     except:
         return "N/A"
 
-def clean_and_validate_data(df):
-    """Nettoie et valide les données de manière robuste"""
-    df = df.copy()
-    
-    # 1. Nettoyage colonnes obligatoires
-    required_cols = ['Date', 'Plat', 'Quantite']
-    
-    # Date : Conversion ultra-robuste
-    if 'Date' in df.columns:
-        # Essayer plusieurs formats
-        df['Date'] = pd.to_datetime(df['Date'], errors='coerce', infer_datetime_format=True)
-        
-        # Supprimer lignes avec dates invalides
-        invalid_dates = df['Date'].isna().sum()
-        if invalid_dates > 0:
-            st.warning(f"⚠️ {invalid_dates} lignes avec dates invalides supprimées")
-        df = df.dropna(subset=['Date'])
-    
-    # Plat : Conversion en string et nettoyage
-    if 'Plat' in df.columns:
-        df['Plat'] = df['Plat'].astype(str).str.strip()
-        # Supprimer lignes vides
-        df = df[df['Plat'] != '']
-        df = df[df['Plat'].str.lower() != 'nan']
-    
-    # Quantité : Conversion en numérique
-    if 'Quantite' in df.columns:
-        # Remplacer virgules par points pour les décimaux
-        if df['Quantite'].dtype == 'object':
-            df['Quantite'] = df['Quantite'].astype(str).str.replace(',', '.').str.replace(' ', '')
-        
-        df['Quantite'] = pd.to_numeric(df['Quantite'], errors='coerce')
-        
-        # Supprimer quantités invalides ou négatives
-        invalid_qty = df['Quantite'].isna().sum()
-        if invalid_qty > 0:
-            st.warning(f"⚠️ {invalid_qty} lignes avec quantités invalides supprimées")
-        
-        df = df.dropna(subset=['Quantite'])
-        df = df[df['Quantite'] > 0]
-        
-        # Arrondir à l'entier
-        df['Quantite'] = df['Quantite'].round(0).astype(int)
-    
-    # 2. Nettoyage colonnes financières (si présentes)
-    financial_cols = ['Prix_unitaire', 'Cout_unitaire', 'Chiffre_affaires', 'Marge', 'Cout_total', 'Marge_unitaire']
-    
-    for col in financial_cols:
-        if col in df.columns:
-            if df[col].dtype == 'object':
-                # Nettoyer format monétaire (€, espaces, virgules)
-                df[col] = df[col].astype(str).str.replace('€', '').str.replace(' ', '').str.replace(',', '.')
-            
-            df[col] = pd.to_numeric(df[col], errors='coerce')
-            # Remplacer NaN par 0 pour colonnes financières
-            df[col] = df[col].fillna(0)
-    
-    # 3. Vérification données suffisantes
-    if len(df) == 0:
-        return None, "Aucune donnée valide après nettoyage"
-    
-    if len(df) < 7:
-        return None, f"Pas assez de données ({len(df)} lignes). Minimum 7 jours requis."
-    
-    return df, None
-
-def create_features(df):
-    df = df.copy()
-    
-    # Date déjà nettoyée par clean_and_validate_data
-    df = df.sort_values('Date')
-    
-    df['Jour_Semaine'] = df['Date'].dt.dayofweek
-    df['Jour_Mois'] = df['Date'].dt.day
-    df['Mois'] = df['Date'].dt.month
-    df['Annee'] = df['Date'].dt.year
-    df['Semaine_Annee'] = df['Date'].dt.isocalendar().week
-    df['Trimestre'] = df['Date'].dt.quarter
-    df['Est_Weekend'] = df['Jour_Semaine'].isin([5, 6]).astype(int)
-    df['Est_Debut_Mois'] = (df['Jour_Mois'] <= 5).astype(int)
-    df['Est_Fin_Mois'] = (df['Jour_Mois'] >= 25).astype(int)
-    
-    return df
-
 def calculate_waste_savings(df, predictions):
     if df is None or predictions is None or len(df) == 0 or len(predictions) == 0:
         return None
@@ -666,191 +472,76 @@ def calculate_waste_savings(df, predictions):
         'reduction_percent': (monthly_savings / monthly_waste_traditional * 100) if monthly_waste_traditional > 0 else 0
     }
 
-def safe_predict_sales_ml(df, plat, jours_prevision=7):
-    """Wrapper sécurisé pour predict_sales_ml"""
-    try:
-        return predict_sales_ml(df, plat, jours_prevision)
-    except Exception as e:
-        st.warning(f"⚠️ Impossible de prédire pour {plat}: {str(e)}")
-        return None, None, None
-
-def predict_sales_ml(df, plat, jours_prevision=7):
-    """Prédictions ML - Note: Les erreurs doivent être gérées par l'appelant"""
-    plat_data = df[df['Plat'] == plat].copy()
-    
-    if len(plat_data) < 14:
-        return None, None, None
-    
-    plat_data = plat_data.sort_values('Date')
-    plat_data = create_features(plat_data)
-
-    agg_dict = {
-        'Quantite': 'sum',
-        'Jour_Semaine': 'first',
-        'Jour_Mois': 'first',
-        'Mois': 'first',
-        'Annee': 'first',
-        'Semaine_Annee': 'first',
-        'Trimestre': 'first',
-        'Est_Weekend': 'first',
-        'Est_Debut_Mois': 'first',
-        'Est_Fin_Mois': 'first'
-    }
-    
-    optional_features = []
-    
-    if 'Prix_unitaire' in plat_data.columns:
-        agg_dict['Prix_unitaire'] = 'mean'
-        optional_features.append('Prix_unitaire')
-    
-    if 'Service' in plat_data.columns:
-        plat_data['Service_encoded'] = plat_data['Service'].astype('category').cat.codes
-        agg_dict['Service_encoded'] = 'first'
-        optional_features.append('Service_encoded')
-    
-    if 'Zone' in plat_data.columns:
-        plat_data['Zone_encoded'] = plat_data['Zone'].astype('category').cat.codes
-        agg_dict['Zone_encoded'] = 'first'
-        optional_features.append('Zone_encoded')
-    
-    if 'Meteo' in plat_data.columns:
-        plat_data['Meteo_encoded'] = plat_data['Meteo'].astype('category').cat.codes
-        agg_dict['Meteo_encoded'] = 'first'
-        optional_features.append('Meteo_encoded')
-    
-    if 'Promotion' in plat_data.columns:
-        plat_data['Promotion_encoded'] = (plat_data['Promotion'].astype(str).str.lower() == 'oui').astype(int)
-        agg_dict['Promotion_encoded'] = 'max'
-        optional_features.append('Promotion_encoded')
-    
-    if 'Canal' in plat_data.columns:
-        plat_data['Canal_encoded'] = plat_data['Canal'].astype('category').cat.codes
-        agg_dict['Canal_encoded'] = 'first'
-        optional_features.append('Canal_encoded')
-    
-    plat_data_agg = plat_data.groupby('Date').agg(agg_dict).reset_index()
-    
-    for lag in [1, 3, 7, 14]:
-        plat_data_agg[f'Lag_{lag}'] = plat_data_agg['Quantite'].shift(lag)
-    
-    plat_data_agg['Moyenne_Mobile_7'] = plat_data_agg['Quantite'].rolling(window=7, min_periods=1).mean()
-    plat_data_agg['Moyenne_Mobile_14'] = plat_data_agg['Quantite'].rolling(window=14, min_periods=1).mean()
-    plat_data_agg['Ecart_Type_7'] = plat_data_agg['Quantite'].rolling(window=7, min_periods=1).std()
-    plat_data_agg['Tendance'] = range(len(plat_data_agg))
-    
-    plat_data_agg = plat_data_agg.dropna()
-    
-    if len(plat_data_agg) < 7:
-        return None, None, None
-    
-    train_size = int(len(plat_data_agg) * 0.8)
-    train_data = plat_data_agg[:train_size]
-    test_data = plat_data_agg[train_size:]
-    
-    features = ['Jour_Semaine', 'Jour_Mois', 'Mois', 'Semaine_Annee', 'Trimestre',
-                'Est_Weekend', 'Est_Debut_Mois', 'Est_Fin_Mois', 'Tendance',
-                'Lag_1', 'Lag_3', 'Lag_7', 'Lag_14',
-                'Moyenne_Mobile_7', 'Moyenne_Mobile_14', 'Ecart_Type_7'] + optional_features
-    
-    X_train = train_data[features]
-    y_train = train_data['Quantite']
-    
-    models = {
-        'RandomForest': RandomForestRegressor(n_estimators=200, max_depth=10, random_state=42, n_jobs=-1),
-        'GradientBoosting': GradientBoostingRegressor(n_estimators=150, max_depth=5, learning_rate=0.1, random_state=42)
-    }
-    
-    best_model = None
-    best_score = float('inf')
-    best_name = None
-    model_metrics = {}
-    
-    for name, model in models.items():
-        model.fit(X_train, y_train)
-        
-        if len(test_data) > 0:
-            X_test = test_data[features]
-            y_test = test_data['Quantite']
-            predictions = model.predict(X_test)
-            
-            mae = mean_absolute_error(y_test, predictions)
-            rmse = np.sqrt(mean_squared_error(y_test, predictions))
-            mape = mean_absolute_percentage_error(y_test, predictions) * 100
-            
-            model_metrics[name] = {
-                'MAE': mae,
-                'RMSE': rmse,
-                'MAPE': mape
-            }
-            
-            if mae < best_score:
-                best_score = mae
-                best_model = model
-                best_name = name
-        else:
-            best_model = model
-            best_name = name
-    
-    last_row = plat_data_agg.iloc[-1]
-    predictions = []
-    derniere_date = last_row['Date']
-    
-    current_data = plat_data_agg.copy()
-    
-    for i in range(1, jours_prevision + 1):
-        future_date = derniere_date + timedelta(days=i)
-        
-        new_row = {
-            'Date': future_date,
-            'Jour_Semaine': future_date.dayofweek,
-            'Jour_Mois': future_date.day,
-            'Mois': future_date.month,
-            'Annee': future_date.year,
-            'Semaine_Annee': future_date.isocalendar()[1],
-            'Trimestre': (future_date.month - 1) // 3 + 1,
-            'Est_Weekend': int(future_date.dayofweek in [5, 6]),
-            'Est_Debut_Mois': int(future_date.day <= 5),
-            'Est_Fin_Mois': int(future_date.day >= 25),
-            'Tendance': last_row['Tendance'] + i
-        }
-        
-        for feat in optional_features:
-            if feat in last_row:
-                new_row[feat] = last_row[feat]
-        
-        if len(current_data) >= 14:
-            new_row['Lag_1'] = current_data.iloc[-1]['Quantite']
-            new_row['Lag_3'] = current_data.iloc[-3]['Quantite']
-            new_row['Lag_7'] = current_data.iloc[-7]['Quantite']
-            new_row['Lag_14'] = current_data.iloc[-14]['Quantite']
-            new_row['Moyenne_Mobile_7'] = current_data.tail(7)['Quantite'].mean()
-            new_row['Moyenne_Mobile_14'] = current_data.tail(14)['Quantite'].mean()
-            new_row['Ecart_Type_7'] = current_data.tail(7)['Quantite'].std()
-        else:
-            new_row['Lag_1'] = current_data.iloc[-1]['Quantite'] if len(current_data) >= 1 else last_row['Quantite']
-            new_row['Lag_3'] = current_data.iloc[-3]['Quantite'] if len(current_data) >= 3 else last_row['Quantite']
-            new_row['Lag_7'] = current_data.iloc[-7]['Quantite'] if len(current_data) >= 7 else last_row['Quantite']
-            new_row['Lag_14'] = current_data.iloc[-14]['Quantite'] if len(current_data) >= 14 else last_row['Quantite']
-            new_row['Moyenne_Mobile_7'] = current_data.tail(7)['Quantite'].mean() if len(current_data) >= 7 else last_row['Quantite']
-            new_row['Moyenne_Mobile_14'] = current_data.tail(14)['Quantite'].mean() if len(current_data) >= 14 else last_row['Quantite']
-            new_row['Ecart_Type_7'] = current_data.tail(7)['Quantite'].std() if len(current_data) >= 7 else 0
-        
-        X_pred = pd.DataFrame([new_row])[features]
-        pred_quantite = best_model.predict(X_pred)[0]
-        pred_quantite = max(0, pred_quantite)
-        
-        predictions.append({
-            'Date': future_date,
-            'Jour': future_date.strftime('%A'),
-            'Quantite_Prevue': int(round(pred_quantite))
-        })
-        
-        new_row['Quantite'] = pred_quantite
-        current_data = pd.concat([current_data, pd.DataFrame([new_row])], ignore_index=True)
-    
-    pred_df = pd.DataFrame(predictions)
+@st.cache_resource
+def get_model_cache():
+    """Cache disque des modèles ML partagé entre les sessions"""
+    return ModelCache(MODELS_DIR)
+
+@st.cache_resource
+def get_forecast_store():
+    """Prévisions précalculées par le traitement par lots (batch_forecast.py)"""
+    return ForecastStore()
+
+def get_restaurant_key():
+    """Identifiant unique du restaurant courant (utilisateur + restaurant)"""
+    return f"{st.session_state.username}/{st.session_state.current_restaurant}"
+
+def get_drift_monitor():
+    """Suivi des erreurs de prévision de l'utilisateur connecté (voir drift_monitor.py)"""
+    if st.session_state.get('drift_monitor_user') != st.session_state.username:
+        st.session_state.drift_monitor = DriftMonitor(st.session_state.username)
+        st.session_state.drift_monitor_user = st.session_state.username
+    return st.session_state.drift_monitor
+
+def get_mapping_cache():
+    """Correspondances de colonnes de l'utilisateur connecté (voir ingestion.MappingCache)"""
+    if st.session_state.get('mapping_cache_user') != st.session_state.username:
+        st.session_state.mapping_cache = MappingCache(st.session_state.username)
+        st.session_state.mapping_cache_user = st.session_state.username
+    return st.session_state.mapping_cache
+
+def report_forecast_error(plat, error):
+    """Affiche l'erreur de prédiction d'un plat sans interrompre la page"""
+    st.warning(f"⚠️ Impossible de prédire pour {plat}: {str(error)}")
+
+def get_forecast_service(df):
+    """Service de prévisions partagé par tous les onglets du rerun courant"""
+    # Horizon le plus long demandé par les onglets (Liste de Préparation,
+    # Économies & ROI, Stocks & Commandes): chaque plat n'est prévu qu'une fois.
+    # Le traitement par lots précalcule MAX_FORECAST_HORIZON jours, qui couvre tout horizon demandé
+    horizon = max(FORECAST_HORIZON, st.session_state.get('analysis_days', FORECAST_HORIZON))
+    return ForecastService(
+        df,
+        restaurant=get_restaurant_key(),
+        cache=get_model_cache(),
+        horizon=horizon,
+        on_error=report_forecast_error,
+        engine=st.session_state.restaurants[st.session_state.current_restaurant].get('forecast_engine', 'per_dish'),
+        mode=st.session_state.restaurants[st.session_state.current_restaurant].get('forecast_mode', 'recursive'),
+        backends=st.session_state.restaurants[st.session_state.current_restaurant].get('model_backends'),
+        store=get_forecast_store(),
+        tuned_params=load_tuned_params(st.session_state.username, st.session_state.current_restaurant),
+        monitor=get_drift_monitor()
+    )
+
+def prefetch_forecasts(forecast_service):
+    """Prévoit tous les plats sur l'horizon du service, avec une barre de progression
+
+    Les entraînements nécessaires sont répartis sur le pool de processus;
+    la barre avance à chaque plat terminé puis disparaît.
+    """
+    progress_placeholder = st.empty()
+
+    def on_progress(done, total, plat):
+        label = f"🤖 Prévisions: {done}/{total}" + (f" — {plat}" if plat is not None else "")
+        progress_placeholder.progress(done / total, text=label)
+
+    forecast_service.prefetch(progress=on_progress)
+    progress_placeholder.empty()
     
-    return pred_df, model_metrics, best_name
+    if forecast_service.precomputed_at is not None:
+        generated_at = datetime.fromtimestamp(forecast_service.precomputed_at).strftime('%d/%m/%Y %H:%M')
+        st.sidebar.caption(f"🌙 Prévisions précalculées le {generated_at}")
 
 def extract_hour_from_data(df):
     """Extrait l'heure des données si disponible"""
@@ -871,13 +562,16 @@ def extract_hour_from_data(df):
     
     return df
 
-def get_hourly_pattern(df, plat):
-    """Analyse les patterns de vente horaires pour un plat"""
+def get_hourly_pattern(df, plat, panel=None):
+    """Analyse les patterns de vente horaires pour un plat
+    
+    Avec `panel` (DishPanel), seules les ventes du plat sont lues.
+    """
     if 'Heure' not in df.columns:
         return None
     
-    df = extract_hour_from_data(df)
-    plat_data = df[df['Plat'] == plat].copy()
+    plat_data = panel.rows(plat) if panel is not None else df[df['Plat'] == plat]
+    plat_data = extract_hour_from_data(plat_data)
     
     if len(plat_data) == 0 or 'Heure_parsed' not in plat_data.columns:
         return None
@@ -896,15 +590,15 @@ def get_hourly_pattern(df, plat):
     
     return hourly_stats
 
-def predict_intraday_sales(df, plat, current_hour=None):
+def predict_intraday_sales(df, plat, current_hour=None, panel=None):
     """Prédictions heure par heure pour aujourd'hui"""
     if current_hour is None:
         current_hour = datetime.now().hour
     
-    hourly_pattern = get_hourly_pattern(df, plat)
+    hourly_pattern = get_hourly_pattern(df, plat, panel=panel)
+    plat_data = panel.rows(plat).copy() if panel is not None else df[df['Plat'] == plat].copy()
     
     if hourly_pattern is None:
-        plat_data = df[df['Plat'] == plat].copy()
         if len(plat_data) == 0:
             return None
         
@@ -930,9 +624,7 @@ def predict_intraday_sales(df, plat, current_hour=None):
         
         return pd.DataFrame(predictions) if predictions else None
     
-    plat_data = df[df['Plat'] == plat].copy()
     plat_data['Date'] = pd.to_datetime(plat_data['Date'])
-    plat_data = create_features(plat_data)
     
     today = datetime.now()
     today_sales = plat_data[plat_data['Date'].dt.date == today.date()]
@@ -1422,6 +1114,36 @@ if st.session_state.is_admin:
                     st.metric("📋 Plan", plan)
                 with col3:
                     st.metric("💰 Facture Mensuelle", f"{facture} €")
+                
+                # Modèles à réentraîner: dérive des prévisions ou âge maximal dépassé
+                st.markdown("#### 🩺 État des Modèles")
+                monitor = DriftMonitor(selected_user)
+                statuses = [
+                    model_status(monitor, get_model_cache(), f"{selected_user}/{resto_name}").assign(Restaurant=resto_name)
+                    for resto_name in user_restaurants
+                ]
+                df_models = pd.concat(statuses, ignore_index=True)
+                
+                if len(df_models) > 0:
+                    stale = ~df_models['Statut'].str.startswith('✅')
+                    col1, col2 = st.columns(2)
+                    with col1:
+                        st.metric("🤖 Modèles suivis", len(df_models))
+                    with col2:
+                        st.metric("⚠️ À réentraîner", int(stale.sum()))
+                    
+                    st.dataframe(
+                        df_models[['Restaurant', 'Plat', 'Statut', 'Modele', 'Entraine_Jusqu_Au', 'Age_Jours',
+                                   'MAE_Validation', 'MAE', 'Biais']].rename(columns={
+                            'Modele': 'Modèle', 'Entraine_Jusqu_Au': 'Entraîné jusqu\'au', 'Age_Jours': 'Âge (jours)',
+                            'MAE_Validation': 'MAE validation', 'MAE': 'MAE observée'
+                        }),
+                        use_container_width=True, hide_index=True
+                    )
+                    st.caption("Un modèle n'est réentraîné que si ses prévisions dérivent par rapport aux ventes réelles "
+                               "ou s'il a dépassé son âge maximal.")
+                else:
+                    st.info("Aucun modèle entraîné pour cet utilisateur")
             else:
                 st.info("Aucun restaurant pour cet utilisateur")
     
@@ -1662,9 +1384,22 @@ if DATA_SOURCES_AVAILABLE and st.session_state.current_restaurant:
                     sync_manager = AutoSyncManager(dsm)
                     synced_df = sync_manager.sync_data()
                     
-                    if synced_df is not None:
+                    if synced_df is not None and st.session_state.current_restaurant:
+                        # Même correspondance des colonnes (épinglée le cas échéant) et nettoyage qu'à l'import
+                        mapping_cache = get_mapping_cache()
+                        synced_clean, error_msg = clean_and_validate_data(
+                            apply_column_mapping(synced_df, mapping_cache), warn=st.warning
+                        )
+                        mapping_cache.save()
+                        
+                        if synced_clean is None:
+                            st.error(f"❌ {error_msg}")
+                        else:
+                            st.session_state.restaurants[st.session_state.current_restaurant]['data'] = synced_clean
+                            save_restaurant_data(st.session_state.username, st.session_state.restaurants)
+                            st.success(f"✅ Synchronisation réussie - {len(synced_clean)} lignes")
+                    elif synced_df is not None:
                         st.success(f"✅ Synchronisation réussie - {len(synced_df)} lignes")
-                        # TODO: Intégrer synced_df dans le flux principal
                     else:
                         st.error("❌ Échec de la synchronisation")
             else:
@@ -1759,6 +1494,57 @@ if st.session_state.restaurants:
     st.sidebar.info(f"📍 {current_resto_data['city']}")
     st.sidebar.info(f"💰 {current_resto_data['cost_per_portion']}€/portion")
     
+    with st.sidebar.expander("⚙️ Paramètres de Prévision"):
+        engine_keys = list(FORECAST_ENGINES.keys())
+        current_engine = current_resto_data.get('forecast_engine', 'per_dish')
+        
+        selected_engine = st.selectbox(
+            "Moteur de prévision",
+            options=engine_keys,
+            format_func=lambda x: FORECAST_ENGINES[x],
+            index=engine_keys.index(current_engine) if current_engine in engine_keys else 0,
+            key="forecast_engine_selector",
+            help="Le modèle global est entraîné une seule fois pour tous les plats du restaurant et prévoit aussi les plats peu vendus. "
+                 "Le moteur par paliers n'entraîne les modèles ML que pour les plats mal prévus par des modèles simples. "
+                 "Le moteur hiérarchique entraîne un modèle par catégorie et le répartit entre ses plats"
+        )
+        
+        if selected_engine != current_engine:
+            current_resto_data['forecast_engine'] = selected_engine
+            save_restaurant_data(st.session_state.username, st.session_state.restaurants)
+        
+        mode_keys = list(FORECAST_MODES.keys())
+        current_mode = current_resto_data.get('forecast_mode', 'recursive')
+        
+        selected_mode = st.selectbox(
+            "Mode de prévision",
+            options=mode_keys,
+            format_func=lambda x: FORECAST_MODES[x],
+            index=mode_keys.index(current_mode) if current_mode in mode_keys else 0,
+            key="forecast_mode_selector",
+            help="Le mode direct prévoit tout l'horizon en une seule fois, sans réinjecter les prévisions (modèle par plat uniquement)"
+        )
+        
+        if selected_mode != current_mode:
+            current_resto_data['forecast_mode'] = selected_mode
+            save_restaurant_data(st.session_state.username, st.session_state.restaurants)
+        
+        current_backends = resolve_backends(current_resto_data.get('model_backends'))
+        
+        selected_backends = st.multiselect(
+            "Modèles en compétition",
+            options=list(MODEL_BACKENDS.keys()),
+            default=current_backends,
+            format_func=lambda x: MODEL_BACKENDS[x].label,
+            key="model_backends_selector",
+            help="Le modèle le plus précis sur les derniers jours est retenu pour chaque plat. "
+                 "Comparez-les avec: python benchmark_backends.py"
+        )
+        
+        if selected_backends and resolve_backends(selected_backends) != current_backends:
+            current_resto_data['model_backends'] = selected_backends
+            save_restaurant_data(st.session_state.username, st.session_state.restaurants)
+    
     if st.sidebar.button("🗑️ Supprimer ce restaurant"):
         del st.session_state.restaurants[selected_resto]
         if len(st.session_state.restaurants) > 0:
@@ -1780,16 +1566,55 @@ st.sidebar.header("📊 Données de Ventes")
 
 uploaded_file = st.sidebar.file_uploader(
     "Importez vos données", 
-    type=['csv', 'xlsx', 'xls', 'json', 'txt', 'docx', 'pdf'],
-    help="Formats acceptés: CSV, Excel, JSON, TXT, Word, PDF"
+    type=['csv', 'xlsx', 'xls', 'json', 'txt', 'docx', 'pdf'] + (['parquet', 'arrow', 'feather'] if PYARROW_AVAILABLE else []),
+    help="Formats acceptés: CSV, Excel, JSON, TXT, Word, PDF" + (", Parquet, Arrow" if PYARROW_AVAILABLE else "")
 )
 
-if uploaded_file is not None:
+periode_import = (None, None)
+if uploaded_file is not None and is_columnar(uploaded_file.name):
+    if st.sidebar.checkbox("Limiter la période importée", help="Seules les ventes de la période sont lues du fichier"):
+        periode = st.sidebar.date_input(
+            "Période",
+            (datetime.now().date() - timedelta(days=365), datetime.now().date())
+        )
+        if len(periode) == 2:
+            periode_import = tuple(periode)
+
+mapping_cache = get_mapping_cache()
+
+if uploaded_file is not None and use_streaming(uploaded_file.name, uploaded_file.size):
+    # Gros export CSV: lu par blocs et agrégé par jour et par plat, une seule fois par fichier
+    if st.session_state.get('streamed_upload') != uploaded_file.file_id:
+        progress_bar = st.sidebar.progress(0.0, text="Lecture par blocs...")
+        df_cleaned, error_msg, stats = stream_csv(
+            uploaded_file, warn=st.warning, mapping_cache=mapping_cache,
+            progress=lambda rows: progress_bar.progress(min(1.0, uploaded_file.tell() / uploaded_file.size),
+                                                        text=f"{rows:,} lignes lues".replace(',', ' '))
+        )
+        progress_bar.empty()
+        mapping_cache.save()
+        
+        if df_cleaned is None:
+            st.error(f"❌ {error_msg}")
+            st.stop()
+        
+        removed = stats['rows'] - stats['kept']
+        if removed > 0:
+            st.info(f"ℹ️ {removed} lignes nettoyées sur {stats['rows']} ({(removed/stats['rows']*100):.1f}%)")
+        st.info(f"ℹ️ {stats['kept']} lignes agrégées en {len(df_cleaned)} ventes journalières ({stats['chunks']} blocs)")
+        
+        st.session_state.restaurants[st.session_state.current_restaurant]['data'] = df_cleaned
+        save_restaurant_data(st.session_state.username, st.session_state.restaurants)
+        st.session_state.streamed_upload = uploaded_file.file_id
+
+elif uploaded_file is not None:
     with st.spinner("Chargement et analyse des données..."):
-        df = load_file(uploaded_file)
+        df = load_file(uploaded_file, *periode_import, _mapping_cache=mapping_cache,
+                       mapping_version=mapping_cache.version)
+        mapping_cache.save()
         if df is not None:
             # Nettoyage et validation robuste
-            df_cleaned, error_msg = clean_and_validate_data(df)
+            df_cleaned, error_msg = clean_and_validate_data(df, warn=st.warning)
             
             if df_cleaned is None:
                 st.error(f"❌ {error_msg}")
@@ -1803,6 +1628,42 @@ if uploaded_file is not None:
                 st.session_state.restaurants[st.session_state.current_restaurant]['data'] = df_cleaned
                 save_restaurant_data(st.session_state.username, st.session_state.restaurants)
 
+if mapping_cache.last_columns:
+    # Correspondance du dernier en-tête importé, modifiable et épinglée pour les prochains imports
+    with st.sidebar.expander("🧭 Correspondance des colonnes"):
+        header = mapping_cache.last_columns
+        current_mapping = mapping_cache.mapping(header)
+        options = ["— Ignorée —"] + TARGET_COLUMNS
+        if mapping_cache.is_pinned(header):
+            st.caption("📌 Correspondance épinglée pour ce format d'export")
+        
+        choix = {}
+        for i, col in enumerate(header):
+            target = current_mapping.get(col)
+            choix[col] = st.selectbox(
+                col, options,
+                index=options.index(target) if target in options else 0,
+                key=f"mapping_{i}_{col}"
+            )
+        
+        col_pin, col_unpin = st.columns(2)
+        with col_pin:
+            if st.button("📌 Épingler", key="pin_mapping"):
+                try:
+                    mapping_cache.pin(header, {col: target for col, target in choix.items() if target != options[0]})
+                except ValueError as e:
+                    st.error(f"❌ {e}")
+                else:
+                    mapping_cache.save()
+                    st.session_state.pop('streamed_upload', None)
+                    st.rerun()
+        with col_unpin:
+            if mapping_cache.is_pinned(header) and st.button("↩️ Règles auto", key="unpin_mapping"):
+                mapping_cache.unpin(header)
+                mapping_cache.save()
+                st.session_state.pop('streamed_upload', None)
+                st.rerun()
+
 current_resto_data = st.session_state.restaurants[st.session_state.current_restaurant]
 df = current_resto_data.get('data')
 
@@ -1813,6 +1674,7 @@ if df is not None:
         st.info(f"💡 Les colonnes nécessaires sont: {', '.join(required_columns)}")
     else:
         df = create_features(df)
+        forecast_service = get_forecast_service(df)
         
         optional_columns = [col for col in df.columns if col not in required_columns and col not in ['Jour_Semaine', 'Jour_Mois', 'Mois', 'Annee', 'Semaine_Annee', 'Trimestre', 'Est_Weekend', 'Est_Debut_Mois', 'Est_Fin_Mois']]
         
@@ -1834,6 +1696,14 @@ if df is not None:
                 st.write("**Colonnes optionnelles :**")
                 st.write(", ".join(optional_columns))
         
+        if PYARROW_AVAILABLE:
+            st.sidebar.download_button(
+                label="⬇️ Données nettoyées (Parquet)",
+                data=to_parquet_bytes(current_resto_data['data']),
+                file_name=f"ventes_{datetime.now().strftime('%Y%m%d')}.parquet",
+                mime="application/vnd.apache.parquet"
+            )
+        
         col1, col2, col3, col4 = st.columns(4)
         
         with col1:
@@ -1938,7 +1808,8 @@ if df is not None:
                     auto_refresh = st.checkbox("🔄 Rafraîchir auto (5min)", value=False)
                 
                 if plat_live:
-                    intraday_pred = predict_intraday_sales(df, plat_live, current_time.hour)
+                    intraday_pred = predict_intraday_sales(df, plat_live, current_time.hour,
+                                                           panel=forecast_service.panel)
                     
                     if intraday_pred is not None and len(intraday_pred) > 0:
                         intraday_pred['Quantite_ajustee'] = (
@@ -2046,7 +1917,7 @@ if df is not None:
                     auto_refresh = st.checkbox("🔄 Rafraîchir auto (5min)", value=False)
                 
                 if plat_overview:
-                    plat_data = df[df['Plat'] == plat_overview].copy()
+                    plat_data = forecast_service.panel.rows(plat_overview).copy()
                     plat_data['Date'] = pd.to_datetime(plat_data['Date'])
                     
                     # Vérification données suffisantes
@@ -2171,15 +2042,18 @@ if df is not None:
             
             if plat_selectionne:
                 with st.spinner(f"Entraînement des modèles ML pour {plat_selectionne}..."):
-                    try:
-                        predictions, metrics, best_model_name = predict_sales_ml(df, plat_selectionne, jours_prevision)
-                    except Exception as e:
-                        st.error(f"❌ Erreur lors de la prédiction : {str(e)}")
-                        predictions, metrics, best_model_name = None, None, None
+                    predictions, metrics, best_model_name = forecast_service.get(plat_selectionne, jours_prevision)
                 
                 if predictions is not None:
                     st.success(f"✅ Meilleur modèle sélectionné: **{best_model_name}**")
                     
+                    tier_info = forecast_service.tier_report.get(plat_selectionne)
+                    if tier_info and tier_info['tier'] == 'hierarchical':
+                        st.caption(f"🧩 Part de {tier_info['share']:.0%} de la prévision « {tier_info['group']} »")
+                    elif tier_info:
+                        tier_label = "modèle de référence" if tier_info['tier'] == 'baseline' else "ensemble ML"
+                        st.caption(f"🪜 Palier utilisé: {tier_label} — calculé en {tier_info['duration']:.2f}s")
+                    
                     if metrics:
                         col1, col2, col3 = st.columns(3)
                         best_metrics = metrics[best_model_name]
@@ -2192,13 +2066,13 @@ if df is not None:
                     
                     st.markdown(f"### Prévisions pour **{plat_selectionne}**")
                     
-                    historique = df[df['Plat'] == plat_selectionne].copy()
+                    historique = forecast_service.panel.rows(plat_selectionne)
                     historique = historique.groupby('Date')['Quantite'].sum().reset_index()
                     historique['Type'] = 'Historique'
                     
-                    predictions_plot = predictions.copy()
-                    predictions_plot.columns = ['Date', 'Jour', 'Quantite']
+                    predictions_plot = predictions.rename(columns={'Quantite_Prevue': 'Quantite'})
                     predictions_plot['Type'] = 'Prévision ML'
+                    has_bands = all(col in predictions.columns for col in QUANTILE_COLUMNS)
                     
                     combined = pd.concat([
                         historique[['Date', 'Quantite', 'Type']], 
@@ -2214,20 +2088,55 @@ if df is not None:
                         title=f"Historique et Prévisions ML - {plat_selectionne}"
                     )
                     fig_pred.update_traces(line=dict(width=3))
+                    if has_bands:
+                        fig_pred.add_trace(go.Scatter(
+                            x=pd.concat([predictions['Date'], predictions['Date'][::-1]]),
+                            y=pd.concat([predictions['P90'], predictions['P10'][::-1]]),
+                            fill='toself', fillcolor='rgba(239, 85, 59, 0.15)', line=dict(width=0),
+                            hoverinfo='skip', name='Intervalle P10-P90'
+                        ))
                     st.plotly_chart(fig_pred, use_container_width=True)
                     
                     st.markdown("#### 📊 Détails des Prévisions")
                     predictions_display = predictions.copy()
                     predictions_display['Date'] = predictions_display['Date'].dt.strftime('%d/%m/%Y')
                     
-                    stats_prev = predictions['Quantite_Prevue']
-                    predictions_display['Intervalle Min'] = (stats_prev * 0.9).astype(int)
-                    predictions_display['Intervalle Max'] = (stats_prev * 1.1).astype(int)
+                    if has_bands:
+                        # Intervalle à 80%: 1 chance sur 10 de vendre moins que P10 ou plus que P90
+                        predictions_display = predictions_display.drop(columns=QUANTILE_COLUMNS)
+                        predictions_display['Intervalle Min'] = predictions['P10']
+                        predictions_display['Intervalle Max'] = predictions['P90']
+                    else:
+                        stats_prev = predictions['Quantite_Prevue']
+                        predictions_display['Intervalle Min'] = (stats_prev * 0.9).astype(int)
+                        predictions_display['Intervalle Max'] = (stats_prev * 1.1).astype(int)
                     
                     st.dataframe(predictions_display, use_container_width=True, hide_index=True)
                     
+                    if PYARROW_AVAILABLE:
+                        st.download_button(
+                            label="⬇️ Télécharger les prévisions (Parquet)",
+                            data=to_parquet_bytes(predictions.assign(Plat=plat_selectionne)),
+                            file_name=f"previsions_{plat_selectionne}_{datetime.now().strftime('%Y%m%d')}.parquet",
+                            mime="application/vnd.apache.parquet"
+                        )
+                    
                 else:
                     st.warning("⚠️ Pas assez de données pour ce plat (minimum 14 jours requis)")
+            
+            if forecast_service.tier_report:
+                with st.expander("🪜 Palier utilisé par plat"):
+                    tier_rows = [
+                        {
+                            'Plat': plat,
+                            'Palier': {'baseline': "Référence", 'hierarchical': f"Part de « {info.get('group')} »"}.get(info['tier'], "ML"),
+                            'Modèle': info['model'] or "-",
+                            'MAE': round(info['MAE'], 2) if info['MAE'] is not None else None,
+                            'Durée (s)': round(info['duration'], 3) if info['duration'] is not None else None
+                        }
+                        for plat, info in sorted(forecast_service.tier_report.items())
+                    ]
+                    st.dataframe(pd.DataFrame(tier_rows), use_container_width=True, hide_index=True)
         
         with tab3:
             st.subheader("📋 Liste de Préparation Recommandée")
@@ -2237,6 +2146,14 @@ if df is not None:
                 datetime.now() + timedelta(days=1)
             )
             
+            niveau_service = st.select_slider(
+                "Niveau de service (probabilité de couvrir la demande)",
+                options=[50, 60, 70, 80, 90],
+                value=80,
+                format_func=lambda v: f"{v}%",
+                help="Quantité préparée au quantile correspondant de la prévision (P50 à P90)"
+            )
+            
             st.markdown(f"### 🍽️ Recommandations pour le {date_prep.strftime('%d/%m/%Y')}")
             
             city = current_resto_data['city']
@@ -2255,27 +2172,26 @@ if df is not None:
                         break
             
             with st.spinner("Calcul des recommandations..."):
-                liste_prep = []
-                for plat in df['Plat'].unique():
-                    pred, _, _ = safe_predict_sales_ml(df, plat, 30)
-                    if pred is not None:
-                        pred_date = pred[pred['Date'].dt.date == date_prep]
-                        if not pred_date.empty:
-                            quantite = pred_date.iloc[0]['Quantite_Prevue']
-                            
-                            if weather_forecast:
-                                for w in weather_forecast:
-                                    if w['date'] == date_prep.strftime('%Y-%m-%d'):
-                                        weather_impact = calculate_weather_impact(w)
-                                        quantite = int(quantite * weather_impact)
-                                        break
-                            
-                            liste_prep.append({
-                                'Plat': plat,
-                                'Quantité à Préparer': quantite,
-                                'Marge Sécurité (-10%)': int(quantite * 0.9),
-                                'Marge Sécurité (+10%)': int(quantite * 1.1)
-                            })
+                # Seule la date choisie est prévue (et seulement jusqu'à elle)
+                prep = forecast_service.forecast([date_prep])
+                
+                weather_impact = 1.0
+                if weather_forecast:
+                    for w in weather_forecast:
+                        if w['date'] == date_prep.strftime('%Y-%m-%d'):
+                            weather_impact = calculate_weather_impact(w)
+                            break
+                
+                # Quantité au niveau de service choisi; ±10% pour les plats sans bandes
+                quantites = (service_level_quantity(prep, niveau_service / 100) * weather_impact).astype(int)
+                bas = (prep['P10'] * weather_impact).fillna(prep['Quantite_Prevue'] * weather_impact * 0.9)
+                haut = (prep['P90'] * weather_impact).fillna(prep['Quantite_Prevue'] * weather_impact * 1.1)
+                liste_prep = pd.DataFrame({
+                    'Plat': prep['Plat'],
+                    'Quantité à Préparer': quantites,
+                    'Demande Basse (P10)': bas.astype(int),
+                    'Demande Haute (P90)': haut.astype(int)
+                }).to_dict('records')
             
             if liste_prep:
                 df_prep = pd.DataFrame(liste_prep).sort_values('Quantité à Préparer', ascending=False)
@@ -2283,16 +2199,16 @@ if df is not None:
                 st.dataframe(df_prep, use_container_width=True, hide_index=True)
                 
                 total_prep = df_prep['Quantité à Préparer'].sum()
-                total_min = df_prep['Marge Sécurité (-10%)'].sum()
-                total_max = df_prep['Marge Sécurité (+10%)'].sum()
+                total_min = df_prep['Demande Basse (P10)'].sum()
+                total_max = df_prep['Demande Haute (P90)'].sum()
                 
                 col1, col2, col3 = st.columns(3)
                 with col1:
-                    st.metric("Total Recommandé", f"{total_prep} portions")
+                    st.metric("Total Recommandé", f"{total_prep} portions", help=f"Niveau de service {niveau_service}%")
                 with col2:
-                    st.metric("Minimum", f"{total_min} portions")
+                    st.metric("Demande Basse (P10)", f"{total_min} portions")
                 with col3:
-                    st.metric("Maximum", f"{total_max} portions")
+                    st.metric("Demande Haute (P90)", f"{total_max} portions")
                 
                 csv = df_prep.to_csv(index=False)
                 st.download_button(
@@ -2301,6 +2217,13 @@ if df is not None:
                     file_name=f"preparation_{date_prep.strftime('%Y%m%d')}.csv",
                     mime="text/csv"
                 )
+                if PYARROW_AVAILABLE:
+                    st.download_button(
+                        label="⬇️ Télécharger les prévisions du jour (Parquet)",
+                        data=to_parquet_bytes(prep),
+                        file_name=f"previsions_{date_prep.strftime('%Y%m%d')}.parquet",
+                        mime="application/vnd.apache.parquet"
+                    )
             else:
                 st.warning("Aucune prévision disponible pour cette date")
         
@@ -2320,11 +2243,14 @@ if df is not None:
                 )
             
             with col2:
-                analysis_days = st.slider("Période d'analyse (jours)", 7, 90, 30)
+                analysis_days = st.slider("Période d'analyse (jours)", 7, MAX_FORECAST_HORIZON, FORECAST_HORIZON,
+                                          key='analysis_days')
             
+            # Seul onglet à prévoir tous les plats sur tout l'horizon: calcul groupé ici
+            prefetch_forecasts(forecast_service)
             all_predictions = []
             for plat in df['Plat'].unique():
-                pred, _, _ = safe_predict_sales_ml(df, plat, analysis_days)
+                pred, _, _ = forecast_service.get(plat, analysis_days)
                 if pred is not None:
                     pred['Plat'] = plat
                     all_predictions.append(pred)
@@ -2508,25 +2434,21 @@ if df is not None:
                 with st.spinner("Calcul des besoins en ingrédients..."):
                     ingredients_totaux = {}
                     
-                    for plat in df['Plat'].unique():
-                        if plat in recipes:
-                            pred, _, _ = safe_predict_sales_ml(df, plat, 30)
-                            if pred is not None:
-                                pred_date = pred[pred['Date'].dt.date == date_commande]
-                                if not pred_date.empty:
-                                    quantite_prevue = pred_date.iloc[0]['Quantite_Prevue']
-                                    
-                                    for ingredient_data in recipes[plat]:
-                                        ing_name = ingredient_data['ingredient']
-                                        ing_qty = ingredient_data['quantite']
-                                        ing_unit = ingredient_data['unite']
-                                        
-                                        key = f"{ing_name} ({ing_unit})"
-                                        
-                                        if key not in ingredients_totaux:
-                                            ingredients_totaux[key] = 0
-                                        
-                                        ingredients_totaux[key] += ing_qty * quantite_prevue
+                    commande = forecast_service.forecast([date_commande], plats=[plat for plat in df['Plat'].unique() if plat in recipes])
+                    quantites_prevues = dict(zip(commande['Plat'], commande['Quantite_Prevue']))
+                    
+                    for plat, quantite_prevue in quantites_prevues.items():
+                        for ingredient_data in recipes[plat]:
+                            ing_name = ingredient_data['ingredient']
+                            ing_qty = ingredient_data['quantite']
+                            ing_unit = ingredient_data['unite']
+                            
+                            key = f"{ing_name} ({ing_unit})"
+                            
+                            if key not in ingredients_totaux:
+                                ingredients_totaux[key] = 0
+                            
+                            ingredients_totaux[key] += ing_qty * quantite_prevue
                 
                 if ingredients_totaux:
                     st.markdown(f"#### 📋 Commande pour le {date_commande.strftime('%d/%m/%Y')}")
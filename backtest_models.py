@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Backtest hors ligne des prévisions de tous les restaurants
+Prévoit chacun des derniers jours de l'historique comme en production (voir
+backtesting.py) et affiche l'erreur moyenne par horizon. Les résultats sont
+enregistrés au fil de l'eau dans {username}_backtest.pkl: une exécution
+interrompue reprend les plats restants
+
+Exemples:
+    python backtest_models.py
+    python backtest_models.py --workers 4 --users alice --origins 90 --horizon 7
+"""
+
+import argparse
+import sys
+import time
+
+from backtesting import (
+    BACKTEST_HORIZON, BACKTEST_ORIGINS, BACKTEST_REFIT_EVERY_DAYS, backtest_restaurant, error_curves,
+    load_backtests, save_backtest
+)
+from batch_forecast import REQUIRED_COLUMNS, iter_restaurants
+from forecasting import create_features, shutdown_training_executor, training_workers
+from model_store import DATA_DIR
+from tuning import load_tuned_params
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backtest des prévisions sur l'historique de chaque plat")
+    parser.add_argument('--data-dir', default=DATA_DIR, help="Dossier des données (restaurant_data)")
+    parser.add_argument('--users', nargs='+', help="Limite le backtest à ces utilisateurs")
+    parser.add_argument('--workers', type=int, default=training_workers(),
+                        help="Processus en parallèle (1 = séquentiel)")
+    parser.add_argument('--origins', type=int, default=BACKTEST_ORIGINS, help="Origines évaluées par plat")
+    parser.add_argument('--horizon', type=int, default=BACKTEST_HORIZON, help="Jours prévus depuis chaque origine")
+    parser.add_argument('--refit-every', type=int, default=BACKTEST_REFIT_EVERY_DAYS,
+                        help="Réentraînement du modèle tous les N jours d'origines")
+    parser.add_argument('--restart', action='store_true', help="Ignore les backtests interrompus")
+    args = parser.parse_args(argv)
+
+    print(f"🔁 Backtest ({args.workers} worker(s), {args.origins} origines, horizon {args.horizon} jours)\n")
+
+    start = time.perf_counter()
+    total_dishes = 0
+
+    try:
+        for username, resto_name, resto in iter_restaurants(args.data_dir, args.users):
+            df = resto.get('data')
+            if df is None or not all(col in df.columns for col in REQUIRED_COLUMNS):
+                print(f"⏭️  {username}/{resto_name}: pas de données")
+                continue
+
+            previous = None if args.restart else load_backtests(username, args.data_dir).get(resto_name)
+            resumed = len(previous['dishes']) if previous and not previous.get('complete') else 0
+
+            resto_start = time.perf_counter()
+            backtest = backtest_restaurant(
+                create_features(df), backends=resto.get('model_backends'), n_origins=args.origins,
+                horizon=args.horizon, refit_every=args.refit_every, max_workers=args.workers,
+                tuned_params=load_tuned_params(username, resto_name, args.data_dir), previous=previous,
+                checkpoint=lambda partial, u=username, r=resto_name: save_backtest(u, r, partial, args.data_dir)
+            )
+
+            curves = error_curves(backtest)
+            total_dishes += curves['Plat'].nunique()
+            reprise = f", {resumed} plats repris" if resumed else ""
+            print(f"✅ {username}/{resto_name}: {curves['Plat'].nunique()} plats{reprise} "
+                  f"({time.perf_counter() - resto_start:.1f}s)")
+
+            if len(curves) > 0:
+                by_horizon = curves.groupby('Horizon')['MAE'].mean()
+                for horizon in sorted({1, 7, args.horizon} & set(by_horizon.index)):
+                    print(f"   • J+{horizon}: MAE {by_horizon[horizon]:.2f}")
+    finally:
+        shutdown_training_executor()
+
+    print("\n" + "=" * 60)
+    print("RÉSUMÉ")
+    print("=" * 60)
+    print(f"  • Plats évalués: {total_dishes}")
+    print(f"  • Durée totale: {time.perf_counter() - start:.1f}s")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,229 @@
+"""
+Backtest des prévisions sur tout l'historique, plat par plat
+Pour chacun des derniers jours (origines), prévision récursive comme en
+production à partir des seules données antérieures, puis comparaison avec les
+ventes réelles: courbes d'erreur par horizon. Les fenêtres de toutes les
+origines sont des vues NumPy (sliding_window_view) sur les ventes du plat et
+sont prévues ensemble, en un seul passage récursif. Les plats sont répartis
+sur le pool d'entraînement et un backtest interrompu reprend là où il
+s'était arrêté ({username}_backtest.pkl)
+"""
+
+import os
+import pickle
+import time
+from concurrent.futures import as_completed
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from dish_panel import DishPanel
+from forecasting import (
+    CALENDAR_FEATURES, LagRingBuffer, build_daily_dataset, get_training_executor, inner_n_jobs,
+    recursive_forecast, training_workers
+)
+from model_backends import backend_for_model, resolve_backends
+from model_selection import select_and_train
+from model_store import DATA_DIR, data_fingerprint
+
+# Origines évaluées par plat (les N derniers jours dont tout l'horizon est connu)
+BACKTEST_ORIGINS = 56
+BACKTEST_HORIZON = 14
+# Le modèle est réentraîné tous les N jours d'origines, sur les seules données antérieures
+BACKTEST_REFIT_EVERY_DAYS = 28
+# Historique minimal (jours) avant la première origine
+BACKTEST_MIN_TRAIN_ROWS = 28
+# Intervalle minimal entre deux sauvegardes intermédiaires (secondes)
+CHECKPOINT_EVERY_S = 30.0
+
+
+def origin_windows(quantities, calendar, start, stop, horizon):
+    """Fenêtres des origines start..stop-1 (indices du premier jour prévu)
+
+    Retourne (historiques (n, 14), calendriers (horizon, n, colonnes), réalisés
+    (n, horizon)): des vues sur `quantities` et `calendar`, sans copie.
+    """
+    window = LagRingBuffer.WINDOW
+    histories = sliding_window_view(quantities, window)[start - window:stop - window]
+    calendars = sliding_window_view(calendar, horizon, axis=0)[start:stop].transpose(2, 0, 1)
+    actuals = sliding_window_view(quantities, horizon)[start:stop]
+    return histories, calendars, actuals
+
+
+def backtest_dish(plat_data_agg, features, optional_features, backends=None, n_origins=BACKTEST_ORIGINS,
+                  horizon=BACKTEST_HORIZON, refit_every=BACKTEST_REFIT_EVERY_DAYS, n_jobs=-1, tuned_params=None):
+    """Backtest d'un plat (sortie de build_daily_dataset)
+
+    Les origines sont groupées par blocs de `refit_every` jours; le modèle de
+    chaque bloc est choisi et entraîné (select_and_train) sur les jours
+    précédant le bloc, puis toutes les origines du bloc sont prévues en un seul
+    appel à recursive_forecast (une série par origine).
+
+    Retourne {'origins', 'predictions', 'actuals', 'models', 'duration'} ou
+    None si l'historique est trop court.
+    """
+    start_time = time.perf_counter()
+    quantities = plat_data_agg['Quantite'].to_numpy(dtype=float)
+    calendar = plat_data_agg[CALENDAR_FEATURES].to_numpy(dtype=float)
+    tendance = plat_data_agg['Tendance'].to_numpy(dtype=float)
+    static = plat_data_agg[optional_features].to_numpy(dtype=float)
+
+    last_origin = len(quantities) - horizon
+    first_origin = max(last_origin - n_origins + 1, BACKTEST_MIN_TRAIN_ROWS)
+    if first_origin > last_origin:
+        return None
+
+    predictions = []
+    models = []
+    for block_start in range(first_origin, last_origin + 1, refit_every):
+        block_stop = min(block_start + refit_every, last_origin + 1)
+
+        model, best_name, _ = select_and_train(plat_data_agg.iloc[:block_start], features, backends,
+                                               n_jobs=n_jobs, tuned_params=tuned_params)
+        backend = backend_for_model(model)
+        if backend is not None:
+            model = backend.compact(model)
+        models.append(best_name)
+
+        histories, calendars, _ = origin_windows(quantities, calendar, block_start, block_stop, horizon)
+        predictions.append(recursive_forecast(
+            model, LagRingBuffer(histories), None, features,
+            tendance=tendance[block_start - 1:block_stop - 1],
+            static=static[block_start - 1:block_stop - 1], static_features=optional_features,
+            calendar=calendars
+        ))
+
+    _, _, actuals = origin_windows(quantities, calendar, first_origin, last_origin + 1, horizon)
+
+    return {
+        'origins': pd.DatetimeIndex(plat_data_agg['Date'].iloc[first_origin:last_origin + 1]),
+        # Arrondies comme les prévisions affichées (forecast_frame)
+        'predictions': np.rint(np.vstack(predictions)).astype(int),
+        'actuals': actuals.copy(),
+        'models': models,
+        'duration': time.perf_counter() - start_time
+    }
+
+
+def backtest_config(n_origins=BACKTEST_ORIGINS, horizon=BACKTEST_HORIZON, refit_every=BACKTEST_REFIT_EVERY_DAYS,
+                    backends=None):
+    return {'n_origins': n_origins, 'horizon': horizon, 'refit_every': refit_every,
+            'backends': resolve_backends(backends)}
+
+
+def backtest_restaurant(df, backends=None, n_origins=BACKTEST_ORIGINS, horizon=BACKTEST_HORIZON,
+                        refit_every=BACKTEST_REFIT_EVERY_DAYS, max_workers=None, tuned_params=None,
+                        previous=None, checkpoint=None, progress=None):
+    """Backtest de tous les plats d'un restaurant (après create_features)
+
+    `previous` est un backtest interrompu (voir load_backtests): s'il porte sur
+    les mêmes données et la même configuration, ses plats déjà calculés sont
+    repris tels quels. `checkpoint(backtest)` est appelé au plus toutes les
+    CHECKPOINT_EVERY_S secondes avec le backtest partiel, puis une dernière
+    fois complet. `progress(done, total, plat)` est appelé à chaque plat.
+
+    Retourne {'config', 'data_version', 'dishes': {plat: résultat}, 'complete'}.
+    """
+    config = backtest_config(n_origins, horizon, refit_every, backends)
+    backtest = {'config': config, 'data_version': data_fingerprint(df), 'dishes': {}, 'complete': False}
+    if previous and previous.get('config') == config and previous.get('data_version') == backtest['data_version']:
+        backtest['dishes'] = dict(previous['dishes'])
+
+    panel = DishPanel(df)
+    tuned_params = tuned_params or {}
+    datasets = {}
+    for plat in panel.plats:
+        if plat in backtest['dishes']:
+            continue
+        dataset = build_daily_dataset(df, plat, panel=panel)
+        if dataset is not None:
+            datasets[plat] = dataset
+
+    last_checkpoint = time.perf_counter()
+
+    def record(done, plat, result):
+        nonlocal last_checkpoint
+        # None: historique trop court, enregistré pour ne pas le recalculer à la reprise
+        backtest['dishes'][plat] = result
+        if progress is not None:
+            progress(done, len(datasets), plat)
+        if checkpoint is not None and time.perf_counter() - last_checkpoint > CHECKPOINT_EVERY_S:
+            checkpoint(backtest)
+            last_checkpoint = time.perf_counter()
+
+    max_workers = max_workers or training_workers()
+
+    if len(datasets) < 2 or max_workers < 2:
+        for done, (plat, dataset) in enumerate(datasets.items(), start=1):
+            record(done, plat, backtest_dish(*dataset, backends, n_origins, horizon, refit_every,
+                                             tuned_params=tuned_params.get(plat)))
+    else:
+        executor = get_training_executor(max_workers)
+        futures = {
+            executor.submit(backtest_dish, *dataset, backends, n_origins, horizon, refit_every,
+                            inner_n_jobs(max_workers), tuned_params.get(plat)): plat
+            for plat, dataset in datasets.items()
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            record(done, futures[future], future.result())
+
+    backtest['complete'] = True
+    if checkpoint is not None:
+        checkpoint(backtest)
+
+    return backtest
+
+
+def error_curves(backtest):
+    """Erreur par plat et par horizon (1 = lendemain de l'origine)
+
+    Retourne un DataFrame (Plat, Horizon, MAE, Biais, Ventes_Moyennes, Origines);
+    Biais > 0: surestimation.
+    """
+    frames = []
+    for plat, result in backtest['dishes'].items():
+        if result is None:
+            continue
+        errors = result['predictions'] - result['actuals']
+        frames.append(pd.DataFrame({
+            'Plat': plat,
+            'Horizon': np.arange(1, errors.shape[1] + 1),
+            'MAE': np.abs(errors).mean(axis=0),
+            'Biais': errors.mean(axis=0),
+            'Ventes_Moyennes': result['actuals'].mean(axis=0),
+            'Origines': len(errors)
+        }))
+
+    if not frames:
+        return pd.DataFrame(columns=['Plat', 'Horizon', 'MAE', 'Biais', 'Ventes_Moyennes', 'Origines'])
+    return pd.concat(frames, ignore_index=True)
+
+
+def backtest_path(username, data_dir=DATA_DIR):
+    return os.path.join(data_dir, f"{username}_backtest.pkl")
+
+
+def load_backtests(username, data_dir=DATA_DIR):
+    """Backtests (complets ou interrompus) de tous les restaurants d'un utilisateur"""
+    path = backtest_path(username, data_dir)
+    if not os.path.exists(path):
+        return {}
+
+    try:
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    except Exception:
+        return {}
+
+
+def save_backtest(username, restaurant, backtest, data_dir=DATA_DIR):
+    """Enregistre le backtest (éventuellement partiel) d'un restaurant"""
+    backtests = load_backtests(username, data_dir)
+    backtests[restaurant] = {**backtest, 'saved_at': time.time()}
+
+    path = backtest_path(username, data_dir)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(backtests, f)
+    os.replace(tmp_path, path)
@@ -0,0 +1,161 @@
+"""
+Modèles de référence rapides pour la prévision des ventes
+Naïf saisonnier, moyenne par jour de semaine, lissage exponentiel et Croston,
+calculés en une fois pour tous les plats sur une matrice jours x plats
+"""
+
+import warnings
+
+import numpy as np
+import pandas as pd
+
+BASELINE_NAMES = {
+    'seasonal_naive': 'Naïf saisonnier',
+    'weekday_mean': 'Moyenne par jour de semaine',
+    'ses': 'Lissage exponentiel',
+    'croston': 'Croston'
+}
+
+# Nombre de semaines prises en compte par la moyenne par jour de semaine
+WEEKDAY_WEEKS = 8
+SES_ALPHA = 0.3
+CROSTON_ALPHA = 0.1
+# Part minimale de jours sans vente pour qu'un plat soit considéré intermittent
+INTERMITTENT_ZERO_SHARE = 0.3
+
+
+def build_sales_matrix(df):
+    """Matrice des ventes jours x plats sur un calendrier continu
+
+    Les jours sans vente après la première vente d'un plat valent 0; les jours
+    précédant sa première vente valent NaN.
+
+    Retourne (dates, plats, matrice).
+    """
+    daily = df.groupby(['Date', 'Plat'])['Quantite'].sum().unstack('Plat')
+    dates = pd.date_range(daily.index.min(), daily.index.max())
+    daily = daily.reindex(dates)
+
+    values = daily.to_numpy(dtype=float)
+    started = np.cumsum(~np.isnan(values), axis=0) > 0
+    values = np.where(started, np.nan_to_num(values), np.nan)
+
+    return dates, list(daily.columns), values
+
+
+def seasonal_naive(history, horizon, dates):
+    """Répète la dernière semaine observée"""
+    last_week = history[-7:]
+    # Aligne les jours prévus sur le même jour de semaine de la dernière semaine
+    return last_week[np.arange(horizon) % 7]
+
+
+def weekday_mean(history, horizon, dates):
+    """Moyenne des WEEKDAY_WEEKS dernières semaines pour chaque jour de semaine"""
+    recent = history[-7 * WEEKDAY_WEEKS:]
+    recent_weekdays = dates[-len(recent):].dayofweek.to_numpy()
+
+    profile = np.full((7, history.shape[1]), np.nan)
+    for weekday in range(7):
+        rows = recent[recent_weekdays == weekday]
+        if len(rows) > 0:
+            profile[weekday] = _nanmean(rows)
+
+    future_weekdays = (dates[-1].dayofweek + 1 + np.arange(horizon)) % 7
+    return profile[future_weekdays]
+
+
+def ses(history, horizon, dates):
+    """Lissage exponentiel simple: niveau constant sur tout l'horizon"""
+    level = np.full(history.shape[1], np.nan)
+    for values in history:
+        observed = ~np.isnan(values)
+        level = np.where(observed & np.isnan(level), values, level)
+        level = np.where(observed, SES_ALPHA * values + (1 - SES_ALPHA) * level, level)
+    return np.tile(level, (horizon, 1))
+
+
+def croston(history, horizon, dates):
+    """Méthode de Croston: taille moyenne des ventes / intervalle moyen entre ventes"""
+    n_series = history.shape[1]
+    size = np.full(n_series, np.nan)
+    interval = np.full(n_series, np.nan)
+    since_last = np.ones(n_series)
+
+    for values in history:
+        sale = np.nan_to_num(values) > 0
+        first = sale & np.isnan(size)
+        size = np.where(first, values, size)
+        interval = np.where(first, since_last, interval)
+
+        update = sale & ~first
+        size = np.where(update, CROSTON_ALPHA * values + (1 - CROSTON_ALPHA) * size, size)
+        interval = np.where(update, CROSTON_ALPHA * since_last + (1 - CROSTON_ALPHA) * interval, interval)
+
+        since_last = np.where(sale, 1, since_last + ~np.isnan(values))
+
+    with np.errstate(all='ignore'):
+        level = np.where(np.isnan(size), 0, size / interval)
+    return np.tile(level, (horizon, 1))
+
+
+BASELINES = {
+    'seasonal_naive': seasonal_naive,
+    'weekday_mean': weekday_mean,
+    'ses': ses,
+    'croston': croston
+}
+
+
+def is_intermittent(history):
+    """Plats dont la part de jours sans vente justifie Croston"""
+    zeros = np.where(np.isnan(history), np.nan, history == 0)
+    return _nanmean(zeros) >= INTERMITTENT_ZERO_SHARE
+
+
+def forecast_baselines(history, horizon, dates):
+    """Prévisions (horizon x plats) de chaque modèle de référence
+
+    Croston n'est proposé que pour les plats intermittents (NaN ailleurs).
+    """
+    forecasts = {}
+    for name, baseline in BASELINES.items():
+        forecasts[name] = np.maximum(0, baseline(history, horizon, dates))
+
+    forecasts['croston'][:, ~is_intermittent(history)] = np.nan
+    return forecasts
+
+
+def score_baselines(values, dates, holdout=14, quantiles=None):
+    """Erreurs de chaque modèle de référence sur les `holdout` derniers jours
+
+    Retourne {nom: {'MAE': array, 'RMSE': array, 'MAPE': array}} (un score par
+    plat, NaN si le modèle n'est pas applicable au plat). Avec `quantiles`,
+    'residual_quantiles' donne en plus les quantiles des erreurs (réel - prévu)
+    de chaque plat: tableau (quantiles x plats).
+    """
+    history, actual = values[:-holdout], values[-holdout:]
+    forecasts = forecast_baselines(history, holdout, dates[:-holdout])
+
+    scores = {}
+    for name, pred in forecasts.items():
+        errors = pred - actual
+        # MAPE sur les seuls jours avec ventes (pas de division par zéro)
+        ape = np.where(actual > 0, np.abs(errors) / np.where(actual > 0, actual, 1), np.nan)
+        scores[name] = {
+            'MAE': _nanmean(np.abs(errors)),
+            'RMSE': np.sqrt(_nanmean(errors ** 2)),
+            'MAPE': _nanmean(ape) * 100
+        }
+        if quantiles is not None:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', RuntimeWarning)
+                scores[name]['residual_quantiles'] = np.nanquantile(-errors, quantiles, axis=0)
+    return scores
+
+
+def _nanmean(values):
+    """Moyenne par plat en ignorant les NaN (NaN si aucune valeur)"""
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return np.nanmean(values, axis=0)
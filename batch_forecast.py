@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Traitement par lots des prévisions (à lancer chaque nuit, par exemple via cron)
+Parcourt les données de tous les utilisateurs et restaurants, entraîne ou met à
+jour les modèles et enregistre les prévisions dans le store que
+l'application relit au lieu de tout recalculer à l'ouverture. L'horizon par
+défaut est le plus long que l'application peut demander: une prévision plus
+longue sert aussi toutes les périodes d'analyse plus courtes
+
+Exemples:
+    python batch_forecast.py
+    python batch_forecast.py --workers 4 --users alice bob
+"""
+
+import argparse
+import os
+import pickle
+import sys
+import time
+
+from forecasting import (
+    MAX_FORECAST_HORIZON, create_features, ForecastService, shutdown_training_executor, training_workers
+)
+from forecast_store import ForecastStore
+from drift_monitor import DriftMonitor
+from model_store import DATA_DIR, ModelCache
+from tuning import load_tuned_params
+
+HORIZON = MAX_FORECAST_HORIZON
+REQUIRED_COLUMNS = ['Date', 'Plat', 'Quantite']
+
+
+def iter_restaurants(data_dir=DATA_DIR, users=None):
+    """Génère (username, nom du restaurant, infos du restaurant) pour chaque fichier {username}_data.pkl"""
+    for name in sorted(os.listdir(data_dir)):
+        if not name.endswith('_data.pkl'):
+            continue
+
+        username = name[:-len('_data.pkl')]
+        if users and username not in users:
+            continue
+
+        try:
+            with open(os.path.join(data_dir, name), 'rb') as f:
+                restaurants = pickle.load(f)
+        except Exception as e:
+            print(f"⚠️ {name} illisible: {e}")
+            continue
+
+        for resto_name, resto in restaurants.items():
+            yield username, resto_name, resto
+
+
+def forecast_restaurant(username, resto_name, resto, cache, store, horizon=HORIZON, max_workers=None,
+                        tuned_params=None, monitor=None):
+    """Calcule et enregistre les prévisions d'un restaurant; retourne un résumé
+
+    Avec un `monitor` (DriftMonitor), seuls les modèles qui dérivent ou ont
+    dépassé leur âge maximal sont réentraînés.
+    """
+    start = time.perf_counter()
+    df = resto.get('data')
+
+    if df is None or not all(col in df.columns for col in REQUIRED_COLUMNS):
+        return {'status': 'skipped', 'plats': 0, 'errors': [], 'duration': 0.0}
+
+    errors = []
+    service = ForecastService(
+        create_features(df),
+        restaurant=f"{username}/{resto_name}",
+        cache=cache,
+        horizon=horizon,
+        on_error=lambda plat, e: errors.append(f"{plat}: {e}"),
+        engine=resto.get('forecast_engine', 'per_dish'),
+        mode=resto.get('forecast_mode', 'recursive'),
+        backends=resto.get('model_backends'),
+        store=store,
+        max_workers=max_workers,
+        tuned_params=tuned_params,
+        monitor=monitor
+    )
+
+    # Recalcule même si le store est à jour: les modèles à réentraîner le sont au passage
+    plats = service.prefetch(refresh=True)
+
+    return {'status': 'ok', 'plats': plats, 'errors': errors, 'duration': time.perf_counter() - start}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Précalcule les prévisions de tous les restaurants")
+    parser.add_argument('--data-dir', default=DATA_DIR, help="Dossier des données (restaurant_data)")
+    parser.add_argument('--users', nargs='+', help="Limite le traitement à ces utilisateurs")
+    parser.add_argument('--workers', type=int, default=training_workers(),
+                        help="Processus d'entraînement en parallèle (1 = séquentiel)")
+    parser.add_argument('--horizon', type=int, default=HORIZON, help="Nombre de jours prévus")
+    args = parser.parse_args(argv)
+
+    cache = ModelCache(os.path.join(args.data_dir, 'models'))
+    store = ForecastStore(os.path.join(args.data_dir, 'forecasts'))
+
+    print(f"🌙 Prévisions par lots ({args.workers} worker(s), horizon {args.horizon} jours)\n")
+
+    start = time.perf_counter()
+    summaries = []
+
+    try:
+        for username, resto_name, resto in iter_restaurants(args.data_dir, args.users):
+            summary = forecast_restaurant(username, resto_name, resto, cache, store,
+                                          horizon=args.horizon, max_workers=args.workers,
+                                          tuned_params=load_tuned_params(username, resto_name, args.data_dir),
+                                          monitor=DriftMonitor(username, args.data_dir))
+            summaries.append((f"{username}/{resto_name}", summary))
+
+            if summary['status'] == 'skipped':
+                print(f"⏭️  {username}/{resto_name}: pas de données")
+                continue
+
+            status = '✅' if not summary['errors'] else '⚠️ '
+            print(f"{status} {username}/{resto_name}: {summary['plats']} plats en {summary['duration']:.1f}s")
+            for error in summary['errors']:
+                print(f"     ❌ {error}")
+    finally:
+        shutdown_training_executor()
+
+    processed = [(key, s) for key, s in summaries if s['status'] == 'ok']
+    total_errors = sum(len(s['errors']) for _, s in processed)
+
+    print("\n" + "=" * 60)
+    print("RÉSUMÉ")
+    print("=" * 60)
+    print(f"  • Restaurants traités: {len(processed)} (ignorés: {len(summaries) - len(processed)})")
+    print(f"  • Plats prévus: {sum(s['plats'] for _, s in processed)}")
+    print(f"  • Erreurs: {total_errors}")
+    print(f"  • Durée totale: {time.perf_counter() - start:.1f}s")
+    if processed:
+        slowest_key, slowest = max(processed, key=lambda item: item[1]['duration'])
+        print(f"  • Plus long: {slowest_key} ({slowest['duration']:.1f}s)")
+
+    return 1 if total_errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
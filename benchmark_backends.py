@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Banc d'essai des backends de prévision sur les données d'un restaurant
+Mesure, par backend: temps d'entraînement, temps de prévision (30 jours,
+récursif), mémoire (pic pendant l'entraînement et taille du modèle) et MAE
+
+Exemples:
+    python benchmark_backends.py --user demo --restaurant "Chez Paul"
+    python benchmark_backends.py --csv ventes.csv --backends RandomForest HistGradientBoosting
+"""
+
+import argparse
+import json
+import os
+import pickle
+import sys
+import time
+import tracemalloc
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import mean_absolute_error
+
+from forecasting import create_features, build_daily_dataset, recursive_forecast, LagRingBuffer
+from model_backends import MODEL_BACKENDS, get_backend
+from model_store import DATA_DIR
+
+HORIZON = 30
+
+
+def load_sales(args):
+    """Charge les ventes depuis un CSV ou les données sauvegardées d'un restaurant"""
+    if args.csv:
+        df = pd.read_csv(args.csv)
+    else:
+        with open(os.path.join(DATA_DIR, f"{args.user}_data.pkl"), 'rb') as f:
+            restaurants = pickle.load(f)
+        restaurant = args.restaurant or next(iter(restaurants))
+        df = restaurants[restaurant]['data']
+
+    df = df.copy()
+    df['Date'] = pd.to_datetime(df['Date'])
+    return create_features(df)
+
+
+def benchmark_dish(backend, plat_data_agg, features, optional_features):
+    """Entraîne et évalue un backend sur un plat (découpage 80/20 comme l'application)"""
+    train_size = int(len(plat_data_agg) * 0.8)
+    train_data = plat_data_agg[:train_size]
+    test_data = plat_data_agg[train_size:]
+
+    X_train = train_data[features].to_numpy(dtype=float)
+    y_train = train_data['Quantite'].to_numpy(dtype=float)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    model = backend.fit(X_train, y_train, features)
+    fit_time = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    mae = None
+    if len(test_data) > 0:
+        predictions = backend.predict(model, test_data[features].to_numpy(dtype=float))
+        mae = mean_absolute_error(test_data['Quantite'], predictions)
+
+    # Prévision récursive sur 30 jours, comme dans l'application
+    last_row = plat_data_agg.iloc[-1]
+    buffer = LagRingBuffer.from_series([plat_data_agg['Quantite'].to_numpy(dtype=float)], pad='last')
+    start = time.perf_counter()
+    recursive_forecast(
+        model, buffer, pd.date_range(last_row['Date'] + timedelta(days=1), periods=HORIZON), features,
+        tendance=np.array([last_row['Tendance']], dtype=float),
+        static=last_row[optional_features].to_numpy(dtype=float).reshape(1, -1),
+        static_features=optional_features
+    )
+    predict_time = time.perf_counter() - start
+
+    return {
+        'fit_s': fit_time,
+        'predict_s': predict_time,
+        'peak_mb': peak / 1024 / 1024,
+        'model_kb': len(backend.serialize(model)) / 1024,
+        'mae': mae
+    }
+
+
+def run_benchmark(df, backend_names, max_dishes=None):
+    """Retourne {backend: mesures moyennes sur les plats}"""
+    plats = df['Plat'].value_counts().index.tolist()
+    if max_dishes:
+        plats = plats[:max_dishes]
+
+    datasets = [build_daily_dataset(df, plat) for plat in plats]
+    datasets = [dataset for dataset in datasets if dataset is not None]
+
+    results = {}
+    for name in backend_names:
+        backend = get_backend(name)
+        mesures = [benchmark_dish(backend, *dataset) for dataset in datasets]
+        maes = [m['mae'] for m in mesures if m['mae'] is not None]
+        results[name] = {
+            'plats': len(mesures),
+            'fit_s': float(np.sum([m['fit_s'] for m in mesures])),
+            'predict_s': float(np.sum([m['predict_s'] for m in mesures])),
+            'peak_mb': float(np.max([m['peak_mb'] for m in mesures])) if mesures else 0.0,
+            'model_kb': float(np.mean([m['model_kb'] for m in mesures])) if mesures else 0.0,
+            'mae': float(np.mean(maes)) if maes else None
+        }
+    return results
+
+
+def print_results(results):
+    print(f"{'Backend':<22}{'Plats':>6}{'Fit (s)':>10}{'Prévision (s)':>15}"
+          f"{'Pic mém. (Mo)':>15}{'Modèle (Ko)':>13}{'MAE':>8}")
+    for name, r in sorted(results.items(), key=lambda item: (item[1]['mae'] is None, item[1]['mae'])):
+        mae = f"{r['mae']:.2f}" if r['mae'] is not None else "-"
+        print(f"{name:<22}{r['plats']:>6}{r['fit_s']:>10.2f}{r['predict_s']:>15.2f}"
+              f"{r['peak_mb']:>15.1f}{r['model_kb']:>13.0f}{mae:>8}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare les backends de prévision sur des données réelles")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--csv', help="Fichier CSV de ventes (colonnes Date, Plat, Quantite)")
+    source.add_argument('--user', help="Utilisateur dont les données sauvegardées sont utilisées")
+    parser.add_argument('--restaurant', help="Restaurant de l'utilisateur (le premier par défaut)")
+    parser.add_argument('--backends', nargs='+', default=list(MODEL_BACKENDS.keys()),
+                        choices=list(MODEL_BACKENDS.keys()), help="Backends à comparer (tous par défaut)")
+    parser.add_argument('--max-dishes', type=int, help="Limite aux N plats les plus vendus")
+    parser.add_argument('--json', help="Écrit aussi les résultats dans ce fichier JSON")
+    args = parser.parse_args(argv)
+
+    df = load_sales(args)
+    print(f"📊 {df['Plat'].nunique()} plats, {len(df)} ventes\n")
+
+    results = run_benchmark(df, args.backends, args.max_dishes)
+    print_results(results)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
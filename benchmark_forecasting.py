@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Banc d'essai de la chaîne de prévision à l'échelle
+Génère (ou anonymise) des jeux de ventes de 10, 100 et 1000 plats sur 1 à 3
+ans, puis mesure par backend: latences d'entraînement et de prévision de
+predict_sales_ml (percentiles), pic de mémoire (RSS) et précision (MAE, MAPE)
+sur les derniers jours. Les résultats sont écrits en JSON pour comparer deux
+versions du code
+
+Exemples:
+    python benchmark_forecasting.py --dishes 10 100 --years 1 --json avant.json
+    python benchmark_forecasting.py --dishes 10 100 --years 1 --json apres.json --compare avant.json
+    python benchmark_forecasting.py --user demo --restaurant "Chez Paul" --json reel.json
+    python benchmark_forecasting.py --dishes 1000 --years 3 --sample 50   # mesure rapide sur 50 plats
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import pickle
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+try:
+    import resource
+    RESOURCE_AVAILABLE = True
+except ImportError:
+    RESOURCE_AVAILABLE = False
+
+from dish_panel import DishPanel
+from forecasting import create_features, predict_sales_ml
+from model_backends import MODEL_BACKENDS
+from model_store import DATA_DIR, ModelCache
+
+HOLDOUT_DAYS = 14
+CATEGORIES = ['Entrées', 'Plats', 'Desserts', 'Boissons', 'Menus enfant']
+
+
+def make_synthetic_sales(n_dishes, years, seed=0):
+    """Ventes synthétiques réalistes: volumes très variés, saisonnalités, plats récents et intermittents"""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(end=pd.Timestamp('2026-06-30'), periods=365 * years)
+    n_days = len(dates)
+
+    level = rng.lognormal(mean=2.5, sigma=1.2, size=n_dishes).clip(0.2, 300)
+    weekday_profile = 1 + rng.normal(0, 0.15, (7, n_dishes))
+    weekday_profile[5:] *= rng.uniform(1.0, 1.6, (2, n_dishes))
+    yearly = 1 + rng.uniform(0, 0.3, n_dishes) * np.sin(
+        2 * np.pi * (dates.dayofyear.to_numpy()[:, None] / 365.25 + rng.uniform(0, 1, n_dishes)))
+    trend = 1 + rng.normal(0, 0.2, n_dishes) * np.linspace(0, 1, n_days)[:, None]
+
+    expected = level * weekday_profile[dates.dayofweek.to_numpy()] * yearly * trend.clip(0.2)
+    quantities = rng.poisson(expected.clip(0))
+
+    # Un plat sur dix n'est à la carte que depuis quelques semaines
+    start = np.where(rng.random(n_dishes) < 0.1, n_days - rng.integers(14, 90, n_dishes), 0)
+    quantities[np.arange(n_days)[:, None] < start] = 0
+
+    day_index, dish_index = np.nonzero(quantities)
+    return pd.DataFrame({
+        'Date': dates[day_index],
+        'Plat': np.array([f"Plat {i:04d}" for i in range(n_dishes)])[dish_index],
+        'Quantite': quantities[day_index, dish_index],
+        'Categorie': np.array(CATEGORIES)[dish_index % len(CATEGORIES)]
+    })
+
+
+def anonymize_sales(df):
+    """Remplace les noms de plats et de catégories par des codes; garde dates et quantités"""
+    anonymized = pd.DataFrame({
+        'Date': pd.to_datetime(df['Date']),
+        'Plat': 'Plat ' + pd.Series(pd.factorize(df['Plat'])[0], index=df.index).map('{:04d}'.format),
+        'Quantite': pd.to_numeric(df['Quantite'], errors='coerce').fillna(0)
+    })
+    if 'Categorie' in df.columns:
+        anonymized['Categorie'] = 'Catégorie ' + pd.Series(pd.factorize(df['Categorie'])[0], index=df.index).astype(str)
+    return anonymized
+
+
+def load_real_sales(args):
+    """Ventes d'un restaurant (CSV ou données sauvegardées), anonymisées"""
+    if args.csv:
+        df = pd.read_csv(args.csv)
+    else:
+        with open(os.path.join(DATA_DIR, f"{args.user}_data.pkl"), 'rb') as f:
+            restaurants = pickle.load(f)
+        df = restaurants[args.restaurant or next(iter(restaurants))]['data']
+    return anonymize_sales(df)
+
+
+def percentiles(values):
+    if not values:
+        return None
+    values = np.asarray(values)
+    return {
+        'p50': float(np.percentile(values, 50)),
+        'p90': float(np.percentile(values, 90)),
+        'p99': float(np.percentile(values, 99)),
+        'mean': float(values.mean())
+    }
+
+
+def peak_rss_mb():
+    """Pic de mémoire résidente du processus (None si non mesurable)"""
+    if not RESOURCE_AVAILABLE:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Octets sous macOS, kilo-octets sous Linux
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def benchmark_backend(df, backend, sample=None, seed=0):
+    """Exécuté dans un processus dédié (pic de mémoire propre au backend)
+
+    Les HOLDOUT_DAYS derniers jours sont retirés; pour chaque plat (ou, avec
+    `sample`, un échantillon aléatoire de `sample` plats), predict_sales_ml est chronométré avec entraînement (cache
+    vide) puis avec le modèle en cache (prévision seule), et la prévision est
+    comparée aux ventes retirées.
+    """
+    cutoff = df['Date'].max() - pd.Timedelta(days=HOLDOUT_DAYS)
+    start = time.perf_counter()
+    train = create_features(df[df['Date'] <= cutoff])
+    panel = DishPanel(train)
+    prepare_s = time.perf_counter() - start
+
+    actual = df[df['Date'] > cutoff].groupby(['Plat', 'Date'])['Quantite'].sum()
+
+    rng = np.random.default_rng(seed)
+    plats = list(panel.plats)
+    if sample and len(plats) > sample:
+        plats = list(rng.choice(plats, sample, replace=False))
+
+    cache_dir = tempfile.mkdtemp()
+    cache = ModelCache(cache_dir, max_entries=10 * len(plats) + 10)
+
+    train_s, predict_s, errors, actual_values = [], [], [], []
+    skipped = 0
+    try:
+        for plat in plats:
+            start = time.perf_counter()
+            pred, _, _ = predict_sales_ml(train, plat, HOLDOUT_DAYS, restaurant='benchmark', cache=cache,
+                                          backends=[backend], panel=panel)
+            elapsed = time.perf_counter() - start
+            if pred is None:
+                skipped += 1
+                continue
+
+            start = time.perf_counter()
+            predict_sales_ml(train, plat, HOLDOUT_DAYS, restaurant='benchmark', cache=cache,
+                             backends=[backend], panel=panel, allow_training=False)
+            predict_s.append(time.perf_counter() - start)
+            train_s.append(elapsed)
+
+            truth = actual.get(plat, pd.Series(dtype=float)).reindex(pred['Date'], fill_value=0).to_numpy(dtype=float)
+            errors.append(pred['Quantite_Prevue'].to_numpy(dtype=float) - truth)
+            actual_values.append(truth)
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    errors = np.concatenate(errors) if errors else np.array([])
+    actual_values = np.concatenate(actual_values) if actual_values else np.array([])
+    nonzero = actual_values > 0
+
+    return {
+        'prepare_s': prepare_s,
+        'dishes_timed': len(train_s),
+        'dishes_skipped': skipped,
+        'train_s': percentiles(train_s),
+        'predict_s': percentiles(predict_s),
+        'peak_rss_mb': peak_rss_mb(),
+        'MAE': float(np.abs(errors).mean()) if len(errors) else None,
+        # MAPE sur les jours avec ventes (non définie sinon)
+        'MAPE': float(np.mean(np.abs(errors[nonzero]) / actual_values[nonzero]) * 100) if nonzero.any() else None
+    }
+
+
+def run_isolated(df, backend, sample=None):
+    """Lance benchmark_backend dans un processus neuf"""
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+        return executor.submit(benchmark_backend, df, backend, sample).result()
+
+
+def code_version():
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def print_results(results):
+    print(f"{'Jeu de données':<22}{'Backend':<22}{'Entr. p50/p90 (s)':>19}{'Prév. p50/p90 (ms)':>20}"
+          f"{'RSS (Mo)':>10}{'MAE':>8}{'MAPE':>8}")
+    for r in results:
+        train = f"{r['train_s']['p50']:.2f}/{r['train_s']['p90']:.2f}" if r['train_s'] else "-"
+        predict = f"{r['predict_s']['p50'] * 1000:.0f}/{r['predict_s']['p90'] * 1000:.0f}" if r['predict_s'] else "-"
+        rss = f"{r['peak_rss_mb']:.0f}" if r['peak_rss_mb'] is not None else "-"
+        mae = f"{r['MAE']:.2f}" if r['MAE'] is not None else "-"
+        mape = f"{r['MAPE']:.1f}%" if r['MAPE'] is not None else "-"
+        print(f"{r['dataset']:<22}{r['backend']:<22}{train:>19}{predict:>20}{rss:>10}{mae:>8}{mape:>8}")
+
+
+def compare_results(results, reference):
+    """Affiche l'évolution de chaque mesure par rapport à un fichier de résultats précédent"""
+    previous = {(r['dataset'], r['backend']): r for r in reference['results']}
+    print(f"\n📈 Comparaison avec {reference.get('version') or 'la version précédente'}\n")
+    print(f"{'Jeu de données':<22}{'Backend':<22}{'Entr. p50':>12}{'Prév. p50':>12}{'RSS':>10}{'MAE':>10}")
+
+    def delta(new, old):
+        if new is None or old is None or old == 0:
+            return "-"
+        return f"{(new - old) / old * 100:+.0f}%"
+
+    for r in results:
+        old = previous.get((r['dataset'], r['backend']))
+        if old is None:
+            continue
+        train = delta(r['train_s'] and r['train_s']['p50'], old['train_s'] and old['train_s']['p50'])
+        predict = delta(r['predict_s'] and r['predict_s']['p50'], old['predict_s'] and old['predict_s']['p50'])
+        print(f"{r['dataset']:<22}{r['backend']:<22}{train:>12}{predict:>12}"
+              f"{delta(r['peak_rss_mb'], old['peak_rss_mb']):>10}{delta(r['MAE'], old['MAE']):>10}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mesure la vitesse et la précision des prévisions à l'échelle")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--csv', help="Ventes réelles à anonymiser (colonnes Date, Plat, Quantite)")
+    source.add_argument('--user', help="Utilisateur dont les données sauvegardées sont anonymisées")
+    parser.add_argument('--restaurant', help="Restaurant de l'utilisateur (le premier par défaut)")
+    parser.add_argument('--dishes', type=int, nargs='+', default=[10, 100, 1000],
+                        help="Tailles des jeux synthétiques (nombre de plats)")
+    parser.add_argument('--years', type=int, nargs='+', default=[1, 3], help="Années d'historique synthétique")
+    parser.add_argument('--backends', nargs='+', default=list(MODEL_BACKENDS.keys()),
+                        choices=list(MODEL_BACKENDS.keys()), help="Backends mesurés (tous par défaut)")
+    parser.add_argument('--sample', type=int,
+                        help="Ne chronomètre qu'un échantillon de N plats par jeu de données (tous par défaut)")
+    parser.add_argument('--json', help="Écrit les résultats dans ce fichier JSON")
+    parser.add_argument('--compare', help="Fichier JSON d'une exécution précédente à comparer")
+    args = parser.parse_args(argv)
+
+    if args.csv or args.user:
+        datasets = {'réel (anonymisé)': load_real_sales(args)}
+    else:
+        datasets = {f"{n} plats x {y} an(s)": make_synthetic_sales(n, y)
+                    for n in args.dishes for y in args.years}
+
+    results = []
+    for name, df in datasets.items():
+        print(f"📊 {name}: {df['Plat'].nunique()} plats, {len(df)} ventes")
+        for backend in args.backends:
+            result = run_isolated(df, backend, args.sample)
+            results.append({'dataset': name, 'dishes': int(df['Plat'].nunique()), 'rows': len(df),
+                            'backend': backend, **result})
+    print()
+    print_results(results)
+
+    output = {
+        'version': code_version(),
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'config': {'holdout_days': HOLDOUT_DAYS, 'sample': args.sample, 'backends': args.backends},
+        'results': results
+    }
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare_results(results, json.load(f))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(output, f, indent=2, ensure_ascii=False)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
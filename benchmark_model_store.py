@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Banc d'essai du format des modèles enregistrés
+Entraîne des forêts aléatoires sur des plats synthétiques puis compare, par
+format: taille sur le disque, temps de chargement et temps de la première
+prévision après chargement (pickle sklearn d'origine, joblib en mmap, archive
+compressée)
+
+Exemples:
+    python benchmark_model_store.py
+    python benchmark_model_store.py --dishes 200 --json resultats.json
+"""
+
+import argparse
+import json
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from model_backends import get_backend
+from model_store import ModelCache
+
+N_FEATURES = 20
+N_ROWS = 730
+
+
+def train_models(n_dishes, n_jobs):
+    """Une forêt aléatoire (paramètres par défaut) par plat synthétique"""
+    rng = np.random.default_rng(0)
+    backend = get_backend('RandomForest')
+    features = [f"f{i}" for i in range(N_FEATURES)]
+    models = []
+    for _ in range(n_dishes):
+        X = rng.random((N_ROWS, N_FEATURES))
+        y = X[:, 0] * 40 + X[:, 1] * 10 + rng.normal(0, 3, N_ROWS)
+        models.append(backend.fit(X, y, features, n_jobs=n_jobs))
+    return models, rng.random((1, N_FEATURES))
+
+
+def dir_size(path):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def bench_pickle(models, X, work_dir):
+    """Format précédent: forêt sklearn complète dans un fichier pickle"""
+    paths = []
+    for i, model in enumerate(models):
+        paths.append(os.path.join(work_dir, f"{i}.pkl"))
+        with open(paths[-1], 'wb') as f:
+            pickle.dump({'model': model}, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    backend = get_backend('RandomForest')
+    start = time.perf_counter()
+    loaded = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            loaded.append(pickle.load(f)['model'])
+    load_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for model in loaded:
+        backend.predict(model, X)
+    return load_s, time.perf_counter() - start
+
+
+def bench_cache(models, X, work_dir, compress):
+    """Format actuel du ModelCache (forêts réduites, joblib + métadonnées JSON)"""
+    backend = get_backend('RandomForest')
+    cache = ModelCache(work_dir, max_entries=len(models) + 1, max_size_mb=1e6, compress=compress)
+    for i, model in enumerate(models):
+        cache.put(str(i), {'model': backend.compact(model), 'best_name': 'RandomForest'})
+
+    # Nouveau cache: rien en mémoire, comme au démarrage d'un processus
+    cache = ModelCache(work_dir, max_entries=len(models) + 1, max_size_mb=1e6, compress=compress)
+    start = time.perf_counter()
+    loaded = [cache.get(str(i))['model'] for i in range(len(models))]
+    load_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for model in loaded:
+        backend.predict(model, X)
+    return load_s, time.perf_counter() - start
+
+
+def run_benchmark(n_dishes, n_jobs=-1):
+    """Retourne {format: mesures} pour `n_dishes` forêts"""
+    models, X = train_models(n_dishes, n_jobs)
+    formats = {
+        'pickle': lambda d: bench_pickle(models, X, d),
+        'mmap': lambda d: bench_cache(models, X, d, compress=False),
+        'archive': lambda d: bench_cache(models, X, d, compress=True),
+    }
+
+    results = {}
+    for name, bench in formats.items():
+        work_dir = tempfile.mkdtemp()
+        try:
+            load_s, predict_s = bench(work_dir)
+            results[name] = {
+                'disk_mb': dir_size(work_dir) / 1024 / 1024,
+                'load_s': load_s,
+                'first_predict_s': predict_s,
+                'total_s': load_s + predict_s
+            }
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def print_results(results):
+    print(f"{'Format':<10}{'Disque (Mo)':>13}{'Chargement (s)':>16}{'1re prévision (s)':>19}{'Total (s)':>11}")
+    for name, r in results.items():
+        print(f"{name:<10}{r['disk_mb']:>13.1f}{r['load_s']:>16.3f}{r['first_predict_s']:>19.3f}{r['total_s']:>11.3f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare les formats d'enregistrement des modèles")
+    parser.add_argument('--dishes', type=int, default=50, help="Nombre de plats (une forêt par plat)")
+    parser.add_argument('--jobs', type=int, default=-1, help="Processus sklearn pour l'entraînement")
+    parser.add_argument('--json', help="Écrit aussi les résultats dans ce fichier JSON")
+    args = parser.parse_args(argv)
+
+    print(f"🌲 {args.dishes} forêts de {get_backend('RandomForest').default_params['n_estimators']} arbres\n")
+    results = run_benchmark(args.dishes, args.jobs)
+    print_results(results)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""
+Panel des ventes partitionné par plat
+Table des ventes triée par (plat, date) avec la plage de lignes de chaque plat,
+et matrice jours x plats des quantités sur un calendrier continu. Construit une
+seule fois par version des données et partagé entre les reruns
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from model_store import data_fingerprint
+
+# Nombre de versions de données gardées en mémoire
+PANEL_CACHE_ENTRIES = 8
+
+_panels = OrderedDict()
+_panels_lock = threading.Lock()
+
+
+class DishPanel:
+    """Ventes d'un restaurant partitionnées par plat
+
+    `rows(plat)` retourne les ventes d'un plat (tranche contiguë de la table
+    triée, sans filtrage de toute la table); `series(plat)` ses quantités
+    journalières sur chaque jour du calendrier, jours sans vente à 0.
+    """
+
+    def __init__(self, df):
+        df = df[df['Plat'].notna() & df['Date'].notna()]
+        codes, plats = pd.factorize(df['Plat'], sort=True)
+        days = df['Date'].dt.normalize()
+
+        order = np.lexsort((days.to_numpy(), codes))
+        self.transactions = df.iloc[order].reset_index(drop=True)
+        sorted_codes = codes[order]
+
+        self.plats = list(plats)
+        self._position = {plat: i for i, plat in enumerate(self.plats)}
+        self._bounds = np.searchsorted(sorted_codes, np.arange(len(self.plats) + 1))
+
+        start = days.min()
+        self.dates = pd.date_range(start, days.max()) if len(df) > 0 else pd.DatetimeIndex([])
+        day_index = ((days.to_numpy()[order] - start.to_datetime64()) // np.timedelta64(1, 'D')).astype(int) \
+            if len(df) > 0 else np.array([], dtype=int)
+
+        quantites = pd.to_numeric(self.transactions['Quantite'], errors='coerce').fillna(0).to_numpy(dtype=float)
+        self.quantities = np.zeros((len(self.dates), len(self.plats)))
+        np.add.at(self.quantities, (day_index, sorted_codes), quantites)
+
+        # Premier et dernier jour de vente de chaque plat (lignes triées par date)
+        self.first_day = day_index[self._bounds[:-1]] if len(self.plats) else np.array([], dtype=int)
+        self.last_day = day_index[self._bounds[1:] - 1] if len(self.plats) else np.array([], dtype=int)
+
+    def __contains__(self, plat):
+        return plat in self._position
+
+    def rows(self, plat):
+        """Ventes d'un plat, triées par date (DataFrame vide si plat inconnu)"""
+        if plat not in self._position:
+            return self.transactions.iloc[:0]
+        i = self._position[plat]
+        return self.transactions.iloc[self._bounds[i]:self._bounds[i + 1]]
+
+    def series(self, plat):
+        """Quantités journalières d'un plat, de sa première à sa dernière vente"""
+        i = self._position[plat]
+        first, last = self.first_day[i], self.last_day[i] + 1
+        return pd.Series(self.quantities[first:last, i], index=self.dates[first:last], name='Quantite')
+
+    def last_sale_dates(self):
+        """Date de la dernière vente de chaque plat (Series indexée par plat)"""
+        return pd.Series(self.dates[self.last_day], index=self.plats)
+
+    def sales_matrix(self):
+        """(dates, plats, matrice) comme baselines.build_sales_matrix: NaN avant la première vente"""
+        values = self.quantities.copy()
+        before_first = np.arange(len(self.dates))[:, None] < self.first_day[None, :]
+        values[before_first] = np.nan
+        return self.dates, list(self.plats), values
+
+
+def get_dish_panel(df, version=None):
+    """Panel des ventes pour cette version des données (construit une seule fois)"""
+    version = version or data_fingerprint(df)
+
+    with _panels_lock:
+        if version in _panels:
+            _panels.move_to_end(version)
+            return _panels[version]
+
+    panel = DishPanel(df)
+
+    with _panels_lock:
+        _panels[version] = panel
+        while len(_panels) > PANEL_CACHE_ENTRIES:
+            _panels.popitem(last=False)
+
+    return panel
@@ -0,0 +1,257 @@
+"""
+Suivi de la précision des prévisions et décision de réentraînement
+Chaque prévision émise est enregistrée; quand de nouvelles ventes arrivent
+(import ou synchronisation), elle est comparée aux ventes réelles et l'erreur
+glissante (MAE, biais) de chaque plat est tenue à jour. Un modèle n'est
+réentraîné que s'il dérive ou s'il a dépassé son âge maximal: tant qu'il
+reste fiable, les nouvelles ventes ne servent qu'à actualiser ses prévisions.
+L'état est enregistré à côté des données ({username}_monitor.pkl)
+"""
+
+import os
+import pickle
+import threading
+
+import numpy as np
+import pandas as pd
+
+from model_store import DATA_DIR
+
+# Fenêtre de l'erreur glissante (jours prévus comparés aux ventes réelles)
+DRIFT_WINDOW_DAYS = 28
+# Nombre minimal de jours comparés avant de conclure à une dérive
+DRIFT_MIN_POINTS = 7
+# Dérive: MAE glissante au-delà de DRIFT_MAE_RATIO x MAE de validation du modèle
+# (au moins DRIFT_MIN_MAE portion), ou biais au-delà de DRIFT_MAX_BIAS x ventes moyennes
+DRIFT_MAE_RATIO = 1.5
+DRIFT_MIN_MAE = 1.0
+DRIFT_MAX_BIAS = 0.25
+# Âge maximal d'un modèle (jours de données depuis son entraînement)
+MODEL_MAX_AGE_DAYS = 28
+# Préfixe des modèles qui ne sont pas ceux d'un plat (__global__, __total__, __categorie__...)
+INTERNAL_MODEL_PREFIX = '__'
+
+
+def monitor_path(username, data_dir=DATA_DIR):
+    return os.path.join(data_dir, f"{username}_monitor.pkl")
+
+
+class DriftMonitor:
+    """Prévisions émises et erreurs observées des plats de chaque restaurant
+
+    `record` enregistre une prévision, `observe` la compare aux ventes dès
+    qu'elles sont connues et `should_retrain` (appelé par get_or_train_model)
+    décide si le modèle d'un plat doit être réentraîné. Sans `username`, l'état
+    reste en mémoire.
+    """
+
+    def __init__(self, username=None, data_dir=DATA_DIR):
+        self.path = monitor_path(username, data_dir) if username else None
+        self._lock = threading.Lock()
+        self._dirty = False
+        # {restaurant: {'pending': {plat: {date: prévu}}, 'errors': {plat: DataFrame}, 'observed_until',
+        #               'observed_version'}}
+        self.state = self._load()
+
+    def _load(self):
+        if self.path is None or not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'rb') as f:
+                return pickle.load(f)
+        except Exception:
+            return {}
+
+    def _restaurant(self, restaurant):
+        return self.state.setdefault(restaurant, {'pending': {}, 'errors': {}, 'observed_until': None,
+                                                  'observed_version': None})
+
+    def has_observed(self, restaurant, version):
+        """True si les ventes de cette version des données ont déjà été observées"""
+        return version is not None and self.state.get(restaurant, {}).get('observed_version') == version
+
+    def save(self):
+        """Enregistre l'état s'il a changé"""
+        with self._lock:
+            if self.path is None or not self._dirty:
+                return
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(self.state, f)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+
+    def record(self, restaurant, plat, pred):
+        """Enregistre une prévision émise (Date, Quantite_Prevue)
+
+        Pour une même date, la prévision la plus récente remplace les
+        précédentes: c'est celle qui a servi à préparer.
+        """
+        if pred is None or len(pred) == 0:
+            return
+        with self._lock:
+            state = self._restaurant(restaurant)
+            observed_until = state['observed_until']
+            dates = pd.DatetimeIndex(pred['Date'])
+            keep = np.ones(len(dates), dtype=bool) if observed_until is None else dates > observed_until
+            pending = state['pending'].setdefault(plat, {})
+            for date, value in zip(dates[keep], pred['Quantite_Prevue'].to_numpy(dtype=float)[keep]):
+                if pending.get(date) != value:
+                    pending[date] = value
+                    self._dirty = True
+
+    def observe(self, restaurant, panel, version=None):
+        """Compare les prévisions en attente aux ventes du panel (DishPanel)
+
+        Les jours jusqu'à la dernière vente du restaurant sont considérés comme
+        connus (jour sans vente d'un plat: 0 portion). `version` (empreinte des
+        données) est retenue pour has_observed. Retourne le nombre de jours
+        comparés.
+        """
+        if version is not None and self.state.get(restaurant, {}).get('observed_version') != version:
+            with self._lock:
+                self._restaurant(restaurant)['observed_version'] = version
+                self._dirty = True
+
+        if len(panel.dates) == 0:
+            return 0
+
+        last_day = panel.dates[-1]
+        compared = 0
+        with self._lock:
+            state = self._restaurant(restaurant)
+            for plat, pending in list(state['pending'].items()):
+                known = [date for date in pending if date <= last_day]
+                if not known:
+                    continue
+
+                dates = pd.DatetimeIndex(sorted(known))
+                predicted = np.array([pending.pop(date) for date in dates])
+                if plat in panel:
+                    positions = panel.dates.get_indexer(dates)
+                    actual = np.where(positions >= 0, panel.quantities[positions, panel.plats.index(plat)], 0.0)
+                else:
+                    actual = np.zeros(len(dates))
+
+                new = pd.DataFrame({'Date': dates, 'Prevu': predicted, 'Reel': actual})
+                errors = pd.concat([state['errors'].get(plat), new], ignore_index=True)
+                errors = errors.drop_duplicates('Date', keep='last').sort_values('Date')
+                state['errors'][plat] = errors.tail(DRIFT_WINDOW_DAYS).reset_index(drop=True)
+                compared += len(dates)
+
+                if not pending:
+                    del state['pending'][plat]
+
+            if state['observed_until'] is None or last_day > state['observed_until']:
+                state['observed_until'] = last_day
+                self._dirty = True
+            self._dirty = self._dirty or compared > 0
+
+        return compared
+
+    def dish_errors(self, restaurant, plat):
+        """(MAE, biais, ventes moyennes, jours comparés) glissants d'un plat, ou None"""
+        errors = self.state.get(restaurant, {}).get('errors', {}).get(plat)
+        if errors is None or len(errors) == 0:
+            return None
+        diff = errors['Prevu'] - errors['Reel']
+        return float(diff.abs().mean()), float(diff.mean()), float(errors['Reel'].mean()), len(errors)
+
+    def drift(self, restaurant, plat, reference_mae=None):
+        """Motif de dérive du plat (texte) ou None
+
+        La MAE glissante est comparée à la MAE de validation du modèle
+        (`reference_mae`, voir select_and_train); le biais aux ventes moyennes.
+        """
+        dish_errors = self.dish_errors(restaurant, plat)
+        if dish_errors is None:
+            return None
+
+        mae, bias, mean_sales, points = dish_errors
+        if points < DRIFT_MIN_POINTS:
+            return None
+
+        reference = max(reference_mae or 0.0, DRIFT_MIN_MAE)
+        if mae > DRIFT_MAE_RATIO * reference:
+            return f"MAE {mae:.1f} > {DRIFT_MAE_RATIO:g} x {reference:.1f}"
+        if abs(bias) > DRIFT_MAX_BIAS * max(mean_sales, DRIFT_MIN_MAE):
+            return f"biais {bias:+.1f} sur {mean_sales:.1f} portions/jour"
+        return None
+
+    def should_retrain(self, restaurant, plat, trained_until, last_date, reference_mae=None):
+        """True si le modèle du plat dérive ou a dépassé MODEL_MAX_AGE_DAYS jours de données
+
+        En cas de dérive, les erreurs du plat sont oubliées: elles portaient sur
+        le modèle remplacé. Les modèles sans prévision suivie (modèles de
+        groupe du moteur hiérarchique) ne sont réentraînés que sur l'âge.
+        """
+        if (pd.Timestamp(last_date) - pd.Timestamp(trained_until)).days >= MODEL_MAX_AGE_DAYS:
+            return True
+        if self.drift(restaurant, plat, reference_mae) is None:
+            return False
+
+        with self._lock:
+            self.state[restaurant]['errors'].pop(plat, None)
+            self._dirty = True
+        return True
+
+    def report(self, restaurant):
+        """Erreurs glissantes des plats suivis: DataFrame (Plat, MAE, Biais, Ventes_Moyennes, Jours, En_Attente)"""
+        state = self.state.get(restaurant, {'pending': {}, 'errors': {}})
+        rows = []
+        for plat in sorted(set(state['errors']) | set(state['pending']), key=str):
+            dish_errors = self.dish_errors(restaurant, plat) or (np.nan, np.nan, np.nan, 0)
+            rows.append((plat, *dish_errors, len(state['pending'].get(plat, {}))))
+        return pd.DataFrame(rows, columns=['Plat', 'MAE', 'Biais', 'Ventes_Moyennes', 'Jours', 'En_Attente'])
+
+
+def model_status(monitor, cache, restaurant):
+    """État du dernier modèle de chaque plat d'un restaurant (tableau de bord admin)
+
+    L'âge est compté en jours de données (jusqu'aux dernières ventes
+    observées), comme pour la décision de réentraînement. Seuls les plats sont
+    listés: les modèles de groupe (global, catégories, total) sont ignorés et
+    les variantes d'un plat (mode direct) comptent pour ce plat. Retourne un DataFrame
+    (Plat, Modele, Entraine_Jusqu_Au, Age_Jours, MAE_Validation, MAE, Biais,
+    Statut), les modèles à réentraîner en premier.
+    """
+    latest = {}
+    for metadata in cache.models_metadata(restaurant):
+        plat, trained_until = metadata.get('plat'), metadata.get('trained_until')
+        if plat is None or str(plat).startswith(INTERNAL_MODEL_PREFIX):
+            continue
+        if trained_until is not None and (plat not in latest or trained_until > latest[plat]['trained_until']):
+            latest[plat] = metadata
+
+    observed_until = monitor.state.get(restaurant, {}).get('observed_until')
+    rows = []
+    for plat, metadata in latest.items():
+        trained_until = metadata['trained_until']
+        age = (observed_until - trained_until).days if observed_until is not None else None
+        reference_mae = (metadata.get('metrics') or {}).get(metadata.get('best_name'), {}).get('MAE')
+        dish_errors = monitor.dish_errors(restaurant, plat) or (np.nan, np.nan, np.nan, 0)
+        reason = monitor.drift(restaurant, plat, reference_mae)
+
+        if age is not None and age >= MODEL_MAX_AGE_DAYS:
+            status = f"⏰ Trop ancien ({age} jours)"
+        elif reason is not None:
+            status = f"⚠️ Dérive ({reason})"
+        else:
+            status = "✅ À jour"
+
+        rows.append({
+            'Plat': plat,
+            'Modele': metadata.get('best_name'),
+            'Entraine_Jusqu_Au': trained_until,
+            'Age_Jours': age,
+            'MAE_Validation': reference_mae,
+            'MAE': dish_errors[0],
+            'Biais': dish_errors[1],
+            'Statut': status
+        })
+
+    columns = ['Plat', 'Modele', 'Entraine_Jusqu_Au', 'Age_Jours', 'MAE_Validation', 'MAE', 'Biais', 'Statut']
+    status = pd.DataFrame(rows, columns=columns)
+    up_to_date = status['Statut'].str.startswith('✅')
+    order = np.lexsort((status['Plat'].astype(str).to_numpy(), up_to_date.to_numpy()))
+    return status.iloc[order].reset_index(drop=True)
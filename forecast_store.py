@@ -0,0 +1,85 @@
+"""
+Stockage des prévisions précalculées
+Le traitement par lots (batch_forecast.py) y écrit les prévisions de chaque
+restaurant; l'application les relit tant que les données et la configuration
+de prévision n'ont pas changé et que leur horizon couvre celui demandé
+"""
+
+import os
+import pickle
+import hashlib
+import time
+from typing import Optional, Dict, Any
+
+import pandas as pd
+
+from model_store import DATA_DIR, data_fingerprint
+
+FORECASTS_DIR = os.path.join(DATA_DIR, "forecasts")
+
+
+def forecast_data_version(df: pd.DataFrame) -> str:
+    """Version des ventes d'un restaurant, après create_features"""
+    return data_fingerprint(df)
+
+
+class ForecastStore:
+    """Prévisions précalculées, un fichier pickle par restaurant"""
+
+    def __init__(self, store_dir: str = FORECASTS_DIR):
+        self.store_dir = store_dir
+        os.makedirs(self.store_dir, exist_ok=True)
+
+    def _path(self, restaurant: str) -> str:
+        name = hashlib.sha256(str(restaurant).encode()).hexdigest()
+        return os.path.join(self.store_dir, f"{name}.pkl")
+
+    def save(self, restaurant: str, data_version: str, config: Dict[str, Any], horizon: int,
+             forecasts: Dict[str, Dict[str, Any]], tier_report: Optional[Dict] = None):
+        """Enregistre les prévisions {plat: {'horizon', 'pred', 'metrics', 'best_name'}} d'un restaurant
+
+        `horizon` est le nombre de jours couvert par toutes les prévisions; celui
+        de chaque plat peut être plus long ('horizon' du plat, facultatif).
+        """
+        entry = {
+            'restaurant': restaurant,
+            'data_version': data_version,
+            'config': config,
+            'horizon': horizon,
+            'forecasts': forecasts,
+            'tier_report': tier_report or {},
+            'generated_at': time.time()
+        }
+        path = self._path(restaurant)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    def load(self, restaurant: str, data_version: str, config: Dict[str, Any],
+             horizon: int) -> Optional[Dict[str, Any]]:
+        """Retourne les prévisions enregistrées si elles correspondent aux données et à la configuration
+
+        et couvrent au moins `horizon` jours pour tous les plats (0: quel que soit l'horizon).
+        """
+        entry = self.get(restaurant)
+        if entry is None:
+            return None
+
+        if entry['data_version'] != data_version or entry['config'] != config or entry['horizon'] < horizon:
+            return None
+
+        return entry
+
+    def get(self, restaurant: str) -> Optional[Dict[str, Any]]:
+        """Dernières prévisions enregistrées d'un restaurant, quelles que soient les données"""
+        path = self._path(restaurant)
+        if not os.path.exists(path):
+            return None
+
+        try:
+            with open(path, 'rb') as f:
+                return pickle.load(f)
+        except Exception:
+            return None
@@ -0,0 +1,1677 @@
+"""
+Moteur de prévisions ML des ventes par plat
+Modèles candidats configurables (model_backends.py) avec sélection automatique du meilleur,
+modèle global multi-plats, cache persistant des modèles entraînés et
+entraînement parallèle des plats sur un pool de processus
+"""
+
+import copy
+import os
+import time
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+import numpy as np
+from datetime import timedelta
+from sklearn.metrics import mean_absolute_error, mean_squared_error, mean_absolute_percentage_error
+
+from model_store import ModelCache, data_fingerprint, make_model_key, params_fingerprint
+from model_backends import DEFAULT_BACKENDS, backend_for_model, get_backend, resolve_backends
+from model_selection import FORECAST_QUANTILES, select_and_train
+from forecast_store import forecast_data_version
+from dish_panel import get_dish_panel
+from baselines import BASELINES, BASELINE_NAMES, build_sales_matrix, forecast_baselines, score_baselines, weekday_mean
+
+BASE_FEATURES = ['Jour_Semaine', 'Jour_Mois', 'Mois', 'Semaine_Annee', 'Trimestre',
+                 'Est_Weekend', 'Est_Debut_Mois', 'Est_Fin_Mois', 'Tendance',
+                 'Lag_1', 'Lag_3', 'Lag_7', 'Lag_14',
+                 'Moyenne_Mobile_7', 'Moyenne_Mobile_14', 'Ecart_Type_7']
+
+
+# Horizon (jours) des prévisions partagées par les onglets, et le plus long que
+# l'application peut demander (période d'analyse): le traitement par lots
+# précalcule ce dernier pour servir toutes les demandes plus courtes
+FORECAST_HORIZON = 30
+MAX_FORECAST_HORIZON = 90
+
+
+# n_jobs des modèles: -1 dans le processus principal, borné dans les workers
+# du pool d'entraînement (voir get_training_executor)
+TRAINING_N_JOBS = -1
+
+
+# Colonnes des bandes de prévision (P10, P50, P90), voir predict_with_quantiles
+QUANTILE_COLUMNS = [f"P{round(q * 100)}" for q in FORECAST_QUANTILES]
+
+
+class ModelNotCached(Exception):
+    """Le modèle demandé n'est pas en cache et l'entraînement n'est pas autorisé"""
+
+
+CALENDAR_FEATURES = ['Jour_Semaine', 'Jour_Mois', 'Mois', 'Semaine_Annee', 'Trimestre',
+                     'Est_Weekend', 'Est_Debut_Mois', 'Est_Fin_Mois']
+
+
+# Colonnes calendaires ajoutées aux ventes par create_features
+DATE_DIMENSION_COLUMNS = ['Jour_Semaine', 'Jour_Mois', 'Mois', 'Annee', 'Semaine_Annee', 'Trimestre',
+                          'Est_Weekend', 'Est_Debut_Mois', 'Est_Fin_Mois']
+
+# Table des jours déjà calculés, complétée à la demande; repart des jours
+# demandés quand elle dépasse DATE_DIMENSION_MAX_DAYS (environ 20 ans)
+DATE_DIMENSION_MAX_DAYS = 7500
+_date_dimension = None
+_date_dimension_lock = threading.Lock()
+
+
+def _compute_date_dimension(dates):
+    jour_semaine = dates.dayofweek.to_numpy()
+    jour_mois = dates.day.to_numpy()
+
+    return pd.DataFrame({
+        'Jour_Semaine': jour_semaine,
+        'Jour_Mois': jour_mois,
+        'Mois': dates.month.to_numpy(),
+        'Annee': dates.year.to_numpy(),
+        'Semaine_Annee': dates.isocalendar().week.to_numpy(dtype=int),
+        'Trimestre': dates.quarter.to_numpy(),
+        'Est_Weekend': (jour_semaine >= 5).astype(int),
+        'Est_Debut_Mois': (jour_mois <= 5).astype(int),
+        'Est_Fin_Mois': (jour_mois >= 25).astype(int)
+    }, index=dates)
+
+
+def date_dimension(dates):
+    """Caractéristiques calendaires de chaque date, une ligne par date demandée
+
+    Les caractéristiques ne sont calculées qu'une fois par jour calendaire et
+    gardées en mémoire (heures ignorées): le coût ne dépend plus du nombre de
+    ventes.
+    """
+    global _date_dimension
+
+    dates = pd.DatetimeIndex(dates)
+    days = dates.normalize()
+    unique_days = days.dropna().unique()
+
+    with _date_dimension_lock:
+        known = _date_dimension
+        if known is not None and len(known) + len(unique_days) > DATE_DIMENSION_MAX_DAYS:
+            known = None
+        missing = unique_days if known is None else unique_days.difference(known.index)
+        if len(missing) > 0:
+            computed = _compute_date_dimension(pd.DatetimeIndex(missing))
+            known = computed if known is None else pd.concat([known, computed])
+        _date_dimension = known
+
+    return known.reindex(days).set_axis(dates)
+
+
+def calendar_features(dates):
+    """Features calendaires d'une série de dates (dates futures, calendrier continu)"""
+    return date_dimension(dates)[CALENDAR_FEATURES]
+
+
+class LagRingBuffer:
+    """Tampon circulaire NumPy des 14 dernières quantités de n séries
+
+    Les lags sont lus directement dans le tampon et les moyennes mobiles 7/14
+    jours et l'écart-type 7 jours sont tenus par sommes glissantes: chaque pas
+    de prévision coûte O(n), quel que soit l'horizon.
+    """
+
+    WINDOW = 14
+
+    def __init__(self, history, n_obs=None, fallback=None):
+        history = np.asarray(history, dtype=float)
+        self.n_series = history.shape[0]
+        self.values = history[:, -self.WINDOW:].copy()
+        self.pos = 0  # indice de la valeur la plus ancienne
+
+        # Nombre de vraies observations (les valeurs de remplissage ne comptent pas)
+        self.n_obs = np.full(self.n_series, self.WINDOW) if n_obs is None else np.asarray(n_obs).copy()
+        self.fallback = self.values[:, -1].copy() if fallback is None else np.asarray(fallback, dtype=float)
+
+        last7 = self.values[:, -7:]
+        self.sum7 = last7.sum(axis=1)
+        self.sumsq7 = (last7 ** 2).sum(axis=1)
+        self.sum14 = self.values.sum(axis=1)
+
+    @classmethod
+    def from_series(cls, series_list, pad='last'):
+        """Construit le tampon à partir des historiques (du plus ancien au plus récent)
+
+        `pad='last'` complète un historique court avec sa dernière valeur (lags du
+        modèle par plat); `pad='mean'` le complète avec sa moyenne et considère le
+        tampon comme plein (modèle global).
+        """
+        n_series = len(series_list)
+        history = np.zeros((n_series, cls.WINDOW))
+        n_obs = np.zeros(n_series, dtype=int)
+
+        for i, values in enumerate(series_list):
+            values = np.asarray(values, dtype=float)[-cls.WINDOW:]
+            history[i, :] = values[-1] if pad == 'last' else values.mean()
+            history[i, cls.WINDOW - len(values):] = values
+            n_obs[i] = len(values) if pad == 'last' else cls.WINDOW
+
+        return cls(history, n_obs=n_obs)
+
+    def lag(self, k):
+        """Valeur observée k jours avant le prochain jour à prévoir"""
+        return self.values[:, (self.pos - k) % self.WINDOW]
+
+    def mean7(self):
+        return self.sum7 / 7
+
+    def mean14(self):
+        return np.where(self.n_obs >= self.WINDOW, self.sum14 / self.WINDOW, self.fallback)
+
+    def std7(self):
+        variance = (self.sumsq7 - self.sum7 ** 2 / 7) / 6
+        return np.where(self.n_obs >= 7, np.sqrt(np.maximum(variance, 0)), 0.0)
+
+    def push(self, new_values):
+        """Ajoute une nouvelle quantité par série et met à jour les sommes glissantes"""
+        new_values = np.asarray(new_values, dtype=float)
+        out7 = self.lag(7)
+        out14 = self.values[:, self.pos]
+
+        self.sum7 += new_values - out7
+        self.sumsq7 += new_values ** 2 - out7 ** 2
+        self.sum14 += new_values - out14
+
+        self.values[:, self.pos] = new_values
+        self.pos = (self.pos + 1) % self.WINDOW
+        self.n_obs += 1
+
+
+def recursive_forecast(model, buffer, future_dates, features, tendance, static=None, static_features=(),
+                       calendar=None, with_bands=False):
+    """Prévision récursive jour par jour de n séries à partir d'un LagRingBuffer
+
+    Chaque prévision est réinjectée comme Lag_1 du jour suivant. La ligne de
+    features est préallouée et seules les colonnes qui changent sont réécrites.
+    Les séries partagent les dates `future_dates`, sauf si `calendar` donne
+    les caractéristiques calendaires de chacune (horizon, n_series,
+    CALENDAR_FEATURES): séries prévues depuis des origines différentes.
+
+    Retourne un tableau (n_series, horizon) de quantités prévues (>= 0). Avec
+    `with_bands=True`, retourne (prévisions, bandes): bandes (n_series,
+    horizon, FORECAST_QUANTILES) calculées dans le même passage à partir des
+    arbres du modèle (voir predict_with_quantiles), None pour les autres modèles.
+    """
+    n_series = buffer.n_series
+    col = {feat: j for j, feat in enumerate(features)}
+
+    X_pred = np.zeros((n_series, len(features)))
+    if static is not None and len(static_features) > 0:
+        X_pred[:, [col[feat] for feat in static_features]] = static
+
+    if calendar is None:
+        calendar = calendar_features(future_dates)[CALENDAR_FEATURES].to_numpy(dtype=float)
+    horizon = len(calendar)
+    calendar_cols = [col[feat] for feat in CALENDAR_FEATURES]
+    tendance = np.asarray(tendance, dtype=float)
+
+    results = np.zeros((n_series, horizon))
+    bands = None
+
+    for i in range(horizon):
+        X_pred[:, calendar_cols] = calendar[i]
+        X_pred[:, col['Tendance']] = tendance + i + 1
+        X_pred[:, col['Lag_1']] = buffer.lag(1)
+        X_pred[:, col['Lag_3']] = buffer.lag(3)
+        X_pred[:, col['Lag_7']] = buffer.lag(7)
+        X_pred[:, col['Lag_14']] = buffer.lag(14)
+        X_pred[:, col['Moyenne_Mobile_7']] = buffer.mean7()
+        X_pred[:, col['Moyenne_Mobile_14']] = buffer.mean14()
+        X_pred[:, col['Ecart_Type_7']] = buffer.std7()
+
+        if with_bands:
+            pred_quantites, step_bands = predict_with_quantiles(model, X_pred)
+            if step_bands is not None:
+                if bands is None:
+                    bands = np.zeros((n_series, horizon, len(FORECAST_QUANTILES)))
+                bands[:, i] = np.maximum(0, step_bands)
+        else:
+            pred_quantites = fast_predict(model, X_pred)
+
+        pred_quantites = np.maximum(0, pred_quantites)
+        results[:, i] = pred_quantites
+        buffer.push(pred_quantites)
+
+    return (results, bands) if with_bands else results
+
+
+def fast_predict(model, X):
+    """predict() via le backend du modèle
+
+    Pour les forêts aléatoires, les arbres sont évalués directement (voir
+    RandomForestBackend.predict): le résultat est identique à model.predict.
+    """
+    backend = backend_for_model(model)
+    if backend is None:
+        return model.predict(X)
+    return backend.predict(model, X)
+
+
+def predict_with_quantiles(model, X):
+    """predict() et quantiles FORECAST_QUANTILES de la prévision, en un seul passage
+
+    Pour les forêts, chaque arbre est évalué une fois: la prévision est la
+    moyenne des arbres (identique à fast_predict) et les quantiles sont pris
+    entre les arbres. Retourne (prévision, quantiles (lignes[, sorties],
+    quantiles)), ou (prévision, None) si le modèle n'est pas un ensemble d'arbres.
+    """
+    backend = backend_for_model(model)
+    trees = backend.predict_trees(model, X) if backend is not None else None
+    if trees is None:
+        return fast_predict(model, X), None
+
+    point = np.add.reduce(trees, axis=0) / len(trees)
+    bands = np.moveaxis(np.quantile(trees, FORECAST_QUANTILES, axis=0), 0, -1)
+    if trees.shape[2] == 1:
+        return point[:, 0], bands[:, 0]
+    return point, bands
+
+
+def residual_bands(pred_quantites, metrics, best_name):
+    """Bandes d'un modèle sans arbres: prévision + quantiles des erreurs de validation
+
+    Retourne un tableau (horizon, FORECAST_QUANTILES) ou None si le modèle
+    n'a pas d'erreurs de validation enregistrées.
+    """
+    residual_quantiles = ((metrics or {}).get(best_name) or {}).get('residual_quantiles')
+    if residual_quantiles is None:
+        return None
+    return np.maximum(0, np.asarray(pred_quantites)[:, None] + np.asarray(residual_quantiles)[None, :])
+
+
+def forecast_frame(future_dates, pred_quantites, bands=None):
+    """Met en forme une série de prévisions (Date, Jour, Quantite_Prevue[, P10, P50, P90])
+
+    `bands` (horizon, FORECAST_QUANTILES) ajoute les bandes de prévision.
+    """
+    future_dates = pd.DatetimeIndex(future_dates)
+    frame = pd.DataFrame({
+        'Date': future_dates,
+        'Jour': future_dates.strftime('%A'),
+        'Quantite_Prevue': np.rint(pred_quantites).astype(int)
+    })
+    if bands is not None:
+        # Bandes triées: quantiles croissants même après arrondi
+        bands = np.sort(np.rint(bands).astype(int), axis=1)
+        for j, column in enumerate(QUANTILE_COLUMNS):
+            frame[column] = bands[:, j]
+    return frame
+
+
+def service_level_quantity(forecast, level):
+    """Quantité qui couvre la demande avec la probabilité `level` (ex. 0.8)
+
+    Interpolée entre les bandes P10, P50 et P90 de `forecast` (niveau borné à
+    [P10, P90]); prévision ponctuelle pour les lignes sans bandes. Retourne un
+    tableau d'entiers (arrondi supérieur).
+    """
+    point = forecast['Quantite_Prevue'].to_numpy(dtype=float)
+    if not all(column in forecast.columns for column in QUANTILE_COLUMNS):
+        return np.ceil(point).astype(int)
+
+    quantiles = np.asarray(FORECAST_QUANTILES)
+    level = float(np.clip(level, quantiles[0], quantiles[-1]))
+    k = min(int(np.searchsorted(quantiles, level, side='right')) - 1, len(quantiles) - 2)
+    weight = (level - quantiles[k]) / (quantiles[k + 1] - quantiles[k])
+
+    bands = forecast[QUANTILE_COLUMNS].to_numpy(dtype=float)
+    quantity = bands[:, k] * (1 - weight) + bands[:, k + 1] * weight
+    return np.ceil(np.where(np.isnan(quantity), point, quantity) - 1e-9).astype(int)
+
+
+def create_features(df):
+    """Ajoute les caractéristiques calendaires de chaque vente (voir date_dimension)"""
+    df = df.copy()
+
+    # Date déjà nettoyée par clean_and_validate_data
+    df = df.sort_values('Date')
+
+    # Une ligne de la table par jour distinct, recopiée sur les ventes de ce jour
+    codes, unique_dates = pd.factorize(df['Date'].dt.normalize())
+    calendar = date_dimension(unique_dates)[DATE_DIMENSION_COLUMNS].to_numpy()
+    if (codes < 0).any():
+        # Dates manquantes: caractéristiques manquantes
+        calendar = np.vstack([calendar.astype(float), np.full(len(DATE_DIMENSION_COLUMNS), np.nan)])
+    values = calendar[codes]
+
+    for i, col in enumerate(DATE_DIMENSION_COLUMNS):
+        df[col] = values[:, i]
+
+    return df
+
+
+def build_daily_dataset(df, plat, panel=None):
+    """Agrège les ventes d'un plat par jour et construit les features ML
+
+    Les ventes sont placées sur un calendrier continu, de la première à la
+    dernière vente du plat (jours sans vente à 0): les lags et moyennes mobiles
+    portent sur de vrais jours calendaires. Avec un `panel` (DishPanel), les
+    ventes du plat sont lues directement sans filtrer toute la table.
+
+    Retourne (plat_data_agg, features, optional_features) ou None si les
+    données sont insuffisantes.
+    """
+    plat_data = panel.rows(plat).copy() if panel is not None else df[df['Plat'] == plat].copy()
+
+    if len(plat_data) < 14:
+        return None
+
+    plat_data['Date'] = plat_data['Date'].dt.normalize()
+    plat_data = plat_data.sort_values('Date')
+
+    agg_dict = {'Quantite': 'sum'}
+
+    optional_features = []
+
+    if 'Prix_unitaire' in plat_data.columns:
+        agg_dict['Prix_unitaire'] = 'mean'
+        optional_features.append('Prix_unitaire')
+
+    if 'Service' in plat_data.columns:
+        plat_data['Service_encoded'] = plat_data['Service'].astype('category').cat.codes
+        agg_dict['Service_encoded'] = 'first'
+        optional_features.append('Service_encoded')
+
+    if 'Zone' in plat_data.columns:
+        plat_data['Zone_encoded'] = plat_data['Zone'].astype('category').cat.codes
+        agg_dict['Zone_encoded'] = 'first'
+        optional_features.append('Zone_encoded')
+
+    if 'Meteo' in plat_data.columns:
+        plat_data['Meteo_encoded'] = plat_data['Meteo'].astype('category').cat.codes
+        agg_dict['Meteo_encoded'] = 'first'
+        optional_features.append('Meteo_encoded')
+
+    if 'Promotion' in plat_data.columns:
+        plat_data['Promotion_encoded'] = (plat_data['Promotion'].astype(str).str.lower() == 'oui').astype(int)
+        agg_dict['Promotion_encoded'] = 'max'
+        optional_features.append('Promotion_encoded')
+
+    if 'Canal' in plat_data.columns:
+        plat_data['Canal_encoded'] = plat_data['Canal'].astype('category').cat.codes
+        agg_dict['Canal_encoded'] = 'first'
+        optional_features.append('Canal_encoded')
+
+    plat_data_agg = plat_data.groupby('Date').agg(agg_dict)
+
+    # Calendrier continu: jours sans vente à 0, caractéristiques du dernier jour vendu
+    calendar = pd.date_range(plat_data_agg.index.min(), plat_data_agg.index.max(), name='Date')
+    plat_data_agg = plat_data_agg.reindex(calendar)
+    plat_data_agg['Quantite'] = plat_data_agg['Quantite'].fillna(0)
+    if 'Promotion_encoded' in plat_data_agg.columns:
+        plat_data_agg['Promotion_encoded'] = plat_data_agg['Promotion_encoded'].fillna(0)
+    plat_data_agg[optional_features] = plat_data_agg[optional_features].ffill()
+
+    plat_data_agg = plat_data_agg.join(calendar_features(calendar)).reset_index()
+
+    for lag in [1, 3, 7, 14]:
+        plat_data_agg[f'Lag_{lag}'] = plat_data_agg['Quantite'].shift(lag)
+
+    plat_data_agg['Moyenne_Mobile_7'] = plat_data_agg['Quantite'].rolling(window=7, min_periods=1).mean()
+    plat_data_agg['Moyenne_Mobile_14'] = plat_data_agg['Quantite'].rolling(window=14, min_periods=1).mean()
+    plat_data_agg['Ecart_Type_7'] = plat_data_agg['Quantite'].rolling(window=7, min_periods=1).std()
+    plat_data_agg['Tendance'] = range(len(plat_data_agg))
+
+    plat_data_agg = plat_data_agg.dropna()
+
+    if len(plat_data_agg) < 7:
+        return None
+
+    features = BASE_FEATURES + optional_features
+
+    return plat_data_agg, features, optional_features
+
+
+# Réentraînement incrémental: un réentraînement complet au moins tous les N jours
+FULL_REFIT_EVERY_DAYS = 7
+INCREMENTAL_WINDOW = 60
+
+
+def update_model_incrementally(model, plat_data_agg, features):
+    """Complète un modèle existant avec des arbres/étapes appris sur les jours récents
+
+    Le backend du modèle décide de la mise à jour (voir ModelBackend.update):
+    ajout d'arbres pour RandomForest, d'étapes de boosting pour les modèles de
+    gradient boosting. Retourne le modèle mis à jour, ou None s'il ne supporte
+    pas la mise à jour.
+    """
+    backend = backend_for_model(model)
+    if backend is None:
+        return None
+
+    window = plat_data_agg.tail(INCREMENTAL_WINDOW)
+    X_window = window[features].to_numpy(dtype=float)
+    y_window = window['Quantite'].to_numpy(dtype=float)
+
+    # Copie: l'ancien modèle reste valide pour l'ancienne version des données
+    return backend.update(copy.deepcopy(model), X_window, y_window, n_jobs=TRAINING_N_JOBS)
+
+
+def _extends_lineage(lineage, plat_data_agg, columns):
+    """True si les nouvelles données ne sont qu'un ajout de jours à celles du modèle précédent"""
+    if lineage is None:
+        return False
+
+    trained_rows = lineage['trained_rows']
+    if trained_rows >= len(plat_data_agg):
+        return False
+
+    # Les jours déjà vus doivent être strictement identiques (ajout pur de jours)
+    return data_fingerprint(plat_data_agg[columns].iloc[:trained_rows]) == lineage['data_version']
+
+
+def _incremental_candidate(lineage, plat_data_agg, columns, cache):
+    """Retourne l'entrée du modèle précédent si les nouvelles données n'en sont qu'un ajout"""
+    if not _extends_lineage(lineage, plat_data_agg, columns):
+        return None
+
+    last_date = plat_data_agg['Date'].iloc[-1]
+    if (last_date - lineage['full_fit_until']).days >= FULL_REFIT_EVERY_DAYS:
+        return None
+
+    return cache.get(lineage['model_key'])
+
+
+def get_or_train_model(plat_data_agg, features, plat, restaurant=None, cache=None,
+                       train_fn=None, variant='', incremental=True, allow_training=True,
+                       backends=None, tuned_params=None, monitor=None):
+    """Retourne le meilleur modèle depuis le cache, ou l'entraîne et le met en cache
+
+    `train_fn(plat_data_agg, features)` remplace l'entraînement par défaut
+    (select_and_train: validation croisée des `backends` demandés puis
+    entraînement du gagnant, avec les hyperparamètres `tuned_params` trouvés
+    hors ligne pour ce plat); `variant` le distingue dans la clé de cache.
+
+    Quand des jours sont simplement ajoutés aux données déjà vues, le modèle
+    précédent du plat est complété sur les jours récents au lieu d'être
+    réentraîné (voir update_model_incrementally). Un réentraînement complet a
+    lieu au moins tous les FULL_REFIT_EVERY_DAYS jours de données. Chaque
+    entrée enregistre la version des données vue par le modèle.
+
+    Avec un `monitor` (DriftMonitor), le modèle précédent est gardé tel quel
+    pour les jours ajoutés tant que ses prévisions ne dérivent pas et qu'il
+    n'a pas dépassé son âge maximal (voir DriftMonitor.should_retrain). Il est
+    alors rattaché aux nouvelles données: les reruns suivants le retrouvent
+    sans revérifier l'historique déjà vu.
+
+    Avec `allow_training=False`, lève ModelNotCached au lieu d'entraîner.
+    """
+    incremental = incremental and train_fn is None
+
+    if train_fn is None:
+        backends = resolve_backends(backends)
+        # D'autres hyperparamètres donnent une autre sélection et un autre modèle
+        if tuned_params:
+            variant = '+'.join(([variant] if variant else []) + [f"tuned={params_fingerprint(tuned_params)}"])
+        train_fn = lambda data, feats, variant=variant: select_and_train(
+            data, feats, backends, n_jobs=TRAINING_N_JOBS, cache=cache, restaurant=restaurant,
+            plat=plat, variant=variant, tuned_params=tuned_params
+        )
+        # Un autre jeu de backends donne un autre modèle pour les mêmes données
+        if backends != DEFAULT_BACKENDS:
+            variant = '+'.join(([variant] if variant else []) + backends)
+
+    if cache is None:
+        if not allow_training:
+            raise ModelNotCached(plat)
+        return train_fn(plat_data_agg, features)
+
+    columns = ['Date', 'Quantite'] + features
+    fingerprint = data_fingerprint(plat_data_agg[columns])
+    key = make_model_key(restaurant, plat, fingerprint, features, variant=variant)
+
+    entry = cache.get(key)
+    if entry is not None:
+        return entry['model'], entry['best_name'], entry['metrics']
+
+    lineage_key = make_model_key(restaurant, plat, 'lineage', features, variant=variant)
+    lineage = cache.get(lineage_key)
+    last_date = plat_data_agg['Date'].iloc[-1]
+
+    if monitor is not None and lineage is not None and lineage['data_version'] == fingerprint:
+        # Modèle gardé pour ces données lors d'un précédent rerun
+        current = cache.get(lineage['model_key'])
+        if current is not None:
+            return current['model'], current['best_name'], current['metrics']
+    elif monitor is not None and _extends_lineage(lineage, plat_data_agg, columns):
+        current = cache.get(lineage['model_key'])
+        if current is not None:
+            reference_mae = (current['metrics'] or {}).get(current['best_name'], {}).get('MAE')
+            if not monitor.should_retrain(restaurant, plat, lineage['trained_until'], last_date, reference_mae):
+                # Rattaché aux nouvelles données; trained_until et full_fit_until restent ceux de l'entraînement
+                cache.put(lineage_key, {**lineage, 'data_version': fingerprint, 'trained_rows': len(plat_data_agg)})
+                return current['model'], current['best_name'], current['metrics']
+
+    if not allow_training:
+        raise ModelNotCached(plat)
+
+    previous = _incremental_candidate(lineage, plat_data_agg, columns, cache) if incremental else None
+    best_model = None
+    start = time.perf_counter()
+
+    if previous is not None:
+        best_model = update_model_incrementally(previous['model'], plat_data_agg, features)
+
+    if best_model is not None:
+        best_name = previous['best_name']
+        model_metrics = previous['metrics']
+        training_mode = 'incremental'
+        full_fit_until = lineage['full_fit_until']
+        updates = lineage['updates'] + 1
+    else:
+        best_model, best_name, model_metrics = train_fn(plat_data_agg, features)
+        training_mode = 'full'
+        full_fit_until = last_date
+        updates = 0
+
+    # Format enregistré (forêts réduites à leurs tableaux de nœuds, relus en mmap)
+    backend = backend_for_model(best_model)
+    if backend is not None:
+        best_model = backend.compact(best_model)
+
+    cache.put(key, {
+        'model': best_model,
+        'best_name': best_name,
+        'metrics': model_metrics,
+        'restaurant': restaurant,
+        'plat': plat,
+        'features': features,
+        'data_version': fingerprint,
+        'parent_version': lineage['data_version'] if training_mode == 'incremental' else None,
+        'trained_rows': len(plat_data_agg),
+        'trained_until': last_date,
+        'training_mode': training_mode,
+        'training_s': time.perf_counter() - start
+    })
+
+    cache.put(lineage_key, {
+        'model_key': key,
+        'data_version': fingerprint,
+        'trained_rows': len(plat_data_agg),
+        'trained_until': last_date,
+        'full_fit_until': full_fit_until,
+        'updates': updates
+    })
+
+    return best_model, best_name, model_metrics
+
+
+def predict_sales_ml(df, plat, jours_prevision=7, restaurant=None, cache=None, mode='recursive',
+                     allow_training=True, backends=None, panel=None, tuned_params=None, monitor=None):
+    """Prédictions ML - Note: Les erreurs doivent être gérées par l'appelant
+
+    Si un `cache` (ModelCache) est fourni, le modèle entraîné est réutilisé tant
+    que les données du plat n'ont pas changé: seul le calcul des prévisions est
+    alors effectué.
+
+    `mode='direct'` prévoit tout l'horizon en un seul appel `predict` (voir
+    predict_direct); il bascule sur le mode récursif si l'historique est trop
+    court pour l'horizon demandé. Le mode direct utilise toujours un
+    RandomForest multi-sorties; `backends` ne concerne que le mode récursif.
+
+    Avec `allow_training=False`, lève ModelNotCached si le modèle doit être
+    (ré)entraîné. `panel` (DishPanel de `df`) évite de filtrer toute la table.
+    `tuned_params` ({backend: hyperparamètres}) vient de la recherche hors
+    ligne du plat (voir tuning.py); les valeurs par défaut sinon. Avec un
+    `monitor` (DriftMonitor), le modèle n'est réentraîné qu'en cas de dérive
+    ou au-delà de son âge maximal (voir get_or_train_model).
+    """
+    dataset = build_daily_dataset(df, plat, panel=panel)
+
+    if dataset is None:
+        return None, None, None
+
+    plat_data_agg, features, optional_features = dataset
+
+    if mode == 'direct':
+        result = predict_direct(plat_data_agg, features, optional_features, plat,
+                                jours_prevision, restaurant=restaurant, cache=cache,
+                                allow_training=allow_training, tuned_params=tuned_params, monitor=monitor)
+        if result is not None:
+            return result
+
+    best_model, best_name, model_metrics = get_or_train_model(
+        plat_data_agg, features, plat, restaurant=restaurant, cache=cache,
+        allow_training=allow_training, backends=backends, tuned_params=tuned_params, monitor=monitor
+    )
+
+    last_row = plat_data_agg.iloc[-1]
+    derniere_date = last_row['Date']
+    future_dates = pd.date_range(derniere_date + timedelta(days=1), periods=jours_prevision)
+
+    # Les lags manquants (historique < 14 jours) valent la dernière quantité connue
+    quantites = plat_data_agg['Quantite'].to_numpy(dtype=float)
+    buffer = LagRingBuffer.from_series([quantites], pad='last')
+
+    static = last_row[optional_features].to_numpy(dtype=float).reshape(1, -1)
+
+    pred_quantites, bands = recursive_forecast(
+        best_model, buffer, future_dates, features,
+        tendance=np.array([last_row['Tendance']], dtype=float),
+        static=static, static_features=optional_features, with_bands=True
+    )
+    pred_quantites = pred_quantites[0]
+    # Bandes des arbres de la forêt, ou erreurs de validation des autres modèles
+    bands = bands[0] if bands is not None else residual_bands(pred_quantites, model_metrics, best_name)
+
+    pred_df = forecast_frame(future_dates, pred_quantites, bands)
+
+    return pred_df, model_metrics, best_name
+
+
+FORECAST_MODES = {
+    'recursive': 'Récursif (jour par jour)',
+    'direct': 'Direct multi-horizon'
+}
+
+# Nombre minimum de jours d'origine pour entraîner un modèle direct
+MIN_DIRECT_ORIGINS = 14
+
+
+def build_direct_dataset(plat_data_agg, features, optional_features, horizon):
+    """Construit les exemples du mode direct: features à l'origine -> H jours suivants
+
+    Pour chaque jour d'origine t, les features sont celles que le mode récursif
+    utiliserait pour prévoir t+1 (lags, moyennes mobiles, calendrier de t+1) et
+    les cibles sont les quantités des `horizon` jours suivants.
+
+    Retourne (X, Y, X_last) ou None si l'historique est trop court.
+    """
+    window = LagRingBuffer.WINDOW
+    quantites = plat_data_agg['Quantite'].to_numpy(dtype=float)
+    n_rows = len(quantites)
+
+    # Origines avec 14 jours d'historique et `horizon` jours de cibles
+    n_origins = n_rows - window + 1 - horizon
+    if n_origins < MIN_DIRECT_ORIGINS:
+        return None
+
+    windows = np.lib.stride_tricks.sliding_window_view(quantites, window)  # (n_rows - 13, 14)
+    last7 = windows[:, -7:]
+
+    origin_features = pd.DataFrame({
+        'Lag_1': windows[:, -1],
+        'Lag_3': windows[:, -3],
+        'Lag_7': windows[:, -7],
+        'Lag_14': windows[:, -14],
+        'Moyenne_Mobile_7': last7.mean(axis=1),
+        'Moyenne_Mobile_14': windows.mean(axis=1),
+        'Ecart_Type_7': last7.std(axis=1, ddof=1),
+        'Tendance': plat_data_agg['Tendance'].to_numpy(dtype=float)[window - 1:] + 1
+    })
+
+    # Calendrier du premier jour prévu (jour suivant l'origine)
+    next_dates = pd.DatetimeIndex(plat_data_agg['Date'])[window - 1:] + timedelta(days=1)
+    calendar = calendar_features(next_dates)
+    for feat in CALENDAR_FEATURES:
+        origin_features[feat] = calendar[feat].to_numpy()
+
+    for feat in optional_features:
+        origin_features[feat] = plat_data_agg[feat].to_numpy(dtype=float)[window - 1:]
+
+    X_all = origin_features[features].to_numpy(dtype=float)
+    Y = np.lib.stride_tricks.sliding_window_view(quantites[window:], horizon)[:n_origins]
+
+    return X_all[:n_origins], Y, X_all[-1:]
+
+
+def train_direct_model(X, Y, params=None):
+    """Entraîne un RandomForest multi-sorties (une sortie par jour d'horizon)"""
+    split = int(len(X) * 0.8)
+    model_metrics = {}
+
+    model = get_backend('RandomForest').create(TRAINING_N_JOBS, **(params or {}))
+
+    if split < len(X):
+        model.fit(X[:split], Y[:split])
+        predictions = model.predict(X[split:])
+        y_test = Y[split:]
+        model_metrics['RandomForest'] = {
+            'MAE': mean_absolute_error(y_test, predictions),
+            'RMSE': np.sqrt(mean_squared_error(y_test, predictions)),
+            'MAPE': mean_absolute_percentage_error(y_test, predictions) * 100
+        }
+
+    # Le modèle final voit aussi les origines les plus récentes
+    model.fit(X, Y)
+
+    return model, 'RandomForest', model_metrics
+
+
+def predict_direct(plat_data_agg, features, optional_features, plat, jours_prevision,
+                   restaurant=None, cache=None, allow_training=True, tuned_params=None, monitor=None):
+    """Prévision directe de tout l'horizon en un seul appel `predict`
+
+    Aucune prévision n'est réinjectée: les erreurs ne se cumulent pas et les
+    jours de l'horizon sont calculés ensemble. La forêt utilise les
+    hyperparamètres RandomForest de `tuned_params` s'il y en a.
+
+    Retourne (pred_df, model_metrics, best_name) ou None si l'historique est
+    trop court pour l'horizon demandé.
+    """
+    direct_dataset = build_direct_dataset(plat_data_agg, features, optional_features, jours_prevision)
+    if direct_dataset is None:
+        return None
+
+    X, Y, X_last = direct_dataset
+    params = (tuned_params or {}).get('RandomForest')
+
+    variant = f"direct_{jours_prevision}"
+    if params:
+        variant += f"+tuned={params_fingerprint(params)}"
+
+    best_model, best_name, model_metrics = get_or_train_model(
+        plat_data_agg, features, plat, restaurant=restaurant, cache=cache,
+        train_fn=lambda data, feats: train_direct_model(X, Y, params),
+        variant=variant, allow_training=allow_training, monitor=monitor
+    )
+
+    pred_quantites, bands = predict_with_quantiles(best_model, X_last)
+    pred_quantites = np.maximum(0, pred_quantites).reshape(-1)
+    if bands is not None:
+        bands = np.maximum(0, bands.reshape(jours_prevision, len(FORECAST_QUANTILES)))
+
+    future_dates = pd.date_range(plat_data_agg['Date'].iloc[-1] + timedelta(days=1), periods=jours_prevision)
+
+    return forecast_frame(future_dates, pred_quantites, bands), model_metrics, best_name
+
+
+GLOBAL_MODEL_NAME = '__global__'
+
+FORECAST_ENGINES = {
+    'per_dish': 'Un modèle par plat',
+    'global': 'Modèle global multi-plats',
+    'tiered': 'Par paliers (modèles simples puis ML)',
+    'hierarchical': 'Hiérarchique (catégories puis parts par plat)'
+}
+
+
+def _dominant_code(series):
+    """Code de la modalité la plus fréquente d'une série catégorielle encodée"""
+    return series.mode().iloc[0] if len(series) > 0 else -1
+
+
+def build_global_dataset(df):
+    """Construit le panel empilé (plat x jour) de tous les plats d'un restaurant
+
+    Le plat, sa catégorie et son service sont encodés en features afin qu'un
+    seul modèle apprenne tous les plats. Chaque plat est placé sur un calendrier
+    continu, de sa première vente au dernier jour du restaurant (jours sans
+    vente à 0): comme pour le modèle par plat, les lags et moyennes mobiles
+    portent sur de vrais jours calendaires. Les lags indisponibles (début
+    d'historique, plats récents) sont remplacés par la moyenne du plat, ce qui
+    permet de prévoir aussi les plats peu vendus.
+
+    Retourne (panel, features, dish_info) ou None si les données sont vides.
+    """
+    if df is None or len(df) == 0:
+        return None
+
+    data = df[['Date', 'Plat', 'Quantite']].copy()
+    data['Plat'] = data['Plat'].astype(str)
+    data['Date'] = data['Date'].dt.normalize()
+
+    plats = sorted(data['Plat'].unique())
+    data['Plat_encoded'] = pd.Categorical(data['Plat'], categories=plats).codes
+
+    agg_dict = {'Quantite': 'sum', 'Plat_encoded': 'first'}
+    static_features = ['Plat_encoded']
+
+    if 'Categorie' in df.columns:
+        data['Categorie_encoded'] = df['Categorie'].astype(str).astype('category').cat.codes.values
+        agg_dict['Categorie_encoded'] = 'first'
+        static_features.append('Categorie_encoded')
+
+    if 'Service' in df.columns:
+        data['Service_encoded'] = df['Service'].astype(str).astype('category').cat.codes.values
+        agg_dict['Service_encoded'] = 'first'
+        static_features.append('Service_encoded')
+
+    if 'Prix_unitaire' in df.columns:
+        data['Prix_unitaire'] = pd.to_numeric(df['Prix_unitaire'], errors='coerce').values
+        agg_dict['Prix_unitaire'] = 'mean'
+        static_features.append('Prix_unitaire')
+
+    panel = data.groupby(['Plat', 'Date']).agg(agg_dict)
+
+    # Calendrier continu de chaque plat: caractéristiques du dernier jour vendu
+    last_date = data['Date'].max()
+    first_sale = panel.reset_index().groupby('Plat')['Date'].min()
+    lengths = (last_date - first_sale).dt.days.to_numpy() + 1
+    offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    calendar = pd.MultiIndex.from_arrays([
+        np.repeat(first_sale.index.to_numpy(), lengths),
+        np.repeat(first_sale.to_numpy(), lengths) + offsets.astype('timedelta64[D]')
+    ], names=['Plat', 'Date'])
+    panel = panel.reindex(calendar)
+    panel['Quantite'] = panel['Quantite'].fillna(0)
+    panel[static_features] = panel.groupby(level='Plat')[static_features].ffill()
+    panel = panel.reset_index()
+
+    if 'Prix_unitaire' in panel.columns:
+        panel['Prix_unitaire'] = panel.groupby('Plat')['Prix_unitaire'].transform(lambda x: x.fillna(x.mean())).fillna(0)
+
+    grouped = panel.groupby('Plat')['Quantite']
+    plat_mean = grouped.transform('mean')
+    history = grouped.apply(lambda x: x.to_numpy(dtype=float)).to_dict()
+
+    for lag in [1, 3, 7, 14]:
+        panel[f'Lag_{lag}'] = grouped.shift(lag)
+
+    # Les moyennes mobiles incluent le jour courant, comme le modèle par plat
+    panel['Moyenne_Mobile_7'] = grouped.transform(lambda x: x.rolling(window=7, min_periods=1).mean())
+    panel['Moyenne_Mobile_14'] = grouped.transform(lambda x: x.rolling(window=14, min_periods=1).mean())
+    panel['Ecart_Type_7'] = grouped.transform(lambda x: x.rolling(window=7, min_periods=1).std()).fillna(0)
+
+    # Seule la première vente d'un plat n'a aucun historique exploitable
+    panel = panel[panel['Lag_1'].notna()].copy()
+    for lag in [3, 7, 14]:
+        panel[f'Lag_{lag}'] = panel[f'Lag_{lag}'].fillna(plat_mean[panel.index])
+
+    if len(panel) == 0:
+        return None
+
+    first_date = panel['Date'].min()
+    panel['Tendance'] = (panel['Date'] - first_date).dt.days
+    panel = create_features(panel)
+    panel = panel.sort_values(['Date', 'Plat']).reset_index(drop=True)
+
+    features = BASE_FEATURES + static_features
+
+    # Dernier état connu de chaque plat, y compris les plats sans historique
+    dish_static = data.groupby('Plat').agg({feat: (_dominant_code if feat.endswith('_encoded') else 'mean')
+                                           for feat in static_features})
+    dish_info = {
+        'plats': plats,
+        'history': history,
+        'static': dish_static.reindex(plats).fillna(0),
+        'static_features': static_features,
+        'first_date': first_date,
+        'last_date': last_date
+    }
+
+    return panel, features, dish_info
+
+
+def predict_sales_global(df, jours_prevision=7, restaurant=None, cache=None, backends=None):
+    """Prévisions de tous les plats avec un seul modèle global
+
+    Un seul entraînement par restaurant; à chaque jour futur, tous les plats
+    sont prévus en un seul appel `predict`.
+
+    Retourne ({plat: pred_df}, model_metrics, best_name).
+    """
+    dataset = build_global_dataset(df)
+
+    if dataset is None:
+        return {}, None, None
+
+    panel, features, dish_info = dataset
+
+    best_model, best_name, model_metrics = get_or_train_model(
+        panel, features, GLOBAL_MODEL_NAME, restaurant=restaurant, cache=cache, backends=backends
+    )
+
+    plats = dish_info['plats']
+
+    # Historique des 14 derniers jours calendaires de chaque plat, complété par
+    # la moyenne du plat si trop court
+    buffer = LagRingBuffer.from_series([dish_info['history'][plat] for plat in plats], pad='mean')
+
+    static = dish_info['static'][dish_info['static_features']].to_numpy(dtype=float)
+    derniere_date = dish_info['last_date']
+    last_tendance = (derniere_date - dish_info['first_date']).days
+    future_dates = pd.date_range(derniere_date + timedelta(days=1), periods=jours_prevision)
+
+    pred_quantites, bands = recursive_forecast(
+        best_model, buffer, future_dates, features,
+        tendance=np.full(len(plats), last_tendance, dtype=float),
+        static=static, static_features=dish_info['static_features'], with_bands=True
+    )
+
+    forecasts = {
+        plat: forecast_frame(future_dates, pred_quantites[i], bands[i] if bands is not None else
+                             residual_bands(pred_quantites[i], model_metrics, best_name))
+        for i, plat in enumerate(plats)
+    }
+
+    return forecasts, model_metrics, best_name
+
+
+# Pool de processus partagé par toutes les sessions: le nombre de processus
+# d'entraînement simultanés reste borné par le nombre de cœurs
+_training_executor = None
+_training_executor_lock = threading.Lock()
+
+
+def training_workers():
+    """Nombre de processus du pool d'entraînement (un par cœur)"""
+    return max(1, os.cpu_count() or 1)
+
+
+def inner_n_jobs(max_workers):
+    """n_jobs de chaque modèle pour que workers x n_jobs ne dépasse pas les cœurs"""
+    return max(1, (os.cpu_count() or 1) // max(1, max_workers))
+
+
+def _init_training_worker(n_jobs):
+    """Initialise un worker: borne les threads joblib, OpenMP et BLAS"""
+    global TRAINING_N_JOBS
+    TRAINING_N_JOBS = n_jobs
+
+    from threadpoolctl import threadpool_limits
+    threadpool_limits(limits=n_jobs)
+
+
+def get_training_executor(max_workers=None):
+    """Retourne le pool de processus d'entraînement partagé (créé à la demande)"""
+    global _training_executor
+
+    with _training_executor_lock:
+        if _training_executor is None:
+            max_workers = max_workers or training_workers()
+            # spawn: pas de fork d'un serveur Streamlit multi-threadé
+            _training_executor = ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_training_worker,
+                initargs=(inner_n_jobs(max_workers),)
+            )
+        return _training_executor
+
+
+def shutdown_training_executor():
+    """Arrête le pool d'entraînement (il sera recréé au prochain besoin)"""
+    global _training_executor
+
+    with _training_executor_lock:
+        if _training_executor is not None:
+            _training_executor.shutdown(wait=True, cancel_futures=True)
+            _training_executor = None
+
+
+def _train_dish_worker(plat_df, plat, horizon, restaurant, cache, mode, backends, tuned_params):
+    """Tâche exécutée dans un worker: entraîne le modèle d'un plat et le prévoit"""
+    start = time.perf_counter()
+    pred, metrics, best_name = predict_sales_ml(
+        plat_df, plat, horizon, restaurant=restaurant, cache=cache, mode=mode, backends=backends,
+        tuned_params=tuned_params
+    )
+    return pred, metrics, best_name, time.perf_counter() - start
+
+
+def forecast_dishes_parallel(df, plats, horizon, restaurant=None, cache=None, mode='recursive',
+                             max_workers=None, backends=None, panel=None, tuned_params=None, monitor=None):
+    """Prévoit plusieurs plats en répartissant les entraînements sur le pool
+
+    Les plats dont le modèle est déjà en cache sont prévus directement dans le
+    processus courant; seuls les plats à (ré)entraîner sont envoyés au pool,
+    avec leurs seules lignes de ventes. Les résultats sont produits au fil de
+    l'eau, dans l'ordre de fin des entraînements. `tuned_params` donne les
+    hyperparamètres de chaque plat ({plat: {backend: hyperparamètres}}).
+    Le `monitor` (DriftMonitor) décide, dans le processus courant, quels
+    modèles en place peuvent être gardés; seuls les autres partent au pool.
+    `horizon` est un nombre de jours commun ou un dictionnaire {plat: jours}.
+
+    Génère des tuples (plat, pred_df, model_metrics, best_name, erreur, durée).
+    """
+    horizons = horizon if isinstance(horizon, dict) else dict.fromkeys(plats, horizon)
+    if panel is not None:
+        plat_frames = {plat: panel.rows(plat) for plat in plats if plat in panel}
+    else:
+        plat_frames = {plat: plat_df for plat, plat_df in df.groupby('Plat', sort=False)}
+    tuned_params = tuned_params or {}
+    to_train = []
+
+    for plat in plats:
+        plat_df = plat_frames.get(plat, df.iloc[:0])
+        start = time.perf_counter()
+        try:
+            pred, metrics, best_name = predict_sales_ml(
+                plat_df, plat, horizons[plat], restaurant=restaurant, cache=cache, mode=mode,
+                allow_training=False, backends=backends, tuned_params=tuned_params.get(plat), monitor=monitor
+            )
+            yield plat, pred, metrics, best_name, None, time.perf_counter() - start
+        except ModelNotCached:
+            to_train.append(plat)
+        except Exception as e:
+            yield plat, None, None, None, e, time.perf_counter() - start
+
+    max_workers = max_workers or training_workers()
+
+    if len(to_train) < 2 or max_workers < 2:
+        for plat in to_train:
+            start = time.perf_counter()
+            try:
+                pred, metrics, best_name = predict_sales_ml(
+                    plat_frames[plat], plat, horizons[plat], restaurant=restaurant, cache=cache, mode=mode,
+                    backends=backends, tuned_params=tuned_params.get(plat)
+                )
+                yield plat, pred, metrics, best_name, None, time.perf_counter() - start
+            except Exception as e:
+                yield plat, None, None, None, e, time.perf_counter() - start
+        return
+
+    executor = get_training_executor(max_workers)
+    futures = {
+        executor.submit(_train_dish_worker, plat_frames[plat], plat, horizons[plat], restaurant, cache, mode,
+                        backends, tuned_params.get(plat)): plat
+        for plat in to_train
+    }
+
+    for future in as_completed(futures):
+        plat = futures[future]
+        try:
+            pred, metrics, best_name, duration = future.result()
+            yield plat, pred, metrics, best_name, None, duration
+        except Exception as e:
+            yield plat, None, None, None, e, None
+
+
+# Un plat reste sur les modèles de référence si leur erreur (MAE) sur les
+# TIER_HOLDOUT_DAYS derniers jours ne dépasse pas TIER_MAX_WAPE x ses ventes
+# moyennes, ou TIER_MIN_MAE portion pour les plats peu vendus
+TIER_HOLDOUT_DAYS = 14
+TIER_MAX_WAPE = 0.25
+TIER_MIN_MAE = 1.0
+
+
+def predict_sales_tiered(df, jours_prevision=7, restaurant=None, cache=None, mode='recursive',
+                         progress=None, backends=None, max_workers=None, panel=None, tuned_params=None,
+                         monitor=None):
+    """Prévisions par paliers: modèles de référence d'abord, ensembles ML ensuite
+
+    Les modèles de référence (voir baselines.py) sont évalués pour tous les
+    plats à la fois sur les derniers jours. Seuls les plats pour lesquels aucun
+    n'atteint le seuil d'erreur passent au palier ML (predict_sales_ml, en
+    parallèle sur le pool d'entraînement).
+
+    Retourne ({plat: pred_df}, rapport) où le rapport donne, par plat, le palier,
+    le modèle retenu, ses métriques, sa MAE et la durée de calcul.
+    """
+    start = time.perf_counter()
+    dates, plats, values = panel.sales_matrix() if panel is not None else build_sales_matrix(df)
+    n_days = len(dates)
+
+    forecasts = {}
+    report = {}
+
+    # Au moins deux semaines d'historique avant la période d'évaluation
+    scorable = n_days >= TIER_HOLDOUT_DAYS + 14
+    accepted = np.zeros(len(plats), dtype=bool)
+
+    if scorable:
+        scores = score_baselines(values, dates, holdout=TIER_HOLDOUT_DAYS, quantiles=FORECAST_QUANTILES)
+        maes = np.vstack([scores[name]['MAE'] for name in BASELINES])
+        maes = np.where(np.isnan(maes), np.inf, maes)
+        best = maes.argmin(axis=0)
+        best_mae = maes.min(axis=0)
+
+        mean_level = np.nan_to_num(values[-28:]).mean(axis=0)
+        history_days = np.sum(~np.isnan(values[:-TIER_HOLDOUT_DAYS]), axis=0)
+        accepted = (history_days >= 14) & (best_mae <= np.maximum(TIER_MIN_MAE, TIER_MAX_WAPE * mean_level))
+
+        future_dates = pd.date_range(dates[-1] + timedelta(days=1), periods=jours_prevision)
+        baseline_forecasts = forecast_baselines(values, jours_prevision, dates)
+        names = list(BASELINES)
+
+    baseline_plats = [i for i in range(len(plats)) if accepted[i]]
+    duration = (time.perf_counter() - start) / max(1, len(baseline_plats))
+
+    for i in baseline_plats:
+        plat = plats[i]
+        name = names[best[i]]
+        metrics = {BASELINE_NAMES[n]: {metric: float(scores[n][metric][i]) for metric in ('MAE', 'RMSE', 'MAPE')}
+                   for n in names if np.isfinite(maes[names.index(n), i])}
+        # Bandes: prévision + quantiles des erreurs du modèle sur la période d'évaluation
+        residual_quantiles = scores[name]['residual_quantiles'][:, i]
+        bands = (np.maximum(0, baseline_forecasts[name][:, i, None] + residual_quantiles[None, :])
+                 if np.isfinite(residual_quantiles).all() else None)
+        forecasts[plat] = forecast_frame(future_dates, baseline_forecasts[name][:, i], bands)
+        report[plat] = {
+            'tier': 'baseline',
+            'model': BASELINE_NAMES[name],
+            'metrics': metrics,
+            'MAE': float(best_mae[i]),
+            'duration': duration
+        }
+
+    if progress is not None and baseline_plats:
+        progress(len(baseline_plats), len(plats), None)
+
+    escalated = [plats[i] for i in range(len(plats)) if not accepted[i]]
+    results = forecast_dishes_parallel(df, escalated, jours_prevision, restaurant=restaurant,
+                                       cache=cache, mode=mode, max_workers=max_workers, backends=backends,
+                                       panel=panel, tuned_params=tuned_params, monitor=monitor)
+
+    for done, (plat, pred, metrics, best_name, error, duration) in enumerate(results, start=len(baseline_plats) + 1):
+        if error is not None:
+            report[plat] = {'tier': 'ml', 'model': None, 'metrics': None, 'MAE': None,
+                            'duration': duration, 'error': error}
+        elif pred is not None:
+            forecasts[plat] = pred
+            report[plat] = {
+                'tier': 'ml',
+                'model': best_name,
+                'metrics': metrics,
+                'MAE': metrics[best_name]['MAE'] if metrics else None,
+                'duration': duration
+            }
+
+        if progress is not None:
+            progress(done, len(plats), plat)
+
+    return forecasts, report
+
+
+# Moteur hiérarchique: un modèle par catégorie (ou pour le total du restaurant)
+# et la part de chaque plat dans sa catégorie
+HIERARCHY_TOTAL = '__total__'
+HIERARCHY_CATEGORY_PREFIX = '__categorie__'
+# Jours récents sur lesquels la part de chaque plat est estimée
+SHARE_WINDOW_DAYS = 56
+# Occurrences minimales d'un jour de semaine pour lui donner une part propre
+SHARE_MIN_WEEKDAYS = 3
+
+
+def hierarchy_label(group):
+    """Nom affiché d'un groupe de la hiérarchie"""
+    if group == HIERARCHY_TOTAL:
+        return 'Total restaurant'
+    return group[len(HIERARCHY_CATEGORY_PREFIX):]
+
+
+def dish_groups(df, plats):
+    """Groupe de chaque plat: sa catégorie la plus fréquente, sinon le total du restaurant"""
+    if 'Categorie' not in df.columns:
+        return {plat: HIERARCHY_TOTAL for plat in plats}
+
+    categorized = df[df['Categorie'].notna()]
+    categories = categorized.groupby('Plat')['Categorie'].agg(lambda s: s.astype(str).value_counts().index[0])
+    return {plat: HIERARCHY_CATEGORY_PREFIX + categories.get(plat, 'Sans catégorie') for plat in plats}
+
+
+def dish_shares(values, dates, window=SHARE_WINDOW_DAYS):
+    """Part de chaque plat dans le total de son groupe, par jour de semaine (7 x plats)
+
+    `values` contient les ventes journalières des plats d'un même groupe (NaN
+    avant la première vente). Chaque part est estimée sur les jours où le plat
+    était déjà vendu: un nouveau plat reçoit d'emblée sa part récente. Les
+    parts d'un même jour de semaine sont normalisées à 1.
+    """
+    recent = values[-window:]
+    weekdays = dates[-len(recent):].dayofweek.to_numpy()
+    active = ~np.isnan(recent)
+    sales = np.nan_to_num(recent)
+    # Total du groupe, compté seulement les jours où chaque plat était vendu
+    totals = sales.sum(axis=1, keepdims=True) * active
+
+    overall_total = totals.sum(axis=0)
+    overall = np.divide(sales.sum(axis=0), overall_total, out=np.zeros(values.shape[1]), where=overall_total > 0)
+    shares = np.tile(overall, (7, 1))
+
+    for weekday in range(7):
+        rows = weekdays == weekday
+        weekday_total = totals[rows].sum(axis=0)
+        usable = (active[rows].sum(axis=0) >= SHARE_MIN_WEEKDAYS) & (weekday_total > 0)
+        shares[weekday, usable] = sales[rows].sum(axis=0)[usable] / weekday_total[usable]
+
+    sums = shares.sum(axis=1, keepdims=True)
+    return np.where(sums > 0, shares / np.where(sums > 0, sums, 1), 1 / values.shape[1])
+
+
+def reconcile_integer(shares, totals):
+    """Répartit des totaux entiers selon des parts (méthode des plus forts restes)
+
+    `shares` (jours x plats, lignes de somme 1) et `totals` (jours): chaque
+    jour, les quantités entières des plats ont exactement le total pour somme.
+    """
+    raw = shares * totals[:, None]
+    floors = np.floor(raw)
+    missing = np.rint(totals - floors.sum(axis=1)).astype(int)
+    ranks = np.argsort(np.argsort(floors - raw, axis=1, kind='stable'), axis=1, kind='stable')
+    return (floors + (ranks < missing[:, None])).astype(int)
+
+
+def predict_sales_hierarchical(df, jours_prevision=7, restaurant=None, cache=None, mode='recursive',
+                               progress=None, backends=None, max_workers=None, panel=None, monitor=None):
+    """Prévisions hiérarchiques: un modèle par catégorie, réparti entre ses plats
+
+    Les ventes sont regroupées par catégorie (colonne Categorie) ou, à défaut,
+    en un total du restaurant. Seuls ces groupes reçoivent un modèle ML (voir
+    predict_sales_ml, en parallèle sur le pool d'entraînement); chaque plat
+    reçoit la part qu'il représente dans son groupe (voir dish_shares). La
+    répartition est réconciliée en entiers: chaque jour, la somme des plats
+    égale la prévision du groupe. Les plats récents ou peu vendus sont donc
+    prévus eux aussi.
+
+    Retourne ({plat: pred_df}, rapport, {groupe: pred_df}) où le rapport donne,
+    par plat, son groupe, sa part moyenne, le modèle du groupe et la durée.
+    """
+    start = time.perf_counter()
+    dates, plats, values = panel.sales_matrix() if panel is not None else build_sales_matrix(df)
+    groups = dish_groups(df, plats)
+
+    members = {}
+    for i, plat in enumerate(plats):
+        members.setdefault(groups[plat], []).append(i)
+
+    group_frames = []
+    for group, columns in members.items():
+        group_values = values[:, columns]
+        first = int(np.argmax((~np.isnan(group_values)).any(axis=1)))
+        group_frames.append(pd.DataFrame({
+            'Date': dates[first:],
+            'Plat': group,
+            'Quantite': np.nansum(group_values[first:], axis=1)
+        }))
+    group_df = pd.concat(group_frames, ignore_index=True) if group_frames else df.iloc[:0]
+
+    future_dates = pd.date_range(dates[-1] + timedelta(days=1), periods=jours_prevision) if len(dates) else None
+    group_forecasts = {}
+    group_models = {}
+    group_errors = {}
+
+    results = forecast_dishes_parallel(group_df, list(members), jours_prevision, restaurant=restaurant,
+                                       cache=cache, mode=mode, max_workers=max_workers, backends=backends,
+                                       monitor=monitor)
+    for done, (group, pred, metrics, best_name, error, _) in enumerate(results, start=1):
+        if error is not None:
+            group_errors[group] = error
+        if pred is None:
+            # Historique du groupe trop court pour un modèle ML (ou erreur)
+            history = np.nan_to_num(values[:, members[group]]).sum(axis=1, keepdims=True)
+            pred = forecast_frame(future_dates, np.nan_to_num(weekday_mean(history, jours_prevision, dates)[:, 0]))
+            best_name = BASELINE_NAMES['weekday_mean']
+        group_forecasts[group] = pred
+        group_models[group] = best_name
+
+        if progress is not None:
+            progress(done, len(members), hierarchy_label(group))
+
+    forecasts = {}
+    report = {}
+    duration = (time.perf_counter() - start) / max(1, len(plats))
+    future_weekdays = future_dates.dayofweek.to_numpy() if future_dates is not None else None
+
+    for group, columns in members.items():
+        shares = dish_shares(values[:, columns], dates)[future_weekdays]
+        group_pred = group_forecasts[group]
+        quantities = reconcile_integer(shares, group_pred['Quantite_Prevue'].to_numpy())
+        # Bandes du groupe réparties selon les mêmes parts
+        group_bands = (group_pred[QUANTILE_COLUMNS].to_numpy(dtype=float)
+                       if all(column in group_pred.columns for column in QUANTILE_COLUMNS) else None)
+
+        for j, i in enumerate(columns):
+            bands = shares[:, j, None] * group_bands if group_bands is not None else None
+            forecasts[plats[i]] = forecast_frame(future_dates, quantities[:, j], bands)
+            report[plats[i]] = {
+                'tier': 'hierarchical',
+                'model': group_models[group],
+                'metrics': None,
+                'MAE': None,
+                'duration': duration,
+                'group': hierarchy_label(group),
+                'share': float(shares[:, j].mean())
+            }
+            if group in group_errors:
+                report[plats[i]]['error'] = group_errors[group]
+
+    return forecasts, report, {hierarchy_label(group): pred for group, pred in group_forecasts.items()}
+
+
+class ForecastService:
+    """Prévisions partagées entre les onglets pendant un même rerun
+
+    Chaque plat n'est prévu qu'une seule fois, à l'horizon le plus long demandé
+    par les onglets; chaque consommateur reçoit ensuite une tranche de cette
+    prévision. Les prévisions récursives étant calculées jour après jour, les
+    N premiers jours d'un horizon long sont identiques à une prévision à N jours.
+    En mode direct, le modèle entraîné pour l'horizon long sert tous les onglets.
+
+    Avec un `store` (ForecastStore), les prévisions précalculées par le
+    traitement par lots sont relues tant que les données et la configuration
+    n'ont pas changé; les prévisions calculées en direct y sont enregistrées.
+
+    `tuned_params` ({plat: {backend: hyperparamètres}}, voir tuning.py) est
+    utilisé par les modèles par plat; les plats absents gardent les valeurs
+    par défaut.
+
+    Avec un `monitor` (DriftMonitor, voir drift_monitor.py), les prévisions
+    émises sont enregistrées, comparées aux ventes dès qu'elles arrivent, et
+    un modèle n'est réentraîné que s'il dérive ou a dépassé son âge maximal
+    (sauf modèle global, réentraîné à chaque changement des données).
+    """
+
+    def __init__(self, df, restaurant=None, cache=None, horizon=FORECAST_HORIZON, on_error=None,
+                 engine='per_dish', mode='recursive', backends=None, store=None, max_workers=None,
+                 tuned_params=None, monitor=None):
+        self.df = df
+        self.restaurant = restaurant
+        self.cache = cache
+        self.horizon = horizon
+        self.on_error = on_error
+        self.engine = engine if engine in FORECAST_ENGINES else 'per_dish'
+        self.mode = mode if mode in FORECAST_MODES else 'recursive'
+        self.backends = resolve_backends(backends)
+        self.store = store
+        self.max_workers = max_workers
+        self.tuned_params = tuned_params or {}
+        self.monitor = monitor
+        self._forecasts = {}
+        # Prévisions de tous les plats empilées (Plat, Date, Jour, Quantite_Prevue, P10, P50, P90), voir forecast()
+        self._table = None
+        self._store_checked = False
+        self._data_version = None
+        self._panel = None
+        # Date de calcul des prévisions relues depuis le store (None si calculées en direct)
+        self.precomputed_at = None
+        # Moteurs par paliers et hiérarchique: palier, modèle, MAE et durée de chaque plat
+        self.tier_report = {}
+        # Moteur hiérarchique: prévisions de chaque catégorie (ou du total)
+        self.group_forecasts = {}
+
+        # Nouvelles ventes: les prévisions émises pour ces jours sont évaluées (une fois par version des données)
+        if self.monitor is not None and not self.monitor.has_observed(self.restaurant, self.data_version):
+            self.monitor.observe(self.restaurant, self.panel, version=self.data_version)
+            self.monitor.save()
+
+    @property
+    def data_version(self):
+        """Empreinte des données, calculée une seule fois"""
+        if self._data_version is None:
+            self._data_version = forecast_data_version(self.df)
+        return self._data_version
+
+    @property
+    def panel(self):
+        """Ventes partitionnées par plat (voir dish_panel.py), partagées entre les reruns"""
+        if self._panel is None:
+            self._panel = get_dish_panel(self.df, self.data_version)
+        return self._panel
+
+    @property
+    def config(self):
+        """Configuration de prévision enregistrée avec les prévisions précalculées"""
+        config = {'engine': self.engine, 'mode': self.mode, 'backends': self.backends}
+        if self.tuned_params:
+            config['tuning'] = params_fingerprint(self.tuned_params)
+        return config
+
+    def load_precomputed(self):
+        """Relit les prévisions enregistrées du restaurant; retourne True si elles couvrent l'horizon
+
+        Les prévisions plus courtes (calculées par forecast()) sont aussi relues:
+        seuls les plats à prévoir plus loin sont recalculés.
+        """
+        self._store_checked = True
+        if self.store is None:
+            return False
+
+        entry = self.store.load(self.restaurant, self.data_version, self.config, 0)
+        if entry is None:
+            return False
+
+        # Prévisions déjà enregistrées dans le moniteur par le calcul qui les a produites
+        for plat, result in entry['forecasts'].items():
+            self._set_result(plat, result.get('horizon', entry['horizon']), result['pred'], result['metrics'],
+                             result['best_name'], record=False)
+        self.tier_report = entry['tier_report']
+
+        if entry['horizon'] < self.horizon:
+            return False
+        self.precomputed_at = entry['generated_at']
+        return True
+
+    def save_precomputed(self):
+        """Enregistre les prévisions calculées dans le store, avec l'horizon de chaque plat"""
+        if self.store is None or not self._forecasts:
+            return
+
+        self.store.save(
+            self.restaurant, self.data_version, self.config,
+            min(result['horizon'] for result in self._forecasts.values()),
+            {plat: {key: result[key] for key in ('horizon', 'pred', 'metrics', 'best_name')}
+             for plat, result in self._forecasts.items()},
+            tier_report=self.tier_report
+        )
+
+    def get(self, plat, jours_prevision=None):
+        """Retourne (pred_df, model_metrics, best_name) pour un plat sur `jours_prevision` jours"""
+        jours_prevision = jours_prevision or self.horizon
+
+        if plat not in self._forecasts or self._forecasts[plat]['horizon'] < jours_prevision:
+            self._compute(plat, max(self.horizon, jours_prevision))
+
+        result = self._forecasts[plat]
+        if result['pred'] is None:
+            return None, None, None
+
+        return result['pred'].head(jours_prevision).copy(), result['metrics'], result['best_name']
+
+    def prefetch(self, plats=None, progress=None, refresh=False):
+        """Calcule d'avance les prévisions de tous les plats
+
+        En mode « un modèle par plat », les entraînements nécessaires sont
+        répartis sur le pool de processus (voir forecast_dishes_parallel).
+        `progress(done, total, plat)` est appelé à chaque plat terminé.
+        `refresh=True` ignore les prévisions précalculées du store.
+        Retourne le nombre de plats disposant d'une prévision.
+        """
+        if not self._store_checked and not refresh:
+            self.load_precomputed()
+
+        plats = self.df['Plat'].unique() if plats is None else plats
+        missing = [plat for plat in plats
+                   if plat not in self._forecasts or self._forecasts[plat]['horizon'] < self.horizon]
+
+        if missing:
+            self._compute_many(missing, self.horizon, progress=progress)
+            self.save_precomputed()
+        return sum(self._forecasts[plat]['pred'] is not None for plat in plats if plat in self._forecasts)
+
+    def forecast(self, dates, plats=None):
+        """Prévisions de `plats` (tous par défaut) pour exactement les dates `dates`
+
+        Retourne un tableau (Plat, Date, Jour, Quantite_Prevue, P10, P50, P90) limité aux dates
+        demandées. Comme dans les onglets, un plat n'est prévu que sur les
+        `horizon` jours qui suivent sa dernière vente: les dates passées, au-delà
+        de cette fenêtre (plats qui ne se vendent plus) ou sans prévision sont
+        absentes. En mode récursif, chaque plat n'est prévu que jusqu'à sa date
+        demandée la plus lointaine, sauf si une prévision plus longue est déjà
+        disponible; le mode direct et les moteurs multi-plats prévoient à
+        l'horizon du service (un seul modèle par plat). Les prévisions calculées
+        sont enregistrées dans le store.
+        """
+        if not self._store_checked:
+            self.load_precomputed()
+
+        dates = pd.DatetimeIndex(pd.to_datetime(pd.Series(list(dates), dtype=object))).normalize().unique()
+        plats = self.panel.plats if plats is None else [plat for plat in plats if plat in self.panel]
+        last_sale = self.panel.last_sale_dates().reindex(plats)
+
+        # Jours entre la dernière vente de chaque plat et chaque date demandée, dans la fenêtre de l'horizon
+        days = (dates.to_numpy()[None, :] - last_sale.to_numpy()[:, None]) // np.timedelta64(1, 'D')
+        in_window = (days > 0) & (days <= self.horizon)
+        needed = pd.Series(np.where(in_window, days, 0).max(axis=1, initial=0), index=plats)
+        needed = needed[needed > 0]
+
+        missing = {plat: int(horizon) for plat, horizon in needed.items()
+                   if plat not in self._forecasts or self._forecasts[plat]['horizon'] < horizon}
+        if missing:
+            per_dish = self.engine == 'per_dish' and self.mode == 'recursive'
+            self._compute_many(list(missing), missing if per_dish else self.horizon)
+            self.save_precomputed()
+
+        table = self._forecast_table()
+        window_end = table['Plat'].map(last_sale[needed.index] + pd.Timedelta(days=self.horizon))
+        return table[table['Date'].isin(dates) & table['Plat'].isin(needed.index)
+                     & (table['Date'] <= window_end)].reset_index(drop=True)
+
+    def get_all(self, jours_prevision=None, plats=None):
+        """Retourne {plat: pred_df} pour tous les plats disposant d'une prévision"""
+        plats = self.df['Plat'].unique() if plats is None else plats
+        self.prefetch(plats)
+        forecasts = {}
+        for plat in plats:
+            pred, _, _ = self.get(plat, jours_prevision)
+            if pred is not None:
+                forecasts[plat] = pred
+        return forecasts
+
+    def _set_result(self, plat, horizon, pred, metrics, best_name, record=True):
+        self._forecasts[plat] = {
+            'horizon': horizon,
+            'pred': pred,
+            'metrics': metrics,
+            'best_name': best_name
+        }
+        self._table = None
+        if record and self.monitor is not None:
+            self.monitor.record(self.restaurant, plat, pred)
+
+    def _forecast_table(self):
+        """Prévisions de tous les plats empilées, reconstruites seulement quand elles changent
+
+        Les bandes P10/P50/P90 sont NaN pour les plats prévus sans bandes.
+        """
+        if self._table is None:
+            frames = [result['pred'].assign(Plat=plat) for plat, result in self._forecasts.items()
+                      if result['pred'] is not None]
+            columns = ['Plat', 'Date', 'Jour', 'Quantite_Prevue', *QUANTILE_COLUMNS]
+            self._table = pd.concat(frames, ignore_index=True).reindex(columns=columns) if frames else \
+                pd.DataFrame({column: pd.Series(dtype='datetime64[ns]' if column == 'Date' else object)
+                              for column in columns})
+        return self._table
+
+    def _compute_many(self, plats, horizon, progress=None):
+        """Prévoit plusieurs plats à `horizon` jours avec le moteur configuré
+
+        Moteur « un modèle par plat »: `horizon` peut aussi être un dictionnaire {plat: jours}.
+        """
+        horizons = horizon if isinstance(horizon, dict) else dict.fromkeys(plats, horizon)
+        if self.engine == 'global':
+            self._compute_global(horizon)
+            if progress is not None:
+                progress(len(plats), len(plats), None)
+        elif self.engine == 'tiered':
+            self._compute_tiered(horizon, progress=progress)
+        elif self.engine == 'hierarchical':
+            self._compute_hierarchical(horizon, progress=progress)
+        else:
+            results = forecast_dishes_parallel(
+                self.df, plats, horizon, restaurant=self.restaurant, cache=self.cache, mode=self.mode,
+                max_workers=self.max_workers, backends=self.backends, panel=self.panel,
+                tuned_params=self.tuned_params, monitor=self.monitor
+            )
+
+            for done, (plat, pred, metrics, best_name, error, _) in enumerate(results, start=1):
+                if error is not None and self.on_error is not None:
+                    self.on_error(plat, error)
+
+                self._set_result(plat, horizons[plat], pred, metrics, best_name)
+
+                if progress is not None:
+                    progress(done, len(plats), plat)
+
+        # Plats sans prévision possible: inutile de les recalculer au prochain rerun
+        for plat in plats:
+            if plat not in self._forecasts:
+                self._set_result(plat, horizons[plat], None, None, None)
+
+        if self.monitor is not None:
+            self.monitor.save()
+
+    def _compute(self, plat, horizon):
+        if self.engine in ('global', 'tiered', 'hierarchical'):
+            if self.engine == 'global':
+                self._compute_global(horizon)
+            elif self.engine == 'tiered':
+                self._compute_tiered(horizon)
+            else:
+                self._compute_hierarchical(horizon)
+            if plat not in self._forecasts:
+                self._set_result(plat, horizon, None, None, None)
+        else:
+            try:
+                pred, metrics, best_name = predict_sales_ml(
+                    self.df, plat, horizon, restaurant=self.restaurant, cache=self.cache, mode=self.mode,
+                    backends=self.backends, panel=self.panel, tuned_params=self.tuned_params.get(plat),
+                    monitor=self.monitor
+                )
+            except Exception as e:
+                if self.on_error is not None:
+                    self.on_error(plat, e)
+                pred, metrics, best_name = None, None, None
+
+            self._set_result(plat, horizon, pred, metrics, best_name)
+
+        if self.monitor is not None:
+            self.monitor.save()
+
+    def _compute_global(self, horizon):
+        """Prévoit tous les plats en une fois avec le modèle global"""
+        try:
+            forecasts, metrics, best_name = predict_sales_global(
+                self.df, horizon, restaurant=self.restaurant, cache=self.cache, backends=self.backends
+            )
+        except Exception as e:
+            if self.on_error is not None:
+                self.on_error('tous les plats', e)
+            forecasts, metrics, best_name = {}, None, None
+
+        for plat, pred in forecasts.items():
+            self._set_result(plat, horizon, pred, metrics, best_name)
+
+    def _compute_tiered(self, horizon, progress=None):
+        """Prévoit tous les plats avec le moteur par paliers"""
+        try:
+            forecasts, report = predict_sales_tiered(
+                self.df, horizon, restaurant=self.restaurant, cache=self.cache, mode=self.mode,
+                progress=progress, backends=self.backends, max_workers=self.max_workers,
+                panel=self.panel, tuned_params=self.tuned_params, monitor=self.monitor
+            )
+        except Exception as e:
+            if self.on_error is not None:
+                self.on_error('tous les plats', e)
+            forecasts, report = {}, {}
+
+        for plat, info in report.items():
+            if info.get('error') is not None and self.on_error is not None:
+                self.on_error(plat, info['error'])
+
+        self.tier_report = report
+        for plat, pred in forecasts.items():
+            self._set_result(plat, horizon, pred, report[plat]['metrics'], report[plat]['model'])
+
+    def _compute_hierarchical(self, horizon, progress=None):
+        """Prévoit tous les plats avec le moteur hiérarchique"""
+        try:
+            forecasts, report, self.group_forecasts = predict_sales_hierarchical(
+                self.df, horizon, restaurant=self.restaurant, cache=self.cache, mode=self.mode,
+                progress=progress, backends=self.backends, max_workers=self.max_workers,
+                panel=self.panel, monitor=self.monitor
+            )
+        except Exception as e:
+            if self.on_error is not None:
+                self.on_error('tous les plats', e)
+            forecasts, report = {}, {}
+
+        # Une erreur de modèle concerne tout le groupe: signalée une seule fois
+        errors = {info['group']: info['error'] for info in report.values() if info.get('error') is not None}
+        if self.on_error is not None:
+            for group, error in errors.items():
+                self.on_error(group, error)
+
+        self.tier_report = report
+        for plat, pred in forecasts.items():
+            self._set_result(plat, horizon, pred, report[plat]['metrics'], report[plat]['model'])
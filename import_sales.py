@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Import hors ligne d'un gros export CSV de caisse dans les données d'un restaurant
+Le fichier est lu par blocs et agrégé par jour et par plat (voir
+ingestion.stream_csv), puis enregistré dans {username}_data.pkl à la place des
+ventes du restaurant: la mémoire dépend de la taille des blocs, pas du fichier
+
+Exemples:
+    python import_sales.py alice "Chez Alice" export_caisse_2025.csv
+    python import_sales.py alice "Chez Alice" export.csv --chunk-rows 500000
+"""
+
+import argparse
+import os
+import pickle
+import sys
+import time
+
+from ingestion import CSV_CHUNK_ROWS, MappingCache, stream_csv
+from model_store import DATA_DIR
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import d'un export CSV volumineux par blocs")
+    parser.add_argument('username', help="Utilisateur propriétaire du restaurant")
+    parser.add_argument('restaurant', help="Nom du restaurant")
+    parser.add_argument('csv', help="Fichier CSV à importer")
+    parser.add_argument('--data-dir', default=DATA_DIR, help="Dossier des données (restaurant_data)")
+    parser.add_argument('--chunk-rows', type=int, default=CSV_CHUNK_ROWS, help="Lignes lues par bloc")
+    args = parser.parse_args(argv)
+
+    data_path = os.path.join(args.data_dir, f"{args.username}_data.pkl")
+    if not os.path.exists(data_path):
+        print(f"❌ Aucune donnée pour l'utilisateur {args.username}")
+        return 1
+
+    with open(data_path, 'rb') as f:
+        restaurants = pickle.load(f)
+    if args.restaurant not in restaurants:
+        print(f"❌ Restaurant inconnu: {args.restaurant} (disponibles: {', '.join(restaurants)})")
+        return 1
+
+    # Correspondances de colonnes de l'utilisateur (épinglées dans l'application comprises)
+    mapping_cache = MappingCache(args.username, args.data_dir)
+    start = time.perf_counter()
+    daily, error, stats = stream_csv(
+        args.csv, chunksize=args.chunk_rows, warn=print, mapping_cache=mapping_cache,
+        progress=lambda rows: print(f"  • {rows:,} lignes lues".replace(',', ' '), end='\r')
+    )
+    print()
+    mapping_cache.save()
+    if daily is None:
+        print(f"❌ {error}")
+        return 1
+
+    restaurants[args.restaurant]['data'] = daily
+    tmp_path = f"{data_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(restaurants, f)
+    os.replace(tmp_path, data_path)
+
+    print(f"✅ {stats['kept']} lignes valides sur {stats['rows']} ({stats['chunks']} blocs) agrégées en "
+          f"{len(daily)} ventes journalières ({time.perf_counter() - start:.1f}s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
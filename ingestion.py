@@ -0,0 +1,709 @@
+"""
+Import des ventes: correspondance des colonnes, colonnes calculées et nettoyage
+Les gros exports CSV des caisses sont lus par blocs (stream_csv): chaque bloc
+est nettoyé puis agrégé par jour et par plat, la mémoire dépend de la taille
+des blocs et non de celle du fichier. Les fichiers Parquet / Arrow IPC
+(pyarrow, optionnel) ne sont lus que pour les colonnes reconnues et la période
+demandée (read_columnar)
+"""
+
+import hashlib
+import io
+import os
+import pickle
+import re
+import threading
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from model_store import DATA_DIR
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    import pyarrow.fs as pafs
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+# Lignes lues par bloc en mode flux
+CSV_CHUNK_ROWS = 200_000
+# Taille à partir de laquelle un CSV importé est lu en mode flux
+STREAMING_MIN_BYTES = 64 * 1024 * 1024
+# Agrégat journalier: colonnes descriptives gardées comme clés, colonnes
+# additionnées et colonnes moyennées (les autres colonnes sont ignorées, dont
+# l'heure: l'agrégat garde une ligne par jour et non par heure)
+AGGREGATE_KEYS = ['Categorie', 'Service', 'Zone', 'Canal', 'Plateforme', 'Promotion', 'Meteo']
+AGGREGATE_SUMS = ['Quantite', 'Chiffre_affaires', 'Cout_total', 'Marge', 'TVA']
+AGGREGATE_MEANS = ['Prix_unitaire', 'Cout_unitaire', 'Marge_unitaire', 'Taux_marge', 'Remise', 'Temperature',
+                   'Note_client']
+
+# Extensions des formats colonnes et format pyarrow.dataset correspondant
+COLUMNAR_FORMATS = {'parquet': 'parquet', 'pq': 'parquet', 'arrow': 'ipc', 'feather': 'ipc', 'ipc': 'ipc'}
+
+# Séparateurs des lignes « date, plat, quantité » des textes importés (TXT, Word, PDF)
+TEXT_DELIMITERS = ',;\t|'
+# Table bytes.translate: 1 pour les octets séparateurs (fins de ligne comprises), 0 sinon
+TEXT_SEPARATOR_BYTES = bytes(byte in (TEXT_DELIMITERS + '\n').encode() for byte in range(256))
+# Type de chaîne par défaut de pandas (stocké par pyarrow s'il est installé)
+STR_DTYPE = pd.Series(['']).dtype
+
+# En-têtes non épinglés gardés par utilisateur dans le cache des correspondances
+MAPPING_CACHE_ENTRIES = 256
+
+FINANCIAL_COLUMNS = ['Prix_unitaire', 'Cout_unitaire', 'Chiffre_affaires', 'Marge', 'Cout_total', 'Marge_unitaire']
+
+
+def _rule(target, words, required=None, excluded=None):
+    """Règle de correspondance: un des mots, avec / sans un mot de contrôle"""
+    return (
+        target,
+        re.compile('|'.join(re.escape(word) for word in words)),
+        re.compile(re.escape(required)) if required else None,
+        re.compile(re.escape(excluded)) if excluded else None
+    )
+
+
+# Règles de correspondance des colonnes, appliquées dans l'ordre (la première
+# qui s'applique donne le nom cible)
+COLUMN_RULES = [
+    # Colonnes obligatoires
+    _rule('Date', ['date', 'jour', 'day']),
+    _rule('Plat', ['plat', 'produit', 'item', 'nom', 'dish', 'product']),
+    _rule('Quantite', ['quantit', 'qte', 'qty', 'quantity', 'nombre']),
+    # Colonnes optionnelles - Catégorie et type
+    _rule('Categorie', ['categ', 'famille', 'type plat']),
+    _rule('Service', ['service', 'moment', 'shift', 'periode']),
+    # Colonnes financières
+    _rule('Prix_unitaire', ['prix unit', 'pu', 'prix vente', 'tarif'], excluded='cout'),
+    _rule('Cout_unitaire', ['cout unit', 'coût unit', 'cu', 'prix achat', 'cost']),
+    _rule('Chiffre_affaires', ['chiffre', 'ca', 'revenue', 'ventes'], required='affaire'),
+    _rule('Marge', ['marge'], excluded='taux'),
+    _rule('TVA', ['tva'], excluded='taux'),
+    # Colonnes contextuelles
+    _rule('Zone', ['zone', 'emplacement', 'salle', 'area']),
+    _rule('Table', ['table', 'numero']),
+    _rule('Serveur', ['serveur', 'waiter']),
+    _rule('Meteo', ['meteo', 'météo', 'weather', 'temps'], excluded='attente'),
+    _rule('Temperature', ['temperature', 'temp'], required='ture'),
+    # Colonnes marketing
+    _rule('Promotion', ['promotion', 'promo', 'offre']),
+    _rule('Remise', ['remise', 'discount', 'reduction']),
+    _rule('Canal', ['canal', 'channel', 'mode vente']),
+    _rule('Plateforme', ['plateforme', 'platform']),
+    # Colonnes opérationnelles
+    _rule('Heure', ['heure', 'hour', 'time'], excluded='attente'),
+    _rule('Note_client', ['note', 'rating', 'avis', 'satisfaction']),
+    _rule('Commentaire', ['commentaire', 'comment', 'remarque']),
+    # Colonnes analytiques ('mois' seul uniquement)
+    ('Mois', re.compile('^mois$'), None, None),
+    _rule('Annee', ['annee', 'année', 'year']),
+    _rule('Trimestre', ['trimestre', 'quarter']),
+    _rule('Semaine', ['semaine', 'week'], excluded='jour'),
+    _rule('Saison', ['saison', 'season']),
+]
+
+# Noms cibles possibles, dans l'ordre des règles
+TARGET_COLUMNS = list(dict.fromkeys(rule[0] for rule in COLUMN_RULES))
+
+
+@lru_cache(maxsize=4096)
+def map_column_name(col):
+    """Nom cible d'une colonne (voir COLUMN_RULES) ou None"""
+    col_lower = col.lower().replace('_', ' ').replace('-', ' ')
+    for target, words, required, excluded in COLUMN_RULES:
+        if words.search(col_lower) and (required is None or required.search(col_lower)) \
+                and (excluded is None or not excluded.search(col_lower)):
+            return target
+    return None
+
+
+# Version des règles (COLUMN_RULES et map_column_name): les correspondances non
+# épinglées calculées avec d'autres règles sont retirées du cache
+RULES_VERSION = hashlib.sha1(
+    repr(COLUMN_RULES).encode('utf-8') + map_column_name.__wrapped__.__code__.co_code
+).hexdigest()
+
+
+def map_columns_intelligently(df):
+    """Mapping intelligent de TOUTES les colonnes possibles d'un restaurant"""
+    column_mapping = {}
+    for col in df.columns:
+        target = map_column_name(col)
+        if target is not None:
+            column_mapping[col] = target
+    return column_mapping
+
+
+def header_signature(columns):
+    """Empreinte de la liste ordonnée des colonnes d'un export"""
+    return hashlib.sha1('\x1f'.join(str(col).strip() for col in columns).encode('utf-8')).hexdigest()
+
+
+def mapping_path(username, data_dir=DATA_DIR):
+    return os.path.join(data_dir, f"{username}_mappings.pkl")
+
+
+class MappingCache:
+    """Correspondances de colonnes d'un utilisateur, par empreinte d'en-tête
+
+    Un export au format déjà vu est mis en correspondance sans réévaluer les
+    règles. Une correspondance épinglée (`pin`) remplace celle des règles pour
+    cet en-tête, à chaque import et synchronisation. Sans `username`, l'état
+    reste en mémoire.
+    """
+
+    def __init__(self, username=None, data_dir=DATA_DIR):
+        self.path = mapping_path(username, data_dir) if username else None
+        self._lock = threading.Lock()
+        self._dirty = False
+        # {'mappings': {empreinte: {'columns', 'mapping', 'pinned'}}, 'version': changements épinglés,
+        #  'rules': RULES_VERSION des correspondances calculées}
+        self.state = self._load()
+        # Dernier en-tête mis en correspondance (proposé à l'épinglage)
+        self.last_columns = None
+
+    def _load(self):
+        state = {'mappings': {}, 'version': 0, 'rules': RULES_VERSION}
+        if self.path is not None and os.path.exists(self.path):
+            try:
+                with open(self.path, 'rb') as f:
+                    state = pickle.load(f)
+            except Exception:
+                pass
+        if state.get('rules') != RULES_VERSION:
+            # Règles modifiées: seules les correspondances épinglées restent valables
+            state['mappings'] = {key: value for key, value in state['mappings'].items() if value['pinned']}
+            state['rules'] = RULES_VERSION
+            self._dirty = True
+        return state
+
+    @property
+    def version(self):
+        """Change à chaque correspondance épinglée ou retirée (invalide les imports en cache)"""
+        return self.state['version']
+
+    def save(self):
+        """Enregistre l'état s'il a changé"""
+        with self._lock:
+            if self.path is None or not self._dirty:
+                return
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(self.state, f)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+
+    def mapping(self, columns):
+        """{colonne (sans espaces autour): nom cible} pour cet en-tête"""
+        signature = header_signature(columns)
+        entry = self.state['mappings'].get(signature)
+        names = [str(col).strip() for col in columns]
+        self.last_columns = names
+        if entry is not None:
+            with self._lock:
+                mappings = self.state['mappings']
+                # Dernier utilisé en fin de dictionnaire: les plus anciens sont retirés en premier
+                if signature in mappings and next(reversed(mappings)) != signature:
+                    mappings[signature] = mappings.pop(signature)
+                    self._dirty = True
+        else:
+            entry = {'columns': names, 'mapping': map_columns_intelligently(pd.DataFrame(columns=names)),
+                     'pinned': False}
+            with self._lock:
+                mappings = self.state['mappings']
+                mappings[signature] = entry
+                # Seuls les MAPPING_CACHE_ENTRIES en-têtes non épinglés les plus récemment utilisés sont gardés
+                unpinned = [key for key, value in mappings.items() if not value['pinned']]
+                for key in unpinned[:max(0, len(unpinned) - MAPPING_CACHE_ENTRIES)]:
+                    del mappings[key]
+                self._dirty = True
+        return dict(entry['mapping'])
+
+    def is_pinned(self, columns):
+        entry = self.state['mappings'].get(header_signature(columns))
+        return entry is not None and entry['pinned']
+
+    def pin(self, columns, mapping):
+        """Épingle `mapping` ({colonne: nom cible}) pour cet en-tête
+
+        Lève ValueError si un nom cible est inconnu ou donné à deux colonnes.
+        """
+        mapping = {str(col).strip(): target for col, target in mapping.items() if target is not None}
+        unknown = sorted(set(mapping.values()) - set(TARGET_COLUMNS))
+        if unknown:
+            raise ValueError(f"Colonnes cibles inconnues: {', '.join(unknown)}")
+        targets = list(mapping.values())
+        duplicated = sorted({target for target in targets if targets.count(target) > 1})
+        if duplicated:
+            raise ValueError(f"Colonnes cibles attribuées plusieurs fois: {', '.join(duplicated)}")
+
+        with self._lock:
+            self.state['mappings'][header_signature(columns)] = {
+                'columns': [str(col).strip() for col in columns], 'mapping': mapping, 'pinned': True
+            }
+            self.state['version'] += 1
+            self._dirty = True
+
+    def unpin(self, columns):
+        """Revient à la correspondance des règles pour cet en-tête"""
+        with self._lock:
+            if self.state['mappings'].pop(header_signature(columns), None) is not None:
+                self.state['version'] += 1
+                self._dirty = True
+
+
+def column_mapping(columns, mapping_cache=None):
+    """{colonne (sans espaces autour): nom cible}, depuis le cache de l'utilisateur s'il est donné"""
+    if mapping_cache is not None:
+        return mapping_cache.mapping(columns)
+    return map_columns_intelligently(pd.DataFrame(columns=[str(col).strip() for col in columns]))
+
+
+def apply_column_mapping(df, mapping_cache=None):
+    """Renomme les colonnes d'un export (voir column_mapping) et calcule les colonnes manquantes"""
+    df = df.rename(columns=lambda col: str(col).strip())
+    df = df.rename(columns=column_mapping(df.columns, mapping_cache))
+    return calculate_missing_columns(df)
+
+
+def projected_columns(columns, mapping_cache=None):
+    """Colonnes à lire et leur nom cible: la première colonne reconnue pour chaque nom
+
+    Retourne {colonne du fichier: nom cible} (voir column_mapping).
+    """
+    mapping = column_mapping(columns, mapping_cache)
+    projection, targets = {}, set()
+    for col in columns:
+        target = mapping.get(str(col).strip())
+        if target is not None and target not in targets:
+            projection[col] = target
+            targets.add(target)
+    return projection
+
+
+def calculate_missing_columns(df):
+    """Calcule automatiquement les colonnes manquantes si possible"""
+    df = df.copy()
+
+    # Création d'une colonne Date si absente mais Mois/Année disponibles
+    if 'Date' not in df.columns:
+        if 'Mois' in df.columns and 'Annee' in df.columns:
+            # Créer une date au 1er jour du mois
+            df['Date'] = pd.to_datetime(df['Annee'].astype(str) + '-' + df['Mois'].astype(str) + '-01', errors='coerce')
+        elif 'Mois' in df.columns:
+            # Si seulement Mois disponible, utiliser l'année en cours
+            current_year = datetime.now().year
+            df['Date'] = pd.to_datetime(str(current_year) + '-' + df['Mois'].astype(str) + '-01', errors='coerce')
+
+    # Calcul du chiffre d'affaires si manquant
+    if 'Chiffre_affaires' not in df.columns and 'Prix_unitaire' in df.columns and 'Quantite' in df.columns:
+        df['Chiffre_affaires'] = df['Prix_unitaire'] * df['Quantite']
+
+    # Calcul du coût total si manquant
+    if 'Cout_total' not in df.columns and 'Cout_unitaire' in df.columns and 'Quantite' in df.columns:
+        df['Cout_total'] = df['Cout_unitaire'] * df['Quantite']
+
+    # Calcul de la marge unitaire si manquant
+    if 'Marge_unitaire' not in df.columns and 'Prix_unitaire' in df.columns and 'Cout_unitaire' in df.columns:
+        df['Marge_unitaire'] = df['Prix_unitaire'] - df['Cout_unitaire']
+
+    # Calcul de la marge totale si manquant
+    if 'Marge' not in df.columns and 'Marge_unitaire' in df.columns and 'Quantite' in df.columns:
+        df['Marge'] = df['Marge_unitaire'] * df['Quantite']
+    elif 'Marge' not in df.columns and 'Chiffre_affaires' in df.columns and 'Cout_total' in df.columns:
+        df['Marge'] = df['Chiffre_affaires'] - df['Cout_total']
+
+    # Calcul du taux de marge si manquant
+    if 'Taux_marge' not in df.columns and 'Marge_unitaire' in df.columns and 'Prix_unitaire' in df.columns:
+        df['Taux_marge'] = (df['Marge_unitaire'] / df['Prix_unitaire'] * 100).fillna(0)
+
+    return df
+
+
+def clean_rows(df):
+    """Nettoie les lignes (dates, plats, quantités, montants) sans valider le volume
+
+    Retourne (df, dates invalides, quantités invalides): nombre de lignes
+    supprimées pour chaque motif.
+    """
+    df = df.copy()
+    invalid_dates = 0
+    invalid_qty = 0
+
+    # Date : Conversion ultra-robuste (format déduit des données)
+    if 'Date' in df.columns:
+        df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
+
+        # Supprimer lignes avec dates invalides
+        invalid_dates = int(df['Date'].isna().sum())
+        df = df.dropna(subset=['Date'])
+
+    # Plat : Conversion en string et nettoyage
+    if 'Plat' in df.columns:
+        df['Plat'] = df['Plat'].astype(str).str.strip()
+        # Supprimer lignes vides
+        df = df[df['Plat'] != '']
+        df = df[df['Plat'].str.lower() != 'nan']
+
+    # Quantité : Conversion en numérique
+    if 'Quantite' in df.columns:
+        # Remplacer virgules par points pour les décimaux
+        if df['Quantite'].dtype == 'object':
+            df['Quantite'] = df['Quantite'].astype(str).str.replace(',', '.').str.replace(' ', '')
+
+        df['Quantite'] = pd.to_numeric(df['Quantite'], errors='coerce')
+
+        # Supprimer quantités invalides ou négatives
+        invalid_qty = int(df['Quantite'].isna().sum())
+
+        df = df.dropna(subset=['Quantite'])
+        df = df[df['Quantite'] > 0]
+
+        # Arrondir à l'entier
+        df['Quantite'] = df['Quantite'].round(0).astype(int)
+
+    # Nettoyage colonnes financières (si présentes)
+    for col in FINANCIAL_COLUMNS:
+        if col in df.columns:
+            if df[col].dtype == 'object':
+                # Nettoyer format monétaire (€, espaces, virgules)
+                df[col] = df[col].astype(str).str.replace('€', '').str.replace(' ', '').str.replace(',', '.')
+
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+            # Remplacer NaN par 0 pour colonnes financières
+            df[col] = df[col].fillna(0)
+
+    return df, invalid_dates, invalid_qty
+
+
+def _validate(df):
+    """Message d'erreur si le volume de données est insuffisant, sinon None"""
+    if len(df) == 0:
+        return "Aucune donnée valide après nettoyage"
+    if len(df) < 7:
+        return f"Pas assez de données ({len(df)} lignes). Minimum 7 jours requis."
+    return None
+
+
+def _warn_invalid(warn, invalid_dates, invalid_qty):
+    if warn is None:
+        return
+    if invalid_dates > 0:
+        warn(f"⚠️ {invalid_dates} lignes avec dates invalides supprimées")
+    if invalid_qty > 0:
+        warn(f"⚠️ {invalid_qty} lignes avec quantités invalides supprimées")
+
+
+def clean_and_validate_data(df, warn=None):
+    """Nettoie et valide les données de manière robuste
+
+    `warn` (ex. st.warning) reçoit les avertissements sur les lignes supprimées.
+    Retourne (df, None) ou (None, message d'erreur).
+    """
+    df, invalid_dates, invalid_qty = clean_rows(df)
+    _warn_invalid(warn, invalid_dates, invalid_qty)
+
+    error = _validate(df)
+    return (None, error) if error is not None else (df, None)
+
+
+def _ascii_digits(strings):
+    """Chiffres ASCII de chaque chaîne d'un tableau pyarrow large_string sans valeurs nulles
+
+    Filtre des octets UTF-8: les caractères multi-octets ne contiennent jamais
+    d'octet '0'-'9', seuls les chiffres ASCII sont donc conservés.
+    """
+    _, offsets, data = strings.buffers()
+    offsets = np.frombuffer(offsets, dtype=np.int64)[strings.offset:strings.offset + len(strings) + 1]
+    data = np.frombuffer(data, dtype=np.uint8)[offsets[0]:offsets[-1]] if data is not None \
+        else np.empty(0, dtype=np.uint8)
+    keep = (data >= ord('0')) & (data <= ord('9'))
+    kept = np.zeros(len(keep) + 1, dtype=np.int64)
+    np.cumsum(keep, out=kept[1:])
+    return pa.LargeStringArray.from_buffers(
+        len(strings), pa.py_buffer(kept[offsets - offsets[0]]), pa.py_buffer(data[keep].tobytes()))
+
+
+def _text_sales_arrow(text):
+    """Date, Plat et quantité des lignes d'un texte, calculés par pyarrow"""
+    text = text.strip().encode('utf-8')
+    data = np.frombuffer(text, dtype=np.uint8)
+    separators = np.flatnonzero(np.frombuffer(text.translate(TEXT_SEPARATOR_BYTES), dtype=bool))
+    # Champs et séparateurs alternés dans un seul tableau, sans copie du texte
+    offsets = np.empty(2 * len(separators) + 2, dtype=np.int64)
+    offsets[0], offsets[-1] = 0, len(data)
+    offsets[1:-1:2], offsets[2:-1:2] = separators, separators + 1
+    segments = pa.LargeStringArray.from_buffers(len(offsets) - 1, pa.py_buffer(offsets), pa.py_buffer(data))
+
+    # Premier champ de chaque ligne et nombre de champs: lignes d'au moins trois champs gardées
+    line_start = np.flatnonzero(np.concatenate([[True], data[separators] == ord('\n')]))
+    fields = np.diff(np.append(line_start, len(separators) + 1))
+    first = line_start[fields >= 3]
+    quantity = segments.take(pa.array(2 * (first + 2)))
+
+    digits = _ascii_digits(quantity)
+    # Chiffres non ASCII (ex. ٣), acceptés par int(): expression régulière Python sur ces lignes
+    unicode_rows = pc.invert(pc.string_is_ascii(quantity))
+    if pc.any(unicode_rows).as_py():
+        fixed = [re.sub(r'[^\d]', '', q) for q in quantity.filter(unicode_rows).to_pylist()]
+        digits = pc.replace_with_mask(digits, unicode_rows, pa.array(fixed, pa.large_string()))
+        unicode_rows = pc.and_(unicode_rows, pc.invert(pc.string_is_ascii(digits)))
+
+    valid = pc.binary_length(digits).to_numpy() > 0
+    digits, unicode_rows = digits.filter(valid), unicode_rows.filter(valid)
+    if len(digits) and not pc.any(unicode_rows).as_py() and pc.max(pc.binary_length(digits)).as_py() <= 18:
+        quantite = pd.Series(pc.cast(digits, pa.int64()).to_numpy())
+    else:
+        # Conversion Python comme int(): entiers hors int64 ou chiffres non ASCII
+        quantite = pd.Series([int(value) for value in digits.to_pylist()])
+    # Date et Plat lus pour les seules lignes valides
+    date, plat = (pd.Series(pc.utf8_trim_whitespace(segments.take(pa.array(2 * (first[valid] + i)))), dtype=STR_DTYPE)
+                  for i in range(2))
+    return date, plat, quantite
+
+
+def _text_sales_pandas(text):
+    """Date, Plat et quantité des lignes d'un texte, avec les méthodes .str de pandas (sans pyarrow)"""
+    # Type object: découpage, \d et strip() identiques à re et str
+    lines = pd.Series(text.strip().split('\n'), dtype=object)
+    fields = lines.str.split(f'[{re.escape(TEXT_DELIMITERS)}]', n=3, expand=True, regex=True)
+    if fields.shape[1] < 3:
+        return pd.Series([], dtype=STR_DTYPE), pd.Series([], dtype=STR_DTYPE), pd.Series([], dtype=np.int64)
+
+    fields = fields[fields[2].notna()]
+    digits = fields[2].str.replace(r'[^\d]', '', regex=True)
+    fields, digits = fields[digits != ''], digits[digits != '']
+    date, plat = (fields[i].str.strip().astype(STR_DTYPE) for i in range(2))
+    return date, plat, pd.Series([int(value) for value in digits])
+
+
+def extract_data_from_text(text):
+    """Ventes (Date, Plat, Quantite) des lignes « date, plat, quantité » d'un texte
+
+    Séparateurs , ; tabulation ou |. Les lignes à moins de trois champs ou dont
+    la quantité ne contient aucun chiffre sont ignorées; la quantité ne garde que
+    ses chiffres. Toutes les lignes sont traitées en une fois, par pyarrow s'il
+    est installé. Retourne un DataFrame ou None si aucune ligne n'est valide.
+    """
+    try:
+        date, plat, quantite = _text_sales_arrow(text) if PYARROW_AVAILABLE else _text_sales_pandas(text)
+    except UnicodeEncodeError:
+        # Texte non encodable en UTF-8 (caractères de substitution isolés)
+        date, plat, quantite = _text_sales_pandas(text)
+
+    if len(quantite) == 0:
+        return None
+    return pd.DataFrame({
+        'Date': date.reset_index(drop=True),
+        'Plat': plat.reset_index(drop=True),
+        'Quantite': quantite
+    })
+
+
+def use_streaming(filename, size):
+    """True si le fichier importé doit être lu en mode flux (gros CSV)"""
+    return filename.lower().endswith('.csv') and size is not None and size >= STREAMING_MIN_BYTES
+
+
+def aggregate_daily(df):
+    """Agrège des ventes nettoyées par jour, plat et colonnes descriptives
+
+    Les colonnes moyennées sont conservées en (somme, nombre de valeurs) pour
+    pouvoir fusionner des agrégats partiels (voir _merge_partials).
+    """
+    df = df.assign(Date=df['Date'].dt.normalize())
+    keys = ['Date', 'Plat'] + [col for col in AGGREGATE_KEYS if col in df.columns]
+    sums = [col for col in AGGREGATE_SUMS if col in df.columns]
+    means = [col for col in AGGREGATE_MEANS if col in df.columns]
+
+    values = df[keys + sums].copy()
+    for col in sums[1:]:
+        values[col] = pd.to_numeric(values[col], errors='coerce').fillna(0)
+    for col in means:
+        numeric = pd.to_numeric(df[col], errors='coerce')
+        values[f'{col}__sum'] = numeric.fillna(0)
+        values[f'{col}__n'] = numeric.notna().astype(int)
+
+    return values.groupby(keys, dropna=False, sort=False).sum().reset_index()
+
+
+def _merge_partials(partials):
+    """Fusionne des agrégats partiels de mêmes clés"""
+    merged = pd.concat(partials, ignore_index=True)
+    keys = [col for col in ['Date', 'Plat'] + AGGREGATE_KEYS if col in merged.columns]
+    return merged.groupby(keys, dropna=False, sort=False).sum().reset_index()
+
+
+def _finalize(aggregate):
+    """Moyennes finales et ordre des colonnes de l'agrégat journalier"""
+    for col in AGGREGATE_MEANS:
+        if f'{col}__sum' in aggregate.columns:
+            counts = aggregate.pop(f'{col}__n')
+            totals = aggregate.pop(f'{col}__sum')
+            aggregate[col] = np.where(counts > 0, totals / counts.where(counts > 0, 1), np.nan)
+            if col in FINANCIAL_COLUMNS:
+                aggregate[col] = aggregate[col].fillna(0)
+
+    aggregate['Quantite'] = aggregate['Quantite'].astype(int)
+    return aggregate.sort_values(['Date', 'Plat'], kind='stable').reset_index(drop=True)
+
+
+def _read_header(source, encoding):
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    header = pd.read_csv(source, encoding=encoding, nrows=0).columns
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    return header
+
+
+def _stream(source, encoding, chunksize, progress, mapping_cache):
+    # Seules les colonnes reconnues sont lues
+    rename = projected_columns(_read_header(source, encoding), mapping_cache)
+    usecols = list(rename)
+
+    stats = {'rows': 0, 'kept': 0, 'chunks': 0, 'invalid_dates': 0, 'invalid_qty': 0, 'columns': rename}
+    partials, partial_rows = [], 0
+
+    for chunk in pd.read_csv(source, encoding=encoding, usecols=usecols, chunksize=chunksize):
+        chunk = calculate_missing_columns(chunk.rename(columns=rename))
+        stats['rows'] += len(chunk)
+        stats['chunks'] += 1
+
+        chunk, invalid_dates, invalid_qty = clean_rows(chunk)
+        stats['invalid_dates'] += invalid_dates
+        stats['invalid_qty'] += invalid_qty
+        stats['kept'] += len(chunk)
+
+        if not all(col in chunk.columns for col in ('Date', 'Plat', 'Quantite')):
+            raise ValueError(f"Colonnes requises non trouvées. Colonnes détectées: {', '.join(chunk.columns)}")
+
+        if len(chunk) > 0:
+            partial = aggregate_daily(chunk)
+            partials.append(partial)
+            partial_rows += len(partial)
+        # Agrégats partiels fusionnés dès qu'ils atteignent la taille d'un bloc
+        if partial_rows > chunksize and len(partials) > 1:
+            partials = [_merge_partials(partials)]
+            partial_rows = len(partials[0])
+
+        if progress is not None:
+            progress(stats['rows'])
+
+    daily = _finalize(_merge_partials(partials)) if partials else None
+    return daily, stats
+
+
+def stream_csv(source, chunksize=CSV_CHUNK_ROWS, warn=None, progress=None, mapping_cache=None):
+    """Lit un CSV par blocs et retourne l'agrégat journalier des ventes par plat
+
+    Chaque bloc passe par la correspondance des colonnes (calculée une fois sur
+    l'en-tête), les colonnes calculées et le nettoyage, puis est agrégé par
+    (Date, Plat, colonnes descriptives présentes): seuls un bloc et l'agrégat
+    sont en mémoire. Les colonnes hors AGGREGATE_KEYS / AGGREGATE_SUMS /
+    AGGREGATE_MEANS ne sont pas conservées. `source`: chemin ou fichier
+    (relu depuis le début si l'UTF-8 échoue); `progress(lignes lues)` est
+    appelé après chaque bloc; `mapping_cache` (MappingCache) fournit la
+    correspondance des colonnes de l'utilisateur.
+
+    Retourne (agrégat, None, statistiques) ou (None, message d'erreur,
+    statistiques); statistiques: lignes lues, gardées, blocs, lignes invalides.
+    """
+    try:
+        try:
+            daily, stats = _stream(source, 'utf-8', chunksize, progress, mapping_cache)
+        except UnicodeDecodeError:
+            daily, stats = _stream(source, 'latin-1', chunksize, progress, mapping_cache)
+    except ValueError as e:
+        return None, str(e), {}
+
+    _warn_invalid(warn, stats['invalid_dates'], stats['invalid_qty'])
+
+    if daily is None:
+        return None, _validate(pd.DataFrame()), stats
+    error = _validate(daily)
+    return (None, error, stats) if error is not None else (daily, None, stats)
+
+
+def is_columnar(filename):
+    return filename.rsplit('.', 1)[-1].lower() in COLUMNAR_FORMATS
+
+
+def _date_scalar(value, arrow_type):
+    """Borne de date au type de la colonne Date du fichier (filtre évalué par pyarrow)"""
+    value = pd.Timestamp(value)
+    if pa.types.is_timestamp(arrow_type) and arrow_type.tz is not None:
+        return pa.scalar(value.tz_localize(arrow_type.tz), type=arrow_type)
+    if pa.types.is_date(arrow_type):
+        return pa.scalar(value.date(), type=arrow_type)
+    return pa.scalar(value.to_pydatetime(), type=arrow_type)
+
+
+def read_columnar(source, filename, start=None, end=None, mapping_cache=None):
+    """Lit un fichier Parquet ou Arrow IPC: colonnes reconnues et période [start, end] seulement
+
+    Les colonnes sans correspondance (voir column_mapping) ne sont pas lues.
+    Quand la colonne Date est une date ou un horodatage, la période est
+    filtrée à la lecture (groupes de lignes Parquet ignorés d'après leurs
+    statistiques); sinon après lecture. `source`: chemin ou fichier. Retourne
+    un DataFrame aux colonnes renommées, comme load_file.
+    """
+    if not PYARROW_AVAILABLE:
+        raise ImportError("pyarrow est requis pour lire les fichiers Parquet / Arrow (pip install pyarrow)")
+
+    file_format = ds.ParquetFileFormat() if COLUMNAR_FORMATS[filename.rsplit('.', 1)[-1].lower()] == 'parquet' \
+        else ds.IpcFileFormat()
+    if isinstance(source, str):
+        fragment = file_format.make_fragment(source, filesystem=pafs.LocalFileSystem())
+    else:
+        fragment = file_format.make_fragment(pa.py_buffer(source.getvalue()))
+
+    projection = projected_columns(fragment.physical_schema.names, mapping_cache)
+    date_column = next((col for col, target in projection.items() if target == 'Date'), None)
+    date_type = fragment.physical_schema.field(date_column).type if date_column is not None else None
+    pushdown = date_type is not None and (pa.types.is_timestamp(date_type) or pa.types.is_date(date_type))
+
+    condition = None
+    if pushdown:
+        if start is not None:
+            condition = ds.field(date_column) >= _date_scalar(start, date_type)
+        if end is not None:
+            before_end = ds.field(date_column) < _date_scalar(pd.Timestamp(end) + timedelta(days=1), date_type)
+            condition = before_end if condition is None else condition & before_end
+
+    df = fragment.to_table(columns=list(projection), filter=condition).to_pandas()
+    df = df.rename(columns=projection)
+
+    if date_column is not None and not pushdown and (start is not None or end is not None):
+        # Dates en texte: filtre après lecture (dates illisibles gardées pour le nettoyage)
+        dates = pd.to_datetime(df['Date'], errors='coerce')
+        keep = dates.isna()
+        in_range = pd.Series(True, index=df.index)
+        if start is not None:
+            in_range &= dates >= pd.Timestamp(start)
+        if end is not None:
+            in_range &= dates < pd.Timestamp(end) + timedelta(days=1)
+        df = df[keep | in_range].reset_index(drop=True)
+
+    if pd.api.types.is_datetime64_any_dtype(df.get('Date')) and df['Date'].dt.tz is not None:
+        df['Date'] = df['Date'].dt.tz_localize(None)
+
+    return df
+
+
+def to_parquet_bytes(df):
+    """Export Parquet d'un DataFrame (données nettoyées, prévisions) pour un téléchargement"""
+    if not PYARROW_AVAILABLE:
+        raise ImportError("pyarrow est requis pour l'export Parquet (pip install pyarrow)")
+    # Colonnes texte aux types mélangés (ex. heures saisies à la main): converties en texte
+    mixed = [col for col in df.columns if df[col].dtype == 'object'
+             and pd.api.types.infer_dtype(df[col], skipna=True) not in ('string', 'empty')]
+    buffer = io.BytesIO()
+    df = df.assign(**{col: df[col].astype(str).where(df[col].notna()) for col in mixed})
+    df.to_parquet(buffer, index=False, engine='pyarrow')
+    return buffer.getvalue()
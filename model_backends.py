@@ -0,0 +1,329 @@
+"""
+Registre des modèles ML candidats à la prévision des ventes
+Chaque backend expose la même interface: fit, predict, predict_trees (prévision
+par arbre des ensembles), update (ajout incrémental), compact (format enregistré
+dans le cache), serialize / deserialize
+"""
+
+import pickle
+
+import numpy as np
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor, HistGradientBoostingRegressor
+from sklearn.linear_model import Ridge
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+# Backends en compétition quand le restaurant n'a rien configuré
+DEFAULT_BACKENDS = ['RandomForest', 'GradientBoosting']
+
+# Features d'historique utilisées par la régression ridge
+LAG_FEATURES = ['Lag_1', 'Lag_3', 'Lag_7', 'Lag_14',
+                'Moyenne_Mobile_7', 'Moyenne_Mobile_14', 'Ecart_Type_7']
+
+
+class ModelBackend:
+    """Interface commune des modèles candidats
+
+    `fit` reçoit la liste des features afin qu'un backend puisse n'en utiliser
+    qu'une partie; le modèle retourné accepte toujours la matrice complète.
+    `params` complète ou remplace les hyperparamètres par défaut.
+
+    Les backends de boosting définissent `early_stopping_params` (arrêt
+    anticipé sur une fraction de validation) et `tuned_params` qui retourne le
+    nombre d'itérations réellement retenu. `param_space` donne les valeurs
+    explorées par la recherche d'hyperparamètres hors ligne (voir tuning.py).
+    """
+
+    name = None
+    label = None
+    model_class = None
+    default_params = {}
+    early_stopping_params = {}
+    param_space = {}
+
+    def create(self, n_jobs=-1, **params):
+        return self.model_class(**{**self.default_params, **params})
+
+    def fit(self, X, y, features, n_jobs=-1, params=None):
+        model = self.create(n_jobs, **(params or {}))
+        model.fit(X, y)
+        return model
+
+    def tuned_params(self, model):
+        """Hyperparamètres appris pendant l'entraînement (itérations après arrêt anticipé)"""
+        return {}
+
+    def predict(self, model, X):
+        return model.predict(X)
+
+    def predict_trees(self, model, X):
+        """Prévision de chaque arbre d'un ensemble (arbres, lignes, sorties), None si non supporté
+
+        La moyenne des arbres est la prévision du modèle: les quantiles entre
+        arbres donnent une bande de prévision sans autre modèle.
+        """
+        return None
+
+    def update(self, model, X, y, n_jobs=-1):
+        """Complète un modèle déjà entraîné avec de nouvelles données (None si non supporté)"""
+        return None
+
+    def compact(self, model):
+        """Forme du modèle enregistrée dans le cache (le modèle lui-même par défaut)"""
+        return model
+
+    def handles(self, model):
+        return self.model_class is not None and isinstance(model, self.model_class)
+
+    def serialize(self, model):
+        return pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def deserialize(self, data):
+        return pickle.loads(data)
+
+
+class CompactForest:
+    """Forêt aléatoire réduite à des tableaux de nœuds, pour la prévision
+
+    Les nœuds de tous les arbres sont concaténés dans quelques tableaux NumPy
+    (enfants, feature, seuil, valeur): enregistrés sans compression, ils sont
+    relus en mmap (voir model_store.ModelCache) au lieu d'être recopiés arbre
+    par arbre comme les arbres sklearn. Les feuilles pointent sur elles-mêmes,
+    si bien que tous les arbres sont parcourus ensemble, profondeur par
+    profondeur. Les prévisions sont identiques à celles de la forêt d'origine.
+    """
+
+    def __init__(self, left, right, feature, threshold, value, roots, depth, params):
+        self.left = left
+        self.right = right
+        self.feature = feature
+        self.threshold = threshold
+        self.value = value
+        self.roots = roots
+        self.depth = depth
+        # Hyperparamètres de la forêt d'origine, pour les mises à jour incrémentales
+        self.params = params
+
+    @classmethod
+    def from_forest(cls, forest):
+        left, right, feature, threshold, value, roots = [], [], [], [], [], []
+        offset = 0
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            nodes = np.arange(tree.node_count)
+            leaf = tree.children_left == -1
+            left.append(np.where(leaf, nodes, tree.children_left) + offset)
+            right.append(np.where(leaf, nodes, tree.children_right) + offset)
+            feature.append(np.where(leaf, 0, tree.feature))
+            threshold.append(np.where(leaf, np.inf, tree.threshold))
+            value.append(tree.value[:, :, 0])
+            roots.append(offset)
+            offset += tree.node_count
+
+        params = {key: val for key, val in forest.get_params().items() if key not in ('n_jobs', 'warm_start', 'verbose')}
+        return cls(
+            np.concatenate(left).astype(np.int32), np.concatenate(right).astype(np.int32),
+            np.concatenate(feature).astype(np.int32), np.concatenate(threshold),
+            np.concatenate(value), np.array(roots, dtype=np.int32),
+            max(estimator.tree_.max_depth for estimator in forest.estimators_), params
+        )
+
+    @property
+    def n_estimators(self):
+        return len(self.roots)
+
+    @property
+    def n_outputs(self):
+        return self.value.shape[1]
+
+    def append(self, other):
+        """Nouvelle forêt contenant les arbres des deux forêts"""
+        offset = len(self.left)
+        return CompactForest(
+            np.concatenate([self.left, other.left + offset]), np.concatenate([self.right, other.right + offset]),
+            np.concatenate([self.feature, other.feature]), np.concatenate([self.threshold, other.threshold]),
+            np.concatenate([self.value, other.value]), np.concatenate([self.roots, other.roots + offset]),
+            max(self.depth, other.depth), self.params
+        )
+
+    def predict_trees(self, X):
+        """Prévision de chaque arbre: tableau (arbres, lignes, sorties)"""
+        # Même comparaison que sklearn: X en float32, seuils en float64
+        X32 = np.ascontiguousarray(X, dtype=np.float32)
+        rows = np.arange(len(X32))
+        node = np.repeat(self.roots[:, None], len(X32), axis=1)
+        for _ in range(self.depth):
+            go_left = X32[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        return self.value[node]
+
+    def predict(self, X):
+        # Somme arbre après arbre puis moyenne, comme RandomForestBackend.predict
+        total = np.add.reduce(self.predict_trees(X), axis=0) / self.n_estimators
+        return total[:, 0] if self.n_outputs == 1 else total
+
+
+class RandomForestBackend(ModelBackend):
+    name = 'RandomForest'
+    label = 'Random Forest'
+    model_class = RandomForestRegressor
+    default_params = {'n_estimators': 200, 'max_depth': 10, 'random_state': 42}
+    param_space = {
+        'n_estimators': [50, 100, 200, 300],
+        'max_depth': [4, 6, 8, 10, 14, None],
+        'min_samples_leaf': [1, 2, 4, 8],
+        'max_features': [1.0, 0.7, 0.4]
+    }
+    trees_per_update = 20
+
+    def create(self, n_jobs=-1, **params):
+        return RandomForestRegressor(**{**self.default_params, **params}, n_jobs=n_jobs)
+
+    def handles(self, model):
+        return isinstance(model, (RandomForestRegressor, CompactForest))
+
+    def compact(self, model):
+        return CompactForest.from_forest(model) if isinstance(model, RandomForestRegressor) else model
+
+    def predict(self, model, X):
+        if isinstance(model, CompactForest):
+            return model.predict(X)
+
+        # Parcours direct des arbres: évite le coût fixe de joblib et des
+        # validations de `predict` quand X ne contient qu'une ligne par série.
+        # Même résultat que model.predict (moyenne des arbres).
+        X32 = np.ascontiguousarray(X, dtype=np.float32)
+        n_outputs = model.n_outputs_
+        total = np.zeros((len(X32), n_outputs))
+        for estimator in model.estimators_:
+            total += estimator.tree_.predict(X32).reshape(len(X32), n_outputs)
+        total /= len(model.estimators_)
+        return total[:, 0] if n_outputs == 1 else total
+
+    def predict_trees(self, model, X):
+        if isinstance(model, CompactForest):
+            return model.predict_trees(X)
+
+        X32 = np.ascontiguousarray(X, dtype=np.float32)
+        return np.stack([estimator.tree_.predict(X32).reshape(len(X32), model.n_outputs_)
+                         for estimator in model.estimators_])
+
+    def update(self, model, X, y, n_jobs=-1):
+        if isinstance(model, CompactForest):
+            # Mêmes hyperparamètres, arbres supplémentaires entraînés sur les nouvelles données
+            extra = RandomForestRegressor(**{**model.params, 'n_estimators': self.trees_per_update}, n_jobs=n_jobs)
+            return model.append(CompactForest.from_forest(extra.fit(X, y)))
+
+        model.set_params(warm_start=True, n_estimators=model.n_estimators + self.trees_per_update, n_jobs=n_jobs)
+        model.fit(X, y)
+        model.set_params(warm_start=False)
+        return model
+
+
+class GradientBoostingBackend(ModelBackend):
+    name = 'GradientBoosting'
+    label = 'Gradient Boosting'
+    model_class = GradientBoostingRegressor
+    default_params = {'n_estimators': 150, 'max_depth': 5, 'learning_rate': 0.1, 'random_state': 42}
+    early_stopping_params = {'n_iter_no_change': 10, 'validation_fraction': 0.1}
+    param_space = {
+        'n_estimators': [50, 100, 150, 300],
+        'max_depth': [2, 3, 4, 5],
+        'learning_rate': [0.03, 0.05, 0.1, 0.2],
+        'subsample': [0.7, 0.85, 1.0]
+    }
+    stages_per_update = 10
+
+    def tuned_params(self, model):
+        return {'n_estimators': int(model.n_estimators_)}
+
+    def update(self, model, X, y, n_jobs=-1):
+        model.set_params(warm_start=True, n_estimators=model.n_estimators + self.stages_per_update)
+        model.fit(X, y)
+        model.set_params(warm_start=False)
+        return model
+
+
+class HistGradientBoostingBackend(ModelBackend):
+    name = 'HistGradientBoosting'
+    label = 'Hist Gradient Boosting'
+    model_class = HistGradientBoostingRegressor
+    default_params = {'max_iter': 200, 'learning_rate': 0.1, 'max_leaf_nodes': 15,
+                      'min_samples_leaf': 5, 'early_stopping': False, 'random_state': 42}
+    early_stopping_params = {'early_stopping': True, 'n_iter_no_change': 10, 'validation_fraction': 0.1}
+    param_space = {
+        'max_iter': [100, 200, 400],
+        'learning_rate': [0.03, 0.05, 0.1, 0.2],
+        'max_leaf_nodes': [7, 15, 31],
+        'min_samples_leaf': [3, 5, 10, 20]
+    }
+    iterations_per_update = 10
+
+    def tuned_params(self, model):
+        return {'max_iter': int(model.n_iter_)}
+
+    def update(self, model, X, y, n_jobs=-1):
+        model.set_params(warm_start=True, max_iter=model.max_iter + self.iterations_per_update)
+        model.fit(X, y)
+        model.set_params(warm_start=False)
+        return model
+
+
+class RidgeLagBackend(ModelBackend):
+    """Régression ridge sur les lags, moyennes mobiles et le jour de la semaine"""
+
+    name = 'Ridge'
+    label = 'Ridge (lags)'
+    model_class = Pipeline
+    default_params = {'alpha': 1.0}
+    param_space = {'alpha': [0.1, 0.3, 1.0, 3.0, 10.0, 30.0]}
+
+    def fit(self, X, y, features, n_jobs=-1, params=None):
+        lag_columns = [i for i, feat in enumerate(features) if feat in LAG_FEATURES]
+        transformers = [('lags', StandardScaler(), lag_columns)]
+        if 'Jour_Semaine' in features:
+            transformers.append(('jour', OneHotEncoder(handle_unknown='ignore'), [features.index('Jour_Semaine')]))
+
+        model = Pipeline([
+            ('features', ColumnTransformer(transformers)),
+            ('ridge', Ridge(**{**self.default_params, **(params or {})}))
+        ])
+        model.fit(X, y)
+        return model
+
+    def handles(self, model):
+        return isinstance(model, Pipeline) and isinstance(model[-1], Ridge)
+
+
+MODEL_BACKENDS = {}
+
+
+def register_backend(backend):
+    """Ajoute un backend au registre (remplace un backend du même nom)"""
+    MODEL_BACKENDS[backend.name] = backend
+    return backend
+
+
+for _backend in (RandomForestBackend(), GradientBoostingBackend(),
+                 HistGradientBoostingBackend(), RidgeLagBackend()):
+    register_backend(_backend)
+
+
+def get_backend(name):
+    """Backend enregistré sous `name` (KeyError si inconnu)"""
+    return MODEL_BACKENDS[name]
+
+
+def backend_for_model(model):
+    """Backend capable de manipuler un modèle entraîné, ou None"""
+    for backend in MODEL_BACKENDS.values():
+        if backend.handles(model):
+            return backend
+    return None
+
+
+def resolve_backends(names=None):
+    """Liste de backends valides, dans l'ordre demandé (défaut si vide)"""
+    names = [name for name in (names or []) if name in MODEL_BACKENDS]
+    return names or list(DEFAULT_BACKENDS)
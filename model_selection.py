@@ -0,0 +1,159 @@
+"""
+Sélection du modèle de prévision par validation croisée temporelle
+Origines glissantes (rolling origin), arrêt anticipé du boosting, budget de
+temps par plat et mémorisation de la configuration gagnante
+"""
+
+import time
+
+import numpy as np
+from sklearn.metrics import mean_absolute_error, mean_squared_error, mean_absolute_percentage_error
+
+from model_backends import get_backend, resolve_backends
+from model_store import make_model_key
+
+CV_FOLDS = 3
+# Historique minimal avant la première origine d'évaluation
+CV_MIN_TRAIN_ROWS = 14
+# Budget de temps de la sélection pour un plat (secondes)
+SELECTION_BUDGET_S = 15.0
+# La configuration gagnante est réévaluée après ce nombre de jours de nouvelles données
+RESELECT_EVERY_DAYS = 28
+# Quantiles des prévisions (P10, P50, P90): bandes des forêts, ou erreurs de validation des autres modèles
+FORECAST_QUANTILES = (0.1, 0.5, 0.9)
+
+
+def rolling_origin_folds(n_rows, n_folds=CV_FOLDS, test_size=None, min_train=CV_MIN_TRAIN_ROWS):
+    """Découpages (fin d'entraînement, fin de test) du plus récent au plus ancien
+
+    Chaque pli entraîne sur toutes les lignes précédant son origine et évalue
+    les `test_size` lignes suivantes.
+    """
+    test_size = test_size or max(7, min(14, n_rows // (n_folds + 2)))
+    folds = []
+    for k in range(n_folds):
+        test_end = n_rows - k * test_size
+        origin = test_end - test_size
+        if origin < min_train:
+            break
+        folds.append((origin, test_end))
+    return folds
+
+
+def _metrics(y_true, y_pred):
+    return {
+        'MAE': mean_absolute_error(y_true, y_pred),
+        'RMSE': np.sqrt(mean_squared_error(y_true, y_pred)),
+        'MAPE': mean_absolute_percentage_error(y_true, y_pred) * 100
+    }
+
+
+def cross_validate_backends(X, y, features, backends, n_jobs=-1, budget_s=SELECTION_BUDGET_S,
+                            tuned_params=None):
+    """Évalue les backends sur des origines glissantes dans la limite du budget
+
+    Les plis sont parcourus du plus récent au plus ancien et, pour chaque pli,
+    tous les backends sont évalués: si le budget est épuisé, les backends
+    restent comparés sur les mêmes plis. Le boosting est entraîné avec arrêt
+    anticipé; le nombre d'itérations retenu est mémorisé. `tuned_params`
+    ({backend: hyperparamètres}, voir tuning.py) remplace les valeurs par défaut.
+
+    Retourne {backend: {'MAE', 'RMSE', 'MAPE', 'residual_quantiles', 'folds',
+    'params'}}; `residual_quantiles` donne les quantiles FORECAST_QUANTILES des
+    erreurs (réel - prévu) sur les plis.
+    """
+    tuned_params = tuned_params or {}
+    start = time.perf_counter()
+    folds = rolling_origin_folds(len(X))
+    results = {name: {'scores': [], 'params': [], 'residuals': []} for name in backends}
+
+    for origin, test_end in folds:
+        if results[backends[0]]['scores'] and time.perf_counter() - start > budget_s:
+            break
+
+        for name in backends:
+            backend = get_backend(name)
+            model = backend.fit(X[:origin], y[:origin], features, n_jobs=n_jobs,
+                                params={**tuned_params.get(name, {}), **backend.early_stopping_params})
+            predictions = backend.predict(model, X[origin:test_end])
+            results[name]['scores'].append(_metrics(y[origin:test_end], predictions))
+            results[name]['residuals'].append(y[origin:test_end] - predictions)
+            results[name]['params'].append(backend.tuned_params(model))
+
+    cv_results = {}
+    for name, result in results.items():
+        if not result['scores']:
+            continue
+        cv_results[name] = {
+            metric: float(np.mean([score[metric] for score in result['scores']]))
+            for metric in ('MAE', 'RMSE', 'MAPE')
+        }
+        cv_results[name]['residual_quantiles'] = np.quantile(
+            np.concatenate(result['residuals']), FORECAST_QUANTILES).tolist()
+        cv_results[name]['folds'] = len(result['scores'])
+        cv_results[name]['params'] = _median_params(result['params'])
+
+    return cv_results
+
+
+def _median_params(params_list):
+    """Médiane des hyperparamètres appris sur les plis"""
+    if not params_list or not params_list[0]:
+        return {}
+    return {key: int(np.median([params[key] for params in params_list])) for key in params_list[0]}
+
+
+def select_and_train(data, features, backends=None, n_jobs=-1, cache=None, restaurant=None,
+                     plat=None, variant='', budget_s=SELECTION_BUDGET_S, tuned_params=None):
+    """Choisit le backend par validation croisée puis entraîne le gagnant sur tout l'historique
+
+    La configuration gagnante (backend et hyperparamètres appris) est mise en
+    cache par plat: tant qu'elle est récente, seuls les nouveaux entraînements
+    du gagnant sont payés, sans nouvelle validation croisée. `tuned_params`
+    donne les hyperparamètres de chaque backend trouvés hors ligne pour ce
+    plat; `variant` doit alors les distinguer.
+
+    Retourne (model, best_name, model_metrics) comme train_best_model.
+    """
+    backends = resolve_backends(backends)
+    tuned_params = tuned_params or {}
+    X = data[features].to_numpy(dtype=float)
+    y = data['Quantite'].to_numpy(dtype=float)
+    last_date = data['Date'].iloc[-1]
+
+    selection_key = None
+    selection = None
+    if cache is not None:
+        selection_key = make_model_key(restaurant, plat, 'selection', features,
+                                       variant='+'.join(([variant] if variant else []) + backends))
+        selection = cache.get(selection_key)
+        if selection is not None and (last_date - selection['selected_until']).days >= RESELECT_EVERY_DAYS:
+            selection = None
+
+    if selection is None:
+        cv_results = cross_validate_backends(X, y, features, backends, n_jobs=n_jobs, budget_s=budget_s,
+                                             tuned_params=tuned_params)
+
+        if cv_results:
+            best_name = min(cv_results, key=lambda name: cv_results[name]['MAE'])
+            params = cv_results[best_name]['params']
+        else:
+            # Historique trop court pour une validation croisée
+            best_name, params = backends[0], {}
+
+        selection = {
+            'backend': best_name,
+            'params': params,
+            'metrics': {name: {metric: result[metric] for metric in ('MAE', 'RMSE', 'MAPE', 'residual_quantiles')}
+                        for name, result in cv_results.items()},
+            'folds': max([result['folds'] for result in cv_results.values()], default=0),
+            'selected_until': last_date
+        }
+        if cache is not None:
+            cache.put(selection_key, selection)
+
+    backend = get_backend(selection['backend'])
+    params = {**tuned_params.get(selection['backend'], {}), **selection['params']}
+    model = backend.fit(X, y, features, n_jobs=n_jobs, params=params)
+
+    return model, selection['backend'], selection['metrics']
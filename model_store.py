@@ -0,0 +1,269 @@
+"""
+Stockage persistant des modèles ML entraînés
+Cache disque des modèles par (restaurant, plat, empreinte des données, features)
+avec éviction LRU et limite de taille. Les modèles sont enregistrés avec joblib,
+sans compression pour être relus en mmap, et leurs métadonnées dans un fichier
+JSON à côté
+"""
+
+import os
+import json
+import pickle
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List
+
+import joblib
+import numpy as np
+import pandas as pd
+
+DATA_DIR = "restaurant_data"
+MODELS_DIR = os.path.join(DATA_DIR, "models")
+
+# À incrémenter si le format des modèles ou des features change
+MODEL_FORMAT_VERSION = 4
+
+# Niveau de compression zlib du mode archive (ModelCache(compress=True))
+ARCHIVE_COMPRESSION = 3
+
+# Métadonnées de modèle stockées en date dans le fichier JSON
+SIDECAR_TIMESTAMPS = ('trained_until',)
+
+
+def data_fingerprint(df: pd.DataFrame) -> str:
+    """Empreinte stable d'un DataFrame (valeurs + colonnes)"""
+    hasher = hashlib.sha256()
+    hasher.update('|'.join(map(str, df.columns)).encode())
+    hasher.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return hasher.hexdigest()
+
+
+def params_fingerprint(params: Dict[str, Any]) -> str:
+    """Empreinte courte d'hyperparamètres (dictionnaires imbriqués)"""
+    encoded = json.dumps(params, sort_keys=True, default=_json_default)
+    return hashlib.sha256(encoded.encode()).hexdigest()[:16]
+
+
+def make_model_key(restaurant: str, plat: str, fingerprint: str, features: List[str],
+                   variant: str = '') -> str:
+    """Clé de cache d'un modèle: restaurant, plat, données et jeu de features
+
+    `variant` distingue plusieurs modèles entraînés sur les mêmes données
+    (par exemple le mode direct et son horizon).
+    """
+    parts = [
+        f"v{MODEL_FORMAT_VERSION}",
+        str(restaurant),
+        str(plat),
+        fingerprint,
+        ','.join(features)
+    ]
+    if variant:
+        parts.append(variant)
+    return hashlib.sha256('|'.join(parts).encode()).hexdigest()
+
+
+def _json_default(value):
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+
+class _ModelEntry(dict):
+    """Entrée de modèle relue depuis son fichier JSON
+
+    Le modèle n'est chargé qu'au premier accès à entry['model']; en mmap, ses
+    tableaux ne sont lus sur le disque qu'à la première prévision.
+    """
+
+    def __init__(self, metadata, artifact_path, mmap_mode):
+        super().__init__(metadata)
+        self.artifact_path = artifact_path
+        self.mmap_mode = mmap_mode
+
+    def __missing__(self, key):
+        if key != 'model':
+            raise KeyError(key)
+        self['model'] = joblib.load(self.artifact_path, mmap_mode=self.mmap_mode)
+        return self['model']
+
+
+class ModelCache:
+    """Cache disque des modèles entraînés avec éviction LRU
+
+    Les entrées contenant un modèle sont enregistrées en deux fichiers: le
+    modèle ({clé}.joblib, sans compression pour être relu en mmap) et ses
+    métadonnées ({clé}.json: features, empreinte des données, métriques,
+    dates d'entraînement). Avec `compress=True` (mode archive), les modèles
+    sont compressés: plus petits sur le disque, mais relus entièrement. Les
+    autres entrées sont des fichiers pickle.
+
+    La date de dernière modification du fichier pickle ou JSON sert
+    d'horodatage LRU: elle est rafraîchie à chaque lecture. Un petit cache
+    mémoire évite de relire les entrées entre deux reruns.
+    """
+
+    def __init__(self, cache_dir: str = MODELS_DIR, max_entries: int = 500,
+                 max_size_mb: float = 1024, memory_entries: int = 64, compress: bool = False):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_size_bytes = max_size_mb * 1024 * 1024
+        self.memory_entries = memory_entries
+        self.compress = compress
+        self._memory = OrderedDict()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def __getstate__(self):
+        # Envoyé aux workers d'entraînement: sans le cache mémoire (modèles chargés)
+        state = self.__dict__.copy()
+        state['_memory'] = OrderedDict()
+        return state
+
+    def _path(self, key: str, suffix: str = '.pkl') -> str:
+        return os.path.join(self.cache_dir, f"{key}{suffix}")
+
+    def _index_path(self, key: str) -> str:
+        """Fichier de l'entrée qui sert d'horodatage LRU (JSON d'un modèle ou pickle)"""
+        sidecar = self._path(key, '.json')
+        return sidecar if os.path.exists(sidecar) else self._path(key)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Retourne l'entrée en cache ou None"""
+        path = self._index_path(key)
+
+        if key in self._memory:
+            if os.path.exists(path):
+                self._memory.move_to_end(key)
+                self._touch(path)
+                return self._memory[key]
+            # Fichier évincé par un autre processus
+            del self._memory[key]
+
+        if not os.path.exists(path):
+            return None
+
+        try:
+            entry = self._read_sidecar(key, path) if path.endswith('.json') else self._read_pickle(path)
+        except Exception:
+            # Entrée corrompue ou incompatible: on la supprime
+            self._remove(key)
+            return None
+
+        self._touch(path)
+        self._remember(key, entry)
+        return entry
+
+    def put(self, key: str, entry: Dict[str, Any]):
+        """Enregistre une entrée puis applique la politique d'éviction"""
+        entry = {**entry, 'cached_at': time.time()}
+
+        # Écritures atomiques: plusieurs sessions peuvent écrire en parallèle
+        if 'model' in entry:
+            metadata = {k: v for k, v in entry.items() if k != 'model'}
+            metadata['compressed'] = self.compress
+            compress = ARCHIVE_COMPRESSION if self.compress else 0
+            self._write(self._path(key, '.joblib'), lambda tmp_path: joblib.dump(entry['model'], tmp_path, compress=compress))
+            self._write(self._path(key, '.json'), lambda tmp_path: self._dump(
+                tmp_path, json.dumps(metadata, default=_json_default, ensure_ascii=False, indent=1).encode()))
+        else:
+            self._write(self._path(key), lambda tmp_path: self._dump(
+                tmp_path, pickle.dumps(entry, protocol=pickle.HIGHEST_PROTOCOL)))
+
+        self._remember(key, entry)
+        self.evict()
+
+    def _write(self, path: str, write):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        write(tmp_path)
+        os.replace(tmp_path, path)
+
+    def _dump(self, path: str, data: bytes):
+        with open(path, 'wb') as f:
+            f.write(data)
+
+    def _read_pickle(self, path: str) -> Dict[str, Any]:
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+    def _read_sidecar(self, key: str, path: str) -> Dict[str, Any]:
+        artifact_path = self._path(key, '.joblib')
+        if not os.path.exists(artifact_path):
+            raise FileNotFoundError(artifact_path)
+
+        with open(path, 'rb') as f:
+            metadata = json.load(f)
+        for name in SIDECAR_TIMESTAMPS:
+            if metadata.get(name) is not None:
+                metadata[name] = pd.Timestamp(metadata[name])
+
+        return _ModelEntry(metadata, artifact_path, None if metadata.get('compressed') else 'r')
+
+    def models_metadata(self, restaurant: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Métadonnées (JSON) des modèles enregistrés, sans charger les modèles ni rafraîchir le LRU"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            key, suffix = os.path.splitext(name)
+            if suffix != '.json':
+                continue
+            try:
+                metadata = self._read_sidecar(key, self._path(key, '.json'))
+            except Exception:
+                continue
+            if restaurant is None or metadata.get('restaurant') == restaurant:
+                entries.append(dict(metadata))
+        return entries
+
+    def evict(self):
+        """Supprime les entrées les moins récemment utilisées au-delà des limites"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            key, suffix = os.path.splitext(name)
+            if suffix not in ('.pkl', '.json'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, name))
+                size = stat.st_size
+                if suffix == '.json':
+                    size += os.stat(self._path(key, '.joblib')).st_size
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, size, key))
+
+        entries.sort()
+        total_size = sum(size for _, size, _ in entries)
+
+        while entries and (len(entries) > self.max_entries or total_size > self.max_size_bytes):
+            _, size, key = entries.pop(0)
+            self._remove(key)
+            total_size -= size
+
+    def clear(self):
+        """Vide complètement le cache"""
+        for name in os.listdir(self.cache_dir):
+            key, suffix = os.path.splitext(name)
+            if suffix in ('.pkl', '.json', '.joblib'):
+                self._remove(key)
+        self._memory.clear()
+
+    def _remember(self, key: str, entry: Dict[str, Any]):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _touch(self, path: str):
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+
+    def _remove(self, key: str):
+        for suffix in ('.pkl', '.json', '.joblib'):
+            try:
+                os.remove(self._path(key, suffix))
+            except OSError:
+                pass
+        self._memory.pop(key, None)
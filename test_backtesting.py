@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""Test du backtest des prévisions sur l'historique"""
+
+import time
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from backtesting import (
+    BACKTEST_HORIZON, BACKTEST_REFIT_EVERY_DAYS, backtest_dish, backtest_restaurant, error_curves, origin_windows
+)
+from forecasting import (
+    CALENDAR_FEATURES, LagRingBuffer, build_daily_dataset, create_features, recursive_forecast,
+    shutdown_training_executor
+)
+from model_backends import backend_for_model
+from model_selection import select_and_train
+from test_forecasting import make_sales
+
+
+def backtest_reference(plat_data_agg, features, optional_features, origins, horizon):
+    """Une prévision récursive par origine, comme predict_sales_ml sur les données tronquées"""
+    predictions = []
+    model = None
+    for n, k in enumerate(origins):
+        if n % BACKTEST_REFIT_EVERY_DAYS == 0:
+            model, _, _ = select_and_train(plat_data_agg.iloc[:k], features)
+            model = backend_for_model(model).compact(model)
+        last_row = plat_data_agg.iloc[k - 1]
+        pred = recursive_forecast(
+            model, LagRingBuffer.from_series([plat_data_agg['Quantite'].to_numpy(dtype=float)[:k]]),
+            pd.date_range(last_row['Date'] + timedelta(days=1), periods=horizon), features,
+            tendance=np.array([last_row['Tendance']], dtype=float),
+            static=last_row[optional_features].to_numpy(dtype=float).reshape(1, -1),
+            static_features=optional_features
+        )[0]
+        predictions.append(np.rint(pred).astype(int))
+    return np.vstack(predictions)
+
+
+if __name__ == "__main__":
+    print("🧪 Test du backtest\n")
+
+    print("=" * 60)
+    print("TEST 1 : Origines prévues en lot vs une à une")
+    print("=" * 60)
+
+    df = create_features(make_sales(nb_jours=180, plats=('Burger', 'Pizza', 'Salade')))
+    plat_data_agg, features, optional_features = build_daily_dataset(df, 'Burger')
+
+    start = time.time()
+    result = backtest_dish(plat_data_agg, features, optional_features)
+    duree = time.time() - start
+
+    first = len(plat_data_agg) - len(result['origins']) - BACKTEST_HORIZON + 1
+    origins = range(first, first + len(result['origins']))
+
+    start = time.time()
+    reference = backtest_reference(plat_data_agg, features, optional_features, origins, BACKTEST_HORIZON)
+    duree_reference = time.time() - start
+
+    if np.array_equal(result['predictions'], reference) and result['actuals'].shape == reference.shape:
+        print(f"✅ {len(origins)} origines x {BACKTEST_HORIZON} jours identiques "
+              f"({duree_reference:.2f}s une à une → {duree:.2f}s en lot, {len(result['models'])} entraînements)")
+    else:
+        print("❌ Les prévisions en lot diffèrent")
+
+    # Prévision seule (même modèle): une boucle récursive par origine vs une pour toutes
+    model, _, _ = select_and_train(plat_data_agg.iloc[:first], features)
+    model = backend_for_model(model).compact(model)
+    quantites = plat_data_agg['Quantite'].to_numpy(dtype=float)
+    tendance = plat_data_agg['Tendance'].to_numpy(dtype=float)
+
+    start = time.time()
+    for k in origins:
+        recursive_forecast(model, LagRingBuffer.from_series([quantites[:k]]),
+                           pd.date_range(plat_data_agg['Date'].iloc[k], periods=BACKTEST_HORIZON), features,
+                           tendance=tendance[k - 1:k])
+    duree_reference = time.time() - start
+
+    start = time.time()
+    histories, calendars, _ = origin_windows(quantites, plat_data_agg[CALENDAR_FEATURES].to_numpy(dtype=float),
+                                             origins[0], origins[-1] + 1, BACKTEST_HORIZON)
+    recursive_forecast(model, LagRingBuffer(histories), None, features,
+                       tendance=tendance[origins[0] - 1:origins[-1]], calendar=calendars)
+    duree = time.time() - start
+    print(f"  • Prévision des {len(origins)} origines: {duree_reference:.3f}s une à une → {duree:.3f}s en lot")
+
+    attendu = plat_data_agg['Quantite'].to_numpy()[origins[-1]:origins[-1] + BACKTEST_HORIZON]
+    print(f"{'✅' if np.array_equal(result['actuals'][-1], attendu) else '❌'} Ventes réelles alignées sur les origines")
+
+    print("\n" + "=" * 60)
+    print("TEST 2 : Reprise d'un backtest interrompu")
+    print("=" * 60)
+
+    complet = backtest_restaurant(df, max_workers=1)
+    interrompu = {**complet, 'dishes': {'Burger': complet['dishes']['Burger']}, 'complete': False}
+
+    calcules = []
+    sauvegardes = []
+    repris = backtest_restaurant(df, max_workers=1, previous=interrompu, checkpoint=sauvegardes.append,
+                                 progress=lambda done, total, plat: calcules.append(plat))
+
+    identiques = all(np.array_equal(repris['dishes'][plat]['predictions'], complet['dishes'][plat]['predictions'])
+                     for plat in complet['dishes'])
+    if sorted(calcules) == ['Pizza', 'Salade'] and identiques and repris['complete'] and sauvegardes:
+        print("✅ Seuls les plats restants sont calculés, résultats identiques")
+    else:
+        print(f"❌ Reprise incorrecte (plats calculés: {calcules})")
+
+    calcules.clear()
+    backtest_restaurant(df, max_workers=1, horizon=7, previous=complet,
+                        progress=lambda done, total, plat: calcules.append(plat))
+    print(f"{'✅' if len(calcules) == 3 else '❌'} Autre configuration: backtest recalculé")
+
+    print("\n" + "=" * 60)
+    print("TEST 3 : Plats répartis sur le pool")
+    print("=" * 60)
+
+    try:
+        start = time.time()
+        parallele = backtest_restaurant(df, max_workers=2)
+        duree = time.time() - start
+    finally:
+        shutdown_training_executor()
+
+    courbes = error_curves(parallele)
+    identiques = all(np.array_equal(parallele['dishes'][plat]['predictions'], complet['dishes'][plat]['predictions'])
+                     for plat in complet['dishes'])
+    if identiques and len(courbes) == 3 * BACKTEST_HORIZON:
+        print(f"✅ 3 plats sur 2 workers ({duree:.2f}s), identiques au calcul séquentiel")
+    else:
+        print("❌ Résultats parallèles différents")
+
+    par_horizon = courbes.groupby('Horizon')['MAE'].mean()
+    print(f"  • MAE J+1: {par_horizon.iloc[0]:.2f}, J+{BACKTEST_HORIZON}: {par_horizon.iloc[-1]:.2f}")
+
+    print("\n" + "=" * 60)
+    print("✅ TESTS TERMINÉS")
+    print("=" * 60)
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""Test des modèles de référence et du moteur de prévisions par paliers"""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+from baselines import build_sales_matrix, forecast_baselines, score_baselines
+from forecasting import predict_sales_tiered, predict_sales_ml
+
+
+def make_menu(nb_jours=120, seed=0):
+    """Un plat très régulier, un plat intermittent et un plat en forte croissance"""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('2026-01-01', periods=nb_jours)
+    profil = [20, 22, 25, 24, 30, 45, 40]
+    rows = []
+    for t, date in enumerate(dates):
+        rows.append({'Date': date, 'Plat': 'Menu du jour', 'Quantite': profil[date.dayofweek]})
+        if rng.random() < 0.2:
+            rows.append({'Date': date, 'Plat': 'Homard', 'Quantite': 1})
+        rows.append({'Date': date, 'Plat': 'Poke bowl', 'Quantite': int(5 + 0.5 * t + rng.normal(0, 8) ** 2)})
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    print("🧪 Test des modèles de référence\n")
+
+    df = make_menu()
+
+    print("=" * 60)
+    print("TEST 1 : Matrice jours x plats")
+    print("=" * 60)
+
+    dates, plats, values = build_sales_matrix(df)
+    homard = values[:, plats.index('Homard')]
+    if len(dates) == 120 and np.nanmin(homard) == 0 and np.isnan(homard[:np.argmax(homard > 0)]).all():
+        print("✅ Calendrier continu, jours sans vente à 0 et NaN avant la première vente")
+    else:
+        print("❌ Matrice incorrecte")
+
+    print("\n" + "=" * 60)
+    print("TEST 2 : Modèles de référence")
+    print("=" * 60)
+
+    forecasts = forecast_baselines(values, 14, dates)
+    menu = plats.index('Menu du jour')
+    attendu = [20, 22, 25, 24, 30, 45, 40]
+    jours = (dates[-1].dayofweek + 1 + np.arange(14)) % 7
+    if np.allclose(forecasts['seasonal_naive'][:, menu], np.take(attendu, jours)) and \
+            np.allclose(forecasts['weekday_mean'][:, menu], np.take(attendu, jours)):
+        print("✅ Naïf saisonnier et moyenne par jour de semaine retrouvent le profil hebdomadaire")
+    else:
+        print("❌ Profil hebdomadaire non retrouvé")
+
+    if np.isnan(forecasts['croston'][:, menu]).all() and np.isfinite(forecasts['croston'][:, plats.index('Homard')]).all():
+        print("✅ Croston réservé aux plats intermittents")
+    else:
+        print("❌ Croston appliqué à tort")
+
+    scores = score_baselines(values, dates)
+    print(f"  • MAE naïf saisonnier (Menu du jour): {scores['seasonal_naive']['MAE'][menu]:.2f}")
+
+    print("\n" + "=" * 60)
+    print("TEST 3 : Moteur par paliers")
+    print("=" * 60)
+
+    start = time.time()
+    previsions, rapport = predict_sales_tiered(df, 30)
+    duree_paliers = time.time() - start
+
+    start = time.time()
+    for plat in plats:
+        predict_sales_ml(df, plat, 30)
+    duree_ml = time.time() - start
+
+    for plat, info in sorted(rapport.items()):
+        print(f"  • {plat}: palier {info['tier']}, {info['model']}, MAE {info['MAE']:.2f}, {info['duration']:.3f}s")
+
+    if rapport['Menu du jour']['tier'] == 'baseline' and rapport['Homard']['tier'] == 'baseline' \
+            and rapport['Poke bowl']['tier'] == 'ml':
+        print("✅ Seul le plat irrégulier passe au palier ML")
+    else:
+        print("❌ Répartition des paliers inattendue")
+
+    if all(len(pred) == 30 for pred in previsions.values()) and len(previsions) == 3:
+        print(f"✅ 30 jours prévus pour chaque plat ({duree_paliers:.2f}s contre {duree_ml:.2f}s en tout ML)")
+    else:
+        print("❌ Prévisions manquantes")
+
+    print("\n" + "=" * 60)
+    print("✅ TESTS TERMINÉS")
+    print("=" * 60)
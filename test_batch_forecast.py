@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""Test du traitement par lots des prévisions"""
+
+import contextlib
+import io
+import os
+import pickle
+import shutil
+import tempfile
+import time
+
+from batch_forecast import main as batch_main
+from drift_monitor import DriftMonitor
+from forecasting import MAX_FORECAST_HORIZON, create_features, ForecastService
+from forecast_store import ForecastStore
+from model_store import ModelCache
+from test_forecasting import make_sales
+
+
+if __name__ == "__main__":
+    print("🧪 Test du traitement par lots\n")
+
+    data_dir = tempfile.mkdtemp()
+
+    try:
+        df = make_sales(plats=('Burger', 'Pizza', 'Salade'))
+        restaurants = {
+            'Chez Paul': {'name': 'Chez Paul', 'data': df},
+            'Sans données': {'name': 'Sans données', 'data': None}
+        }
+        with open(os.path.join(data_dir, 'demo_data.pkl'), 'wb') as f:
+            pickle.dump(restaurants, f)
+
+        print("=" * 60)
+        print("TEST 1 : Calcul de tous les restaurants")
+        print("=" * 60)
+
+        sortie = io.StringIO()
+        with contextlib.redirect_stdout(sortie):
+            code = batch_main(['--data-dir', data_dir, '--workers', '1'])
+        print(sortie.getvalue(), end='')
+        print("✅ Traitement terminé sans erreur" if code == 0 else "❌ Erreurs pendant le traitement")
+        print(f"{'✅' if 'Chez Paul: 3 plats' in sortie.getvalue() else '❌'} 3 plats prévus comptés")
+
+        print("\n" + "=" * 60)
+        print("TEST 2 : L'application relit les prévisions précalculées")
+        print("=" * 60)
+
+        store = ForecastStore(os.path.join(data_dir, 'forecasts'))
+        # Prévisions relues: déjà enregistrées dans le suivi par le traitement par lots
+        monitor, enregistrees = DriftMonitor('demo', data_dir), []
+        monitor.record = lambda restaurant, plat, pred: enregistrees.append(plat)
+        service = ForecastService(create_features(df), restaurant='demo/Chez Paul',
+                                  cache=ModelCache(os.path.join(data_dir, 'models')), store=store, monitor=monitor)
+        start = time.time()
+        service.prefetch()
+        duree = time.time() - start
+
+        if service.precomputed_at is not None and len(service.get_all()) == 3:
+            print(f"✅ 3 plats relus depuis le store en {duree:.3f}s")
+        else:
+            print("❌ Prévisions précalculées non utilisées")
+        if not enregistrees:
+            print("✅ Prévisions relues sans réenregistrement dans le suivi")
+        else:
+            print(f"❌ Prévisions relues réenregistrées dans le suivi: {enregistrees}")
+
+        # Période d'analyse la plus longue: couverte par l'horizon du traitement par lots
+        service_long = ForecastService(create_features(df), restaurant='demo/Chez Paul', store=store,
+                                       horizon=MAX_FORECAST_HORIZON)
+        if service_long.load_precomputed() \
+                and all(len(pred) == MAX_FORECAST_HORIZON for pred in service_long.get_all().values()):
+            print(f"✅ Prévisions à {MAX_FORECAST_HORIZON} jours relues sans recalcul")
+        else:
+            print(f"❌ Horizon de {MAX_FORECAST_HORIZON} jours recalculé")
+
+        print("\n" + "=" * 60)
+        print("TEST 3 : Données ou configuration modifiées")
+        print("=" * 60)
+
+        df_modifie = df.copy()
+        df_modifie.loc[df_modifie.index[0], 'Quantite'] += 1
+        service_modifie = ForecastService(create_features(df_modifie), restaurant='demo/Chez Paul', store=store)
+        service_direct = ForecastService(create_features(df), restaurant='demo/Chez Paul', store=store, mode='direct')
+
+        if not service_modifie.load_precomputed() and not service_direct.load_precomputed():
+            print("✅ Prévisions précalculées ignorées quand elles ne correspondent plus")
+        else:
+            print("❌ Prévisions périmées relues")
+
+        print("\n" + "=" * 60)
+        print("✅ TESTS TERMINÉS")
+        print("=" * 60)
+
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
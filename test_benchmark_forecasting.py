@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""Test rapide du banc d'essai des prévisions"""
+
+import json
+import os
+import shutil
+import tempfile
+
+from benchmark_forecasting import benchmark_backend, main, make_synthetic_sales
+
+
+if __name__ == "__main__":
+    print("🧪 Test du banc d'essai des prévisions\n")
+
+    df = make_synthetic_sales(6, 1)
+    nb_plats = df['Plat'].nunique()
+
+    print("=" * 60)
+    print("TEST 1 : Tous les plats mesurés par défaut")
+    print("=" * 60)
+
+    resultat = benchmark_backend(df, 'Ridge')
+    mesures = resultat['dishes_timed'] + resultat['dishes_skipped']
+    if mesures == nb_plats and resultat['MAE'] is not None:
+        print(f"✅ {mesures} plats sur {nb_plats} mesurés (MAE {resultat['MAE']:.2f})")
+    else:
+        print(f"❌ {mesures} plats mesurés sur {nb_plats}")
+
+    echantillon = benchmark_backend(df, 'Ridge', sample=2)
+    if echantillon['dishes_timed'] + echantillon['dishes_skipped'] == 2:
+        print("✅ --sample limite la mesure à un échantillon")
+    else:
+        print("❌ Échantillon non respecté")
+
+    print("\n" + "=" * 60)
+    print("TEST 2 : Exécution de bout en bout")
+    print("=" * 60)
+
+    dossier = tempfile.mkdtemp()
+    try:
+        chemin = os.path.join(dossier, 'resultats.json')
+        code = main(['--dishes', '3', '--years', '1', '--backends', 'Ridge', '--json', chemin])
+        with open(chemin) as f:
+            sortie = json.load(f)
+    finally:
+        shutil.rmtree(dossier, ignore_errors=True)
+
+    r = sortie['results'][0]
+    if code == 0 and len(sortie['results']) == 1 and sortie['config']['sample'] is None \
+            and r['dishes_timed'] + r['dishes_skipped'] == r['dishes'] == 3:
+        print("✅ Résultats JSON écrits pour les 3 plats du jeu synthétique")
+    else:
+        print(f"❌ Résultats inattendus: {sortie}")
+
+    print("\n" + "=" * 60)
+    print("✅ TESTS TERMINÉS")
+    print("=" * 60)
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""Test du panel des ventes partitionné par plat"""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+from baselines import build_sales_matrix
+from dish_panel import DishPanel, get_dish_panel
+from forecasting import build_daily_dataset, build_global_dataset, create_features
+from test_forecasting import make_sales
+
+
+if __name__ == "__main__":
+    print("🧪 Test du panel des ventes par plat\n")
+
+    df = make_sales(plats=('Burger', 'Pizza', 'Salade'))
+    panel = DishPanel(df)
+
+    print("=" * 60)
+    print("TEST 1 : Ventes d'un plat sans filtrage")
+    print("=" * 60)
+
+    ok = True
+    for plat in ['Burger', 'Pizza', 'Salade']:
+        attendu = df[df['Plat'] == plat].sort_values('Date', kind='stable').reset_index(drop=True)
+        ok = ok and panel.rows(plat).reset_index(drop=True).equals(attendu)
+    print("✅ Tranches identiques au filtrage de la table" if ok else "❌ Tranches incorrectes")
+
+    if len(panel.rows('Inconnu')) == 0 and get_dish_panel(df) is get_dish_panel(df.copy()):
+        print("✅ Plat inconnu vide et panel construit une seule fois par version des données")
+    else:
+        print("❌ Cache du panel incorrect")
+
+    print("\n" + "=" * 60)
+    print("TEST 2 : Calendrier continu")
+    print("=" * 60)
+
+    serie = panel.series('Burger')
+    jours_vendus = df[df['Plat'] == 'Burger']['Date'].nunique()
+    if len(serie) == (serie.index[-1] - serie.index[0]).days + 1 and (serie == 0).sum() == len(serie) - jours_vendus:
+        print(f"✅ {len(serie)} jours calendaires dont {len(serie) - jours_vendus} sans vente à 0")
+    else:
+        print("❌ Série journalière incorrecte")
+
+    dates, plats, values = panel.sales_matrix()
+    dates_ref, plats_ref, values_ref = build_sales_matrix(df)
+    if dates.equals(dates_ref) and plats == plats_ref and np.allclose(values, values_ref, equal_nan=True):
+        print("✅ Matrice jours x plats identique à celle des modèles de référence")
+    else:
+        print("❌ Matrice différente")
+
+    plat_data_agg, _, _ = build_daily_dataset(df, 'Burger', panel=panel)
+    # Un jour sans vente réapparaît en Lag_7 exactement 7 jours calendaires plus tard
+    jour = plat_data_agg.index[(plat_data_agg['Quantite'] == 0) & (plat_data_agg.index + 7 <= plat_data_agg.index[-1])][0]
+    if plat_data_agg['Date'].diff().dropna().dt.days.eq(1).all() and plat_data_agg.loc[jour + 7, 'Lag_7'] == 0:
+        print("✅ Lags calculés sur des jours calendaires")
+    else:
+        print("❌ Lags calculés sur les positions de lignes")
+
+    # Modèle global: mêmes lags calendaires pour chaque plat du panel empilé
+    global_panel, _, _ = build_global_dataset(create_features(df))
+    ventes = df.groupby(['Plat', 'Date'])['Quantite'].sum()
+    attendu = [ventes.get((plat, date - pd.Timedelta(days=7)), 0)
+               for plat, date in zip(global_panel['Plat'], global_panel['Date'])]
+    # Lag_7 connu à partir du 7e jour suivant la première vente (avant: moyenne du plat)
+    recent = (global_panel['Date'] - global_panel['Plat'].map(df.groupby('Plat')['Date'].min())).dt.days >= 7
+    continu = global_panel.groupby('Plat')['Date'].apply(lambda d: d.diff().dropna().dt.days.eq(1).all()).all()
+    if continu and (global_panel['Lag_7'].to_numpy() == np.array(attendu))[recent.to_numpy()].all():
+        print("✅ Modèle global: lags calculés sur des jours calendaires")
+    else:
+        print("❌ Modèle global: lags calculés sur les positions de lignes")
+
+    print("\n" + "=" * 60)
+    print("TEST 3 : Coût d'accès par plat")
+    print("=" * 60)
+
+    gros = make_sales(nb_jours=365, plats=tuple(f"Plat {i}" for i in range(200)))
+
+    start = time.time()
+    for plat in gros['Plat'].unique():
+        gros[gros['Plat'] == plat]
+    duree_filtre = time.time() - start
+
+    start = time.time()
+    gros_panel = DishPanel(gros)
+    duree_construction = time.time() - start
+
+    start = time.time()
+    for plat in gros_panel.plats:
+        gros_panel.rows(plat)
+    duree_panel = time.time() - start
+
+    print(f"  • {len(gros)} ventes, 200 plats")
+    print(f"  • Filtrage par plat: {duree_filtre:.3f}s")
+    print(f"  • Panel: {duree_construction:.3f}s (construction unique) + {duree_panel:.3f}s (accès)")
+
+    print("\n" + "=" * 60)
+    print("✅ TESTS TERMINÉS")
+    print("=" * 60)
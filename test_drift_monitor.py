@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""Test du suivi des erreurs de prévision et du réentraînement à la demande"""
+
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from dish_panel import DishPanel
+import forecasting
+from drift_monitor import MODEL_MAX_AGE_DAYS, DriftMonitor, model_status, monitor_path
+from forecasting import HIERARCHY_CATEGORY_PREFIX, ForecastService, create_features
+from model_store import ModelCache
+from test_forecasting import make_sales
+
+
+def model_files(cache_dir):
+    return len([name for name in os.listdir(cache_dir) if name.endswith('.json')])
+
+
+def with_new_sales(df, forecasts, days, factor=1.0):
+    """Ajoute `days` jours de ventes égales aux prévisions (x factor)"""
+    rows = [pred.head(days).assign(Plat=plat, Quantite=lambda p: np.rint(p['Quantite_Prevue'] * factor).astype(int))
+            for plat, pred in forecasts.items()]
+    new = pd.concat(rows, ignore_index=True)[['Date', 'Plat', 'Quantite']]
+    return pd.concat([df[['Date', 'Plat', 'Quantite']], new[new['Quantite'] > 0]], ignore_index=True)
+
+
+def forecast_all(df, cache, monitor):
+    service = ForecastService(create_features(df), restaurant='demo/Resto', cache=cache, backends=['RandomForest'],
+                              monitor=monitor)
+    return service.get_all()
+
+
+if __name__ == "__main__":
+    print("🧪 Test du suivi de la précision\n")
+
+    print("=" * 60)
+    print("TEST 1 : Prévisions comparées aux ventes réelles")
+    print("=" * 60)
+
+    monitor = DriftMonitor()
+    dates = pd.date_range('2026-03-01', periods=10)
+    monitor.record('R', 'Burger', pd.DataFrame({'Date': dates, 'Quantite_Prevue': np.full(10, 20)}))
+
+    ventes = pd.DataFrame({'Date': dates[:6], 'Plat': 'Burger', 'Quantite': [18, 22, 20, 0, 25, 15]})
+    ventes = ventes[ventes['Quantite'] > 0]
+    compared = monitor.observe('R', DishPanel(ventes))
+    mae, bias, mean_sales, points = monitor.dish_errors('R', 'Burger')
+
+    attendu = np.array([18, 22, 20, 0, 25, 15])
+    if compared == 6 and np.isclose(mae, np.abs(20 - attendu).mean()) and np.isclose(bias, (20 - attendu).mean()) \
+            and len(monitor.state['R']['pending']['Burger']) == 4:
+        print(f"✅ 6 jours comparés (MAE {mae:.2f}, biais {bias:+.2f}), 4 jours en attente")
+    else:
+        print("❌ Comparaison incorrecte")
+
+    print("\n" + "=" * 60)
+    print("TEST 2 : Modèle gardé tant qu'il ne dérive pas")
+    print("=" * 60)
+
+    data_dir = tempfile.mkdtemp()
+    cache_dir = os.path.join(data_dir, 'models')
+    try:
+        cache = ModelCache(cache_dir)
+        df = make_sales(nb_jours=120, plats=('Burger', 'Pizza'))
+        forecasts = forecast_all(df, cache, DriftMonitor('demo', data_dir))
+        trained = model_files(cache_dir)
+
+        # Nouvelles ventes conformes aux prévisions
+        df_fidele = with_new_sales(df, forecasts, 7)
+        monitor = DriftMonitor('demo', data_dir)
+        forecast_all(df_fidele, cache, monitor)
+        reused = model_files(cache_dir) == trained
+
+        # Rerun sur les mêmes données: ni nouvelle observation, ni relecture de l'historique des modèles gardés
+        chemin = monitor_path('demo', data_dir)
+        modifie = os.stat(chemin).st_mtime_ns
+        verifications = []
+        extends_lineage = forecasting._extends_lineage
+        forecasting._extends_lineage = lambda *args: verifications.append(args) or extends_lineage(*args)
+        try:
+            forecast_all(df_fidele, cache, DriftMonitor('demo', data_dir))
+        finally:
+            forecasting._extends_lineage = extends_lineage
+        if not verifications and os.stat(chemin).st_mtime_ns == modifie and model_files(cache_dir) == trained:
+            print("✅ Rerun: modèles gardés retrouvés directement, suivi non réécrit")
+        else:
+            print(f"❌ Rerun: {len(verifications)} historiques revérifiés")
+
+        # Sans suivi, les nouvelles ventes déclenchent de nouveaux entraînements
+        forecast_all(df_fidele, cache, None)
+        retrained_without_monitor = model_files(cache_dir) > trained
+
+        points = monitor.dish_errors('demo/Resto', 'Burger')[3]
+        if reused and retrained_without_monitor and points == 7:
+            print(f"✅ {points} jours conformes: modèles gardés (réentraînés sans suivi)")
+        else:
+            print("❌ Modèles réentraînés sans dérive")
+
+        print("\n" + "=" * 60)
+        print("TEST 3 : Réentraînement sur dérive")
+        print("=" * 60)
+
+        cache = ModelCache(os.path.join(data_dir, 'derive'))
+        forecasts = forecast_all(df, cache, DriftMonitor('derive', data_dir))
+        trained = model_files(cache.cache_dir)
+
+        # Les ventes doublent: les prévisions sous-estiment
+        df_derive = with_new_sales(df, forecasts, 10, factor=2.0)
+        monitor = DriftMonitor('derive', data_dir)
+        forecast_all(df_derive, cache, monitor)
+
+        if model_files(cache.cache_dir) == trained + 2 and monitor.dish_errors('demo/Resto', 'Burger') is None:
+            print("✅ Ventes doublées: les deux modèles sont réentraînés, erreurs remises à zéro")
+        else:
+            print("❌ Dérive non détectée")
+
+        print("\n" + "=" * 60)
+        print("TEST 4 : Âge maximal des modèles")
+        print("=" * 60)
+
+        cache = ModelCache(os.path.join(data_dir, 'age'))
+        monitor = DriftMonitor('age', data_dir)
+        forecasts = forecast_all(df, cache, monitor)
+        trained = model_files(cache.cache_dir)
+
+        monitor = DriftMonitor('age', data_dir)
+        forecast_all(with_new_sales(df, forecasts, MODEL_MAX_AGE_DAYS - 1), cache, monitor)
+        kept = model_files(cache.cache_dir) == trained
+
+        status = model_status(monitor, cache, 'demo/Resto')
+        print(f"  • Âge des modèles: {status['Age_Jours'].tolist()}, statut: {status['Statut'].tolist()}")
+
+        forecast_all(with_new_sales(df, forecasts, MODEL_MAX_AGE_DAYS), cache, DriftMonitor('age', data_dir))
+        if kept and model_files(cache.cache_dir) == trained + 2:
+            print(f"✅ Modèles gardés {MODEL_MAX_AGE_DAYS - 1} jours, réentraînés à {MODEL_MAX_AGE_DAYS} jours")
+        else:
+            print("❌ Âge maximal non respecté")
+
+        # Modèle d'une catégorie (moteur hiérarchique): pas un plat
+        cache.put('groupe', {'model': None, 'best_name': 'RandomForest', 'metrics': {}, 'restaurant': 'demo/Resto',
+                             'plat': HIERARCHY_CATEGORY_PREFIX + 'Plats', 'trained_until': df['Date'].max()})
+        status = model_status(monitor, cache, 'demo/Resto')
+        if sorted(status['Plat']) == ['Burger', 'Pizza']:
+            print("✅ Tableau de bord limité aux plats")
+        else:
+            print(f"❌ Lignes inattendues: {status['Plat'].tolist()}")
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    print("\n" + "=" * 60)
+    print("✅ TESTS TERMINÉS")
+    print("=" * 60)
@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""Test du moteur de prévisions (boucle récursive NumPy)"""
+
+import os
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from forecasting import (
+    build_daily_dataset, predict_sales_ml, LagRingBuffer, recursive_forecast,
+    forecast_dishes_parallel, shutdown_training_executor, create_features, DATE_DIMENSION_COLUMNS,
+    ForecastService, predict_sales_hierarchical, predict_with_quantiles, fast_predict, service_level_quantity,
+    QUANTILE_COLUMNS, DATE_DIMENSION_MAX_DAYS, date_dimension
+)
+import forecasting
+from forecast_store import ForecastStore
+from model_store import ModelCache
+from model_selection import select_and_train
+
+
+def make_sales(nb_jours=120, plats=('Burger', 'Pizza'), seed=0):
+    """Génère des ventes journalières synthétiques avec saisonnalité hebdomadaire"""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('2026-01-01', periods=nb_jours)
+    rows = []
+    for k, plat in enumerate(plats):
+        base = 20 + 15 * k
+        for date in dates:
+            if rng.random() < 0.1:
+                continue
+            weekend = 1.3 if date.dayofweek >= 5 else 1.0
+            rows.append({'Date': date, 'Plat': plat, 'Quantite': int(base * weekend + rng.normal(0, 4))})
+    return pd.DataFrame(rows)
+
+
+def predict_reference(plat_data_agg, features, optional_features, model, jours_prevision):
+    """Ancienne boucle pd.concat, conservée comme référence"""
+    last_row = plat_data_agg.iloc[-1]
+    derniere_date = last_row['Date']
+    current_data = plat_data_agg.copy()
+    predictions = []
+
+    for i in range(1, jours_prevision + 1):
+        future_date = derniere_date + timedelta(days=i)
+        new_row = {
+            'Date': future_date,
+            'Jour_Semaine': future_date.dayofweek,
+            'Jour_Mois': future_date.day,
+            'Mois': future_date.month,
+            'Semaine_Annee': future_date.isocalendar()[1],
+            'Trimestre': (future_date.month - 1) // 3 + 1,
+            'Est_Weekend': int(future_date.dayofweek in [5, 6]),
+            'Est_Debut_Mois': int(future_date.day <= 5),
+            'Est_Fin_Mois': int(future_date.day >= 25),
+            'Tendance': last_row['Tendance'] + i
+        }
+        for feat in optional_features:
+            new_row[feat] = last_row[feat]
+
+        n = len(current_data)
+        for lag in [1, 3, 7, 14]:
+            new_row[f'Lag_{lag}'] = current_data.iloc[-lag]['Quantite'] if n >= lag else last_row['Quantite']
+        new_row['Moyenne_Mobile_7'] = current_data.tail(7)['Quantite'].mean()
+        new_row['Moyenne_Mobile_14'] = current_data.tail(14)['Quantite'].mean() if n >= 14 else last_row['Quantite']
+        new_row['Ecart_Type_7'] = current_data.tail(7)['Quantite'].std()
+
+        X_pred = pd.DataFrame([new_row])[features].to_numpy(dtype=float)
+        pred_quantite = max(0, model.predict(X_pred)[0])
+        predictions.append(int(round(pred_quantite)))
+
+        new_row['Quantite'] = pred_quantite
+        current_data = pd.concat([current_data, pd.DataFrame([new_row])], ignore_index=True)
+
+    return predictions
+
+
+def create_features_reference(df):
+    """Ancien calcul ligne à ligne des caractéristiques calendaires"""
+    df = df.copy().sort_values('Date')
+    df['Jour_Semaine'] = df['Date'].dt.dayofweek
+    df['Jour_Mois'] = df['Date'].dt.day
+    df['Mois'] = df['Date'].dt.month
+    df['Annee'] = df['Date'].dt.year
+    df['Semaine_Annee'] = df['Date'].dt.isocalendar().week
+    df['Trimestre'] = df['Date'].dt.quarter
+    df['Est_Weekend'] = df['Jour_Semaine'].isin([5, 6]).astype(int)
+    df['Est_Debut_Mois'] = (df['Jour_Mois'] <= 5).astype(int)
+    df['Est_Fin_Mois'] = (df['Jour_Mois'] >= 25).astype(int)
+    return df
+
+
+if __name__ == "__main__":
+    print("🧪 Test du moteur de prévisions\n")
+
+    print("=" * 60)
+    print("TEST 1 : Tampon circulaire vs pandas rolling")
+    print("=" * 60)
+
+    rng = np.random.default_rng(1)
+    serie = rng.integers(0, 50, 40).astype(float)
+    buffer = LagRingBuffer.from_series([serie[:14]])
+    ok = True
+    for t in range(14, 40):
+        fenetre = pd.Series(serie[:t])
+        attendu = [fenetre.iloc[-1], fenetre.iloc[-3], fenetre.iloc[-7], fenetre.iloc[-14],
+                   fenetre.tail(7).mean(), fenetre.tail(14).mean(), fenetre.tail(7).std()]
+        obtenu = [buffer.lag(1)[0], buffer.lag(3)[0], buffer.lag(7)[0], buffer.lag(14)[0],
+                  buffer.mean7()[0], buffer.mean14()[0], buffer.std7()[0]]
+        ok = ok and np.allclose(attendu, obtenu)
+        buffer.push([serie[t]])
+
+    print("✅ Lags, moyennes et écart-type identiques" if ok else "❌ Écart avec pandas")
+
+    print("\n" + "=" * 60)
+    print("TEST 2 : Prévisions identiques à l'ancienne boucle")
+    print("=" * 60)
+
+    df = make_sales()
+    plat_data_agg, features, optional_features = build_daily_dataset(df, 'Burger')
+    model, best_name, _ = select_and_train(plat_data_agg, features)
+
+    reference = predict_reference(plat_data_agg, features, optional_features, model, 30)
+
+    pred_df, _, _ = predict_sales_ml(df, 'Burger', 30)
+    if pred_df['Quantite_Prevue'].tolist() == reference:
+        print(f"✅ 30 jours identiques ({best_name})")
+    else:
+        print("❌ Les prévisions diffèrent de la référence")
+
+    print("\n" + "=" * 60)
+    print("TEST 3 : Coût de l'horizon")
+    print("=" * 60)
+
+    for horizon in [7, 90]:
+        start = time.time()
+        predict_reference(plat_data_agg, features, optional_features, model, horizon)
+        duree_reference = time.time() - start
+
+        start = time.time()
+        buffer = LagRingBuffer.from_series([plat_data_agg['Quantite'].to_numpy(dtype=float)])
+        last_row = plat_data_agg.iloc[-1]
+        recursive_forecast(
+            model, buffer, pd.date_range(last_row['Date'] + timedelta(days=1), periods=horizon), features,
+            tendance=np.array([last_row['Tendance']], dtype=float)
+        )
+        duree = time.time() - start
+
+        print(f"  • {horizon} jours: {duree_reference:.2f}s (pd.concat) → {duree:.2f}s (tampon NumPy)")
+
+    print("\n" + "=" * 60)
+    print("TEST 4 : Entraînement parallèle des plats")
+    print("=" * 60)
+
+    plats = ('Burger', 'Pizza', 'Salade', 'Pates')
+    df_menu = make_sales(plats=plats)
+    cache_dir = tempfile.mkdtemp()
+
+    try:
+        start = time.time()
+        resultats = list(forecast_dishes_parallel(
+            df_menu, plats, 30, restaurant='demo/Resto', cache=ModelCache(cache_dir), max_workers=2
+        ))
+        duree = time.time() - start
+
+        ok = len(resultats) == len(plats) and all(erreur is None for _, _, _, _, erreur, _ in resultats)
+        for plat, pred, _, _, _, _ in resultats:
+            attendu, _, _ = predict_sales_ml(df_menu, plat, 30)
+            ok = ok and pred.equals(attendu)
+
+        print(f"{'✅' if ok else '❌'} {len(resultats)} plats prévus sur 2 workers ({duree:.2f}s), identiques au calcul séquentiel")
+
+        # Deuxième passage: tous les modèles sont en cache, rien n'est envoyé au pool
+        start = time.time()
+        list(forecast_dishes_parallel(df_menu, plats, 30, restaurant='demo/Resto', cache=ModelCache(cache_dir)))
+        print(f"  • Depuis le cache: {time.time() - start:.2f}s")
+    finally:
+        shutdown_training_executor()
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    print("\n" + "=" * 60)
+    print("TEST 5 : Table des dates")
+    print("=" * 60)
+
+    gros = make_sales(nb_jours=730, plats=tuple(f"Plat {i}" for i in range(100)))
+
+    start = time.time()
+    reference = create_features_reference(gros)
+    duree_reference = time.time() - start
+
+    start = time.time()
+    obtenu = create_features(gros)
+    duree = time.time() - start
+
+    identiques = all(
+        np.array_equal(reference[col].to_numpy(dtype=int), obtenu[col].to_numpy(dtype=int))
+        for col in DATE_DIMENSION_COLUMNS
+    )
+    print(f"{'✅' if identiques else '❌'} Caractéristiques identiques sur {len(gros)} ventes "
+          f"({duree_reference:.3f}s ligne à ligne → {duree:.3f}s par date distincte)")
+
+    # Horodatages de caisse: une seule ligne de la table par jour
+    caisse = gros.assign(Date=gros['Date'] + pd.to_timedelta(np.arange(len(gros)) % 1440, unit='min'))
+    forecasting._date_dimension = None
+    horodate = create_features(caisse)
+    par_jour = all(np.array_equal(horodate[col].to_numpy(dtype=int), obtenu[col].to_numpy(dtype=int))
+                   for col in DATE_DIMENSION_COLUMNS)
+    if par_jour and len(forecasting._date_dimension) == gros['Date'].nunique():
+        print(f"✅ {caisse['Date'].nunique()} horodatages → {len(forecasting._date_dimension)} jours dans la table")
+    else:
+        print("❌ Table construite par horodatage")
+
+    date_dimension(pd.date_range('1990-01-01', periods=DATE_DIMENSION_MAX_DAYS))
+    date_dimension(pd.date_range('2026-01-01', periods=30))
+    taille = len(forecasting._date_dimension)
+    print(f"{'✅' if taille <= DATE_DIMENSION_MAX_DAYS else '❌'} Table bornée ({taille} jours gardés)")
+
+    print("\n" + "=" * 60)
+    print("TEST 6 : Prévisions pour des dates précises")
+    print("=" * 60)
+
+    ventes = make_sales(plats=('Burger', 'Pizza', 'Salade', 'Ancien'))
+    derniere = ventes['Date'].max()
+    # Salade: plus de ventes depuis deux jours; Ancien: plus vendu depuis deux mois
+    ventes = ventes[~((ventes['Plat'] == 'Salade') & (ventes['Date'] > derniere - timedelta(days=2)))
+                    & ~((ventes['Plat'] == 'Ancien') & (ventes['Date'] > derniere - timedelta(days=60)))]
+    df_dates = create_features(ventes)
+    derniere_salade = df_dates.loc[df_dates['Plat'] == 'Salade', 'Date'].max()
+    dates = [(derniere + timedelta(days=1)).date(), derniere + timedelta(days=4), derniere]
+
+    store_dir = tempfile.mkdtemp()
+    try:
+        service = ForecastService(df_dates, restaurant='demo/Resto', store=ForecastStore(store_dir))
+        resultat = service.forecast(dates)
+        horizons = {plat: result['horizon'] for plat, result in service._forecasts.items()}
+
+        # `derniere` est passée pour Burger et Pizza, mais à prévoir pour Salade
+        ok = len(resultat) == 7
+        for plat, derniere_vente in [('Burger', derniere), ('Pizza', derniere), ('Salade', derniere_salade)]:
+            jours = (derniere + timedelta(days=4) - derniere_vente).days
+            attendu, _, _ = predict_sales_ml(df_dates, plat, jours)
+            attendu = attendu[attendu['Date'].isin(pd.to_datetime(dates))]
+            ok = ok and resultat[resultat['Plat'] == plat].drop(columns='Plat').reset_index(drop=True).equals(
+                attendu.reset_index(drop=True))
+
+        if ok and horizons == {'Burger': 4, 'Pizza': 4, 'Salade': (derniere + timedelta(days=4) - derniere_salade).days}:
+            print("✅ Seules les dates demandées, chaque plat calculé jusqu'à sa date la plus lointaine")
+        else:
+            print(f"❌ Résultat incorrect (horizons: {horizons})")
+
+        if 'Ancien' not in horizons and 'Ancien' not in set(resultat['Plat']):
+            print("✅ Plat plus vendu depuis plus de 30 jours ignoré")
+        else:
+            print("❌ Plat plus vendu prévu")
+
+        relu = ForecastService(df_dates, restaurant='demo/Resto', store=ForecastStore(store_dir))
+        calculs = []
+        relu._compute_many = lambda plats, horizon, progress=None: calculs.append(plats)
+        if relu.forecast(dates).equals(resultat) and not calculs:
+            print("✅ Prévisions enregistrées et relues sans recalcul")
+        else:
+            print(f"❌ Prévisions recalculées: {calculs}")
+    finally:
+        shutil.rmtree(store_dir, ignore_errors=True)
+
+    print("\n" + "=" * 60)
+    print("TEST 7 : Prévisions hiérarchiques")
+    print("=" * 60)
+
+    df_hier = make_sales(nb_jours=120, plats=('Burger', 'Pizza', 'Salade', 'Tiramisu'))
+    df_hier['Categorie'] = df_hier['Plat'].map({'Burger': 'Plats', 'Pizza': 'Plats', 'Salade': 'Entrées',
+                                                'Tiramisu': 'Desserts'})
+    # Nouveau dessert: trois ventes seulement
+    nouveau = pd.DataFrame({'Date': df_hier['Date'].max() - pd.to_timedelta([1, 3, 5], unit='D'),
+                            'Plat': 'Panna cotta', 'Quantite': [3, 4, 2], 'Categorie': 'Desserts'})
+    df_hier = create_features(pd.concat([df_hier, nouveau], ignore_index=True))
+
+    cache_dir = tempfile.mkdtemp()
+    try:
+        forecasts, report, groupes = predict_sales_hierarchical(df_hier, 14, restaurant='demo/Resto',
+                                                               cache=ModelCache(cache_dir))
+        modeles = len([name for name in os.listdir(cache_dir) if name.endswith('.json')])
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    somme_ok = all(
+        (sum(forecasts[plat]['Quantite_Prevue'].to_numpy() for plat, info in report.items() if info['group'] == groupe)
+         == pred['Quantite_Prevue'].to_numpy()).all()
+        for groupe, pred in groupes.items()
+    )
+    print(f"{'✅' if somme_ok else '❌'} Somme des plats égale à la prévision de chaque catégorie, chaque jour")
+
+    if predict_sales_ml(df_hier, 'Panna cotta', 14)[0] is None and 'Panna cotta' in forecasts:
+        print(f"✅ Plat récent prévu via sa catégorie (part {report['Panna cotta']['share']:.1%})")
+    else:
+        print("❌ Plat récent sans prévision")
+
+    print(f"{'✅' if modeles == 3 else '❌'} {modeles} modèles entraînés pour {len(forecasts)} plats")
+
+    print("\n" + "=" * 60)
+    print("TEST 8 : Bandes de prévision P10 / P50 / P90")
+    print("=" * 60)
+
+    model_rf, _, _ = select_and_train(plat_data_agg, features, backends=['RandomForest'])
+    X = plat_data_agg[features].to_numpy(dtype=float)
+    point, bands = predict_with_quantiles(model_rf, X)
+    if np.allclose(point, fast_predict(model_rf, X)) and bands.shape == (len(X), 3) \
+            and (np.diff(bands, axis=1) >= 0).all():
+        print("✅ Moyenne des arbres identique à la prévision, quantiles ordonnés")
+    else:
+        print("❌ Bandes incohérentes")
+
+    pred_rf, _, _ = predict_sales_ml(df, 'Burger', 14, backends=['RandomForest'])
+    pred_ridge, metrics, _ = predict_sales_ml(df, 'Burger', 14, backends=['Ridge'])
+    ordonnees = all(all(col in pred.columns for col in QUANTILE_COLUMNS)
+                    and (np.diff(pred[QUANTILE_COLUMNS].to_numpy(), axis=1) >= 0).all()
+                    for pred in (pred_rf, pred_ridge))
+    print(f"{'✅' if ordonnees else '❌'} Bandes des forêts et, pour Ridge, des erreurs de validation "
+          f"(quantiles {np.round(metrics['Ridge']['residual_quantiles'], 2).tolist()})")
+
+    niveaux = [int(service_level_quantity(pred_rf, niveau).sum()) for niveau in (0.5, 0.7, 0.8, 0.9)]
+    if niveaux == sorted(niveaux) and niveaux[0] == pred_rf['P50'].sum() and niveaux[-1] == pred_rf['P90'].sum():
+        print(f"✅ Quantités croissantes avec le niveau de service: {niveaux}")
+    else:
+        print(f"❌ Quantités par niveau de service incorrectes: {niveaux}")
+
+    print("\n" + "=" * 60)
+    print("✅ TESTS TERMINÉS")
+    print("=" * 60)
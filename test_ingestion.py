@@ -0,0 +1,445 @@
+#!/usr/bin/env python3
+"""Test de l'import des ventes par blocs"""
+
+import inspect
+import io
+import itertools
+import os
+import re
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import ingestion
+from ingestion import (
+    PYARROW_AVAILABLE, COLUMN_RULES, MappingCache, apply_column_mapping, calculate_missing_columns,
+    clean_and_validate_data, extract_data_from_text, map_column_name, map_columns_intelligently, read_columnar,
+    stream_csv, to_parquet_bytes
+)
+
+
+def make_export(nb_lignes, nb_plats=40, seed=0):
+    """Export de caisse ligne à ligne (une ligne par article vendu)"""
+    rng = np.random.default_rng(seed)
+    dates = pd.Timestamp('2025-01-01') + pd.to_timedelta(rng.integers(0, 365 * 24 * 60, nb_lignes), unit='min')
+    return pd.DataFrame({
+        'Date de vente': dates.strftime('%Y-%m-%d %H:%M'),
+        'Produit': [f"Plat {i}" for i in rng.integers(0, nb_plats, nb_lignes)],
+        'Qte': rng.integers(1, 4, nb_lignes),
+        'Prix unitaire': np.round(rng.uniform(8, 25, nb_lignes), 2),
+        'Categorie': np.where(rng.random(nb_lignes) < 0.5, 'Plats', 'Desserts'),
+        'Commentaire client': ['RAS'] * nb_lignes,
+        'Ticket': rng.integers(0, 10 ** 9, nb_lignes)
+    })
+
+
+def map_columns_reference(df):
+    """Ancienne correspondance: chaîne de tests any(...) par colonne"""
+    column_mapping = {}
+
+    for col in df.columns:
+        col_lower = col.lower().replace('_', ' ').replace('-', ' ')
+
+        # Colonnes obligatoires
+        if any(word in col_lower for word in ['date', 'jour', 'day']):
+            column_mapping[col] = 'Date'
+        elif any(word in col_lower for word in ['plat', 'produit', 'item', 'nom', 'dish', 'product']):
+            column_mapping[col] = 'Plat'
+        elif any(word in col_lower for word in ['quantit', 'qte', 'qty', 'quantity', 'nombre']):
+            column_mapping[col] = 'Quantite'
+
+        # Colonnes optionnelles - Catégorie et type
+        elif any(word in col_lower for word in ['categ', 'famille', 'type plat']):
+            column_mapping[col] = 'Categorie'
+        elif any(word in col_lower for word in ['service', 'moment', 'shift', 'periode']):
+            column_mapping[col] = 'Service'
+
+        # Colonnes financières
+        elif any(word in col_lower for word in ['prix unit', 'pu', 'prix vente', 'tarif']) and 'cout' not in col_lower:
+            column_mapping[col] = 'Prix_unitaire'
+        elif any(word in col_lower for word in ['cout unit', 'coût unit', 'cu', 'prix achat', 'cost']):
+            column_mapping[col] = 'Cout_unitaire'
+        elif any(word in col_lower for word in ['chiffre', 'ca', 'revenue', 'ventes']) and 'affaire' in col_lower:
+            column_mapping[col] = 'Chiffre_affaires'
+        elif 'marge' in col_lower and 'taux' not in col_lower:
+            column_mapping[col] = 'Marge'
+        elif 'tva' in col_lower and 'taux' not in col_lower:
+            column_mapping[col] = 'TVA'
+
+        # Colonnes contextuelles
+        elif any(word in col_lower for word in ['zone', 'emplacement', 'salle', 'area']):
+            column_mapping[col] = 'Zone'
+        elif any(word in col_lower for word in ['table', 'numero']):
+            column_mapping[col] = 'Table'
+        elif any(word in col_lower for word in ['serveur', 'waiter']):
+            column_mapping[col] = 'Serveur'
+        elif any(word in col_lower for word in ['meteo', 'météo', 'weather', 'temps']) and 'attente' not in col_lower:
+            column_mapping[col] = 'Meteo'
+        elif any(word in col_lower for word in ['temperature', 'temp']) and 'ture' in col_lower:
+            column_mapping[col] = 'Temperature'
+
+        # Colonnes marketing
+        elif any(word in col_lower for word in ['promotion', 'promo', 'offre']):
+            column_mapping[col] = 'Promotion'
+        elif any(word in col_lower for word in ['remise', 'discount', 'reduction']):
+            column_mapping[col] = 'Remise'
+        elif any(word in col_lower for word in ['canal', 'channel', 'mode vente']):
+            column_mapping[col] = 'Canal'
+        elif any(word in col_lower for word in ['plateforme', 'platform']):
+            column_mapping[col] = 'Plateforme'
+
+        # Colonnes opérationnelles
+        elif any(word in col_lower for word in ['heure', 'hour', 'time']) and 'attente' not in col_lower:
+            column_mapping[col] = 'Heure'
+        elif any(word in col_lower for word in ['note', 'rating', 'avis', 'satisfaction']):
+            column_mapping[col] = 'Note_client'
+        elif any(word in col_lower for word in ['commentaire', 'comment', 'remarque']):
+            column_mapping[col] = 'Commentaire'
+
+        # Colonnes analytiques
+        elif 'mois' in col_lower and col_lower == 'mois':
+            column_mapping[col] = 'Mois'
+        elif any(word in col_lower for word in ['annee', 'année', 'year']):
+            column_mapping[col] = 'Annee'
+        elif any(word in col_lower for word in ['trimestre', 'quarter']):
+            column_mapping[col] = 'Trimestre'
+        elif any(word in col_lower for word in ['semaine', 'week']) and 'jour' not in col_lower:
+            column_mapping[col] = 'Semaine'
+        elif any(word in col_lower for word in ['saison', 'season']):
+            column_mapping[col] = 'Saison'
+
+    return column_mapping
+
+
+def extract_reference(text):
+    """Ancienne lecture des textes: découpage ligne par ligne"""
+    lines = text.strip().split('\n')
+    data = []
+
+    for line in lines:
+        parts = re.split(r'[,;\t|]', line)
+        if len(parts) >= 3:
+            try:
+                date_str = parts[0].strip()
+                plat = parts[1].strip()
+                quantite = parts[2].strip()
+
+                try:
+                    quantite = int(re.sub(r'[^\d]', '', quantite))
+                except:
+                    continue
+
+                data.append({
+                    'Date': date_str,
+                    'Plat': plat,
+                    'Quantite': quantite
+                })
+            except:
+                continue
+
+    return pd.DataFrame(data) if data else None
+
+
+def make_text(nb_lignes, sep=',', seed=0):
+    """Ventes copiées d'un document: lignes Windows, quantités parfois annotées"""
+    rng = np.random.default_rng(seed)
+    plats = np.array(['Burger', 'Crème brûlée', 'Salade César', ' Pizza ', 'Tiramisu'])
+    dates = (pd.Timestamp('2025-01-01') + pd.to_timedelta(rng.integers(0, 365, nb_lignes), unit='D')).strftime('%d/%m/%Y')
+    quantites = rng.integers(1, 40, nb_lignes).astype(str).astype(object)
+    annotees = rng.random(nb_lignes) < 0.05
+    quantites[annotees] = [f"{q} portions" for q in quantites[annotees]]
+    lignes = [f"{d}{sep}{p}{sep}{q}\r" for d, p, q in zip(dates, plats[rng.integers(0, len(plats), nb_lignes)], quantites)]
+    return f"Date{sep}Plat{sep}Quantite\r\n" + '\n'.join(lignes) + '\n'
+
+
+def same_extract(text):
+    attendu, obtenu = extract_reference(text), extract_data_from_text(text)
+    if attendu is None or obtenu is None:
+        return attendu is None and obtenu is None
+    return attendu.equals(obtenu) and attendu.dtypes.equals(obtenu.dtypes)
+
+
+def load_in_memory(path):
+    """Chemin existant: lecture complète, correspondance, nettoyage puis agrégat"""
+    df = pd.read_csv(path)
+    df.columns = df.columns.str.strip()
+    df = calculate_missing_columns(df.rename(columns=map_columns_intelligently(df)))
+    df, _ = clean_and_validate_data(df)
+    return df
+
+
+if __name__ == "__main__":
+    print("🧪 Test de l'import par blocs\n")
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        print("=" * 60)
+        print("TEST 1 : Agrégat identique à l'import complet")
+        print("=" * 60)
+
+        path = os.path.join(tmp_dir, 'export.csv')
+        export = make_export(200_000)
+        export['Qte'] = export['Qte'].astype(object)
+        export.loc[::1000, 'Qte'] = 'n/a'
+        export.to_csv(path, index=False)
+
+        avertissements = []
+        daily, error, stats = stream_csv(path, chunksize=30_000, warn=avertissements.append)
+
+        reference = load_in_memory(path)
+        cles = ['Date', 'Plat', 'Categorie']
+        attendu = reference.assign(Date=reference['Date'].dt.normalize()).groupby(cles).agg(
+            Quantite=('Quantite', 'sum'), Chiffre_affaires=('Chiffre_affaires', 'sum'),
+            Prix_unitaire=('Prix_unitaire', 'mean')
+        ).reset_index()
+        obtenu = daily.sort_values(cles).reset_index(drop=True)
+
+        identique = error is None and obtenu[cles + ['Quantite']].equals(attendu[cles + ['Quantite']]) \
+            and np.allclose(obtenu['Chiffre_affaires'], attendu['Chiffre_affaires']) \
+            and np.allclose(obtenu['Prix_unitaire'], attendu['Prix_unitaire'])
+        if identique and stats['chunks'] == 7 and stats['kept'] == len(reference):
+            print(f"✅ {stats['rows']} lignes en {stats['chunks']} blocs → {len(daily)} ventes journalières, "
+                  f"identiques à l'import complet")
+        else:
+            print("❌ L'agrégat diffère de l'import complet")
+
+        if avertissements == ['⚠️ 200 lignes avec quantités invalides supprimées']:
+            print("✅ Lignes invalides comptées sur l'ensemble des blocs")
+        else:
+            print(f"❌ Avertissements inattendus: {avertissements}")
+
+        print("\n" + "=" * 60)
+        print("TEST 2 : Mémoire bornée par la taille des blocs")
+        print("=" * 60)
+
+        grand = os.path.join(tmp_dir, 'grand.csv')
+        make_export(600_000, seed=1).to_csv(grand, index=False)
+        taille = os.path.getsize(grand) / 1024 ** 2
+
+        tracemalloc.start()
+        start = time.time()
+        load_in_memory(grand)
+        duree_complet = time.time() - start
+        pic_complet = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+        tracemalloc.reset_peak()
+
+        start = time.time()
+        stream_csv(grand, chunksize=50_000)
+        duree_flux = time.time() - start
+        pic_flux = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+        tracemalloc.reset_peak()
+
+        stream_csv(path, chunksize=50_000)
+        pic_petit = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+        tracemalloc.stop()
+
+        print(f"  • Fichier de {taille:.0f} Mo: pic {pic_complet:.0f} Mo en complet ({duree_complet:.1f}s) "
+              f"→ {pic_flux:.0f} Mo par blocs ({duree_flux:.1f}s)")
+        if pic_flux < pic_complet / 3 and pic_flux < 2 * pic_petit:
+            print(f"✅ Pic mémoire indépendant de la taille du fichier ({pic_petit:.0f} Mo pour un fichier 3x plus petit)")
+        else:
+            print("❌ La mémoire croît avec le fichier")
+
+        print("\n" + "=" * 60)
+        print("TEST 3 : Encodage et colonnes manquantes")
+        print("=" * 60)
+
+        latin = io.BytesIO("Date,Plat,Quantité\n".encode('latin-1') +
+                           "".join(f"2025-03-{d:02d},Crème brûlée,{d}\n" for d in range(1, 11)).encode('latin-1'))
+        daily, error, _ = stream_csv(latin)
+        if error is None and daily['Plat'].unique().tolist() == ['Crème brûlée'] and daily['Quantite'].sum() == 55:
+            print("✅ Export latin-1 relu depuis le début")
+        else:
+            print(f"❌ Encodage mal géré ({error})")
+
+        horaire = io.BytesIO(b"Date,Heure,Plat,Quantite\n" + b"".join(
+            f"2025-03-0{j},{h}:15,Burger,2\n".encode() for j in range(1, 8) for h in range(11, 23)))
+        daily, error, _ = stream_csv(horaire)
+        if error is None and daily['Quantite'].tolist() == [24] * 7 and 'Heure' not in daily:
+            print("✅ Ventes horaires agrégées en une ligne par jour")
+        else:
+            print(f"❌ Agrégat horaire: {error or len(daily)} lignes")
+
+        daily, error, _ = stream_csv(io.BytesIO(b"Date,Prix\n2025-03-01,12\n"))
+        print(f"{'✅' if daily is None and 'Colonnes requises' in error else '❌'} Colonnes requises absentes: {error}")
+
+        print("\n" + "=" * 60)
+        print("TEST 4 : Parquet et Arrow (colonnes et période lues seulement)")
+        print("=" * 60)
+
+        if not PYARROW_AVAILABLE:
+            print("⏭️  pyarrow non installé")
+        else:
+            export = make_export(600_000, seed=1)
+            export['Date de vente'] = pd.to_datetime(export['Date de vente'])
+            parquet = os.path.join(tmp_dir, 'grand.parquet')
+            export.sort_values('Date de vente').to_parquet(parquet, index=False, row_group_size=50_000)
+            arrow = os.path.join(tmp_dir, 'grand.arrow')
+            export.to_feather(arrow)
+
+            start = time.time()
+            df_csv = load_in_memory(grand)
+            duree_csv = time.time() - start
+
+            start = time.time()
+            df_parquet, _ = clean_and_validate_data(calculate_missing_columns(read_columnar(parquet, 'grand.parquet')))
+            duree_parquet = time.time() - start
+
+            cles = ['Date', 'Plat', 'Quantite']
+            identique = df_parquet.sort_values(cles).reset_index(drop=True)[cles].equals(
+                df_csv.sort_values(cles).reset_index(drop=True)[cles])
+            print(f"  • Import et nettoyage de {len(export)} ventes: CSV {duree_csv:.2f}s → Parquet {duree_parquet:.2f}s")
+            if identique and 'Ticket' not in df_parquet.columns and duree_parquet < duree_csv / 2:
+                print("✅ Mêmes ventes qu'en CSV, colonne non reconnue (Ticket) non lue")
+            else:
+                print("❌ Lecture Parquet incorrecte")
+
+            periode = read_columnar(parquet, 'grand.parquet', start='2025-03-01', end='2025-03-31')
+            attendu = ((export['Date de vente'] >= '2025-03-01') & (export['Date de vente'] < '2025-04-01')).sum()
+            ipc = read_columnar(arrow, 'grand.arrow', start='2025-03-01', end='2025-03-31')
+            if len(periode) == attendu == len(ipc) and periode['Date'].dt.month.unique().tolist() == [3]:
+                print(f"✅ Période filtrée à la lecture: {len(periode)} ventes de mars (Parquet et Arrow)")
+            else:
+                print("❌ Filtre de période incorrect")
+
+            texte = io.BytesIO(to_parquet_bytes(export.head(1000).assign(
+                **{'Date de vente': export['Date de vente'].head(1000).dt.strftime('%Y-%m-%d %H:%M')})))
+            filtre = read_columnar(texte, 'texte.parquet', start='2025-06-01')
+            attendu = (export['Date de vente'].head(1000) >= '2025-06-01').sum()
+            print(f"{'✅' if len(filtre) == attendu else '❌'} Dates en texte filtrées après lecture ({len(filtre)} ventes)")
+
+        print("\n" + "=" * 60)
+        print("TEST 5 : Règles compilées et correspondances mémorisées")
+        print("=" * 60)
+
+        # Mots-clés de l'ancienne chaîne, combinés deux à deux
+        mots = sorted(set(re.findall(r"'([^']+)'", inspect.getsource(map_columns_reference))) | {'Mois', 'Qté'})
+        en_tetes = list(dict.fromkeys(
+            [f"{a}{sep}{b}" for a, b in itertools.product(mots, repeat=2) for sep in ('_', ' ', '-')] + mots
+        ))
+        colonnes = pd.DataFrame(columns=en_tetes)
+
+        start = time.time()
+        attendu = map_columns_reference(colonnes)
+        duree_reference = time.time() - start
+        map_column_name.cache_clear()
+        start = time.time()
+        obtenu = map_columns_intelligently(colonnes)
+        duree = time.time() - start
+        if obtenu == attendu:
+            print(f"✅ {len(en_tetes)} en-têtes: correspondances identiques ({duree_reference:.3f}s → {duree:.3f}s)")
+        else:
+            differences = [col for col in en_tetes if obtenu.get(col) != attendu.get(col)]
+            print(f"❌ {len(differences)} correspondances différentes, ex. {differences[:5]}")
+
+        en_tete = ['Date de vente', 'Produit', 'Qte', 'Ref', 'Ticket']
+        cache = MappingCache('alice', tmp_dir)
+        premier = cache.mapping(en_tete)
+        start = time.time()
+        for _ in range(1000):
+            cache.mapping(en_tete)
+        duree = (time.time() - start) / 1000
+        cache.save()
+        print(f"  • Export déjà vu: correspondance en {duree * 1e6:.0f} µs")
+
+        version = cache.version
+        cache.pin(en_tete, {'Date de vente': 'Date', 'Ref': 'Plat', 'Qte': 'Quantite'})
+        cache.save()
+        recharge = MappingCache('alice', tmp_dir)
+        export = pd.DataFrame({'Date de vente': pd.date_range('2025-03-01', periods=8), 'Produit': ['Menu'] * 8, 'Qte': [2] * 8,
+                               'Ref': ['Burger'] * 8, 'Ticket': range(8)})
+        importe = apply_column_mapping(export, recharge)
+        daily, error, _ = stream_csv(io.BytesIO(export.to_csv(index=False).encode()), mapping_cache=recharge)
+        if premier.get('Produit') == 'Plat' and recharge.is_pinned(en_tete) and recharge.version > version \
+                and importe['Plat'].unique().tolist() == daily['Plat'].unique().tolist() == ['Burger']:
+            print("✅ Correspondance épinglée relue et réutilisée (import complet et par blocs)")
+        else:
+            print("❌ Correspondance épinglée ignorée")
+
+        try:
+            recharge.pin(en_tete, {'Produit': 'Plat', 'Ref': 'Plat'})
+            print("❌ Correspondance invalide acceptée")
+        except ValueError as e:
+            print(f"✅ Correspondance invalide refusée: {e}")
+
+        recharge.unpin(en_tete)
+        print(f"{'✅' if recharge.mapping(en_tete) == premier else '❌'} Retour aux règles automatiques")
+
+        # Cache limité à deux en-têtes non épinglés: le moins récemment utilisé est retiré
+        lru = MappingCache()
+        ingestion.MAPPING_CACHE_ENTRIES, limite = 2, ingestion.MAPPING_CACHE_ENTRIES
+        try:
+            for colonnes_vues in (['Date', 'Plat', 'Qte'], ['Jour', 'Plat', 'Qte'], ['Date', 'Plat', 'Qte'],
+                                  ['Day', 'Dish', 'Qty']):
+                lru.mapping(colonnes_vues)
+        finally:
+            ingestion.MAPPING_CACHE_ENTRIES = limite
+        gardes = [entry['columns'][0] for entry in lru.state['mappings'].values()]
+        print(f"{'✅' if gardes == ['Date', 'Day'] else '❌'} En-têtes gardés (LRU): {gardes}")
+
+        # Règles modifiées: les correspondances calculées sont retirées, les épinglées gardées
+        regles = MappingCache('bob', tmp_dir)
+        regles.mapping(['Date', 'Plat', 'Qte'])
+        regles.pin(en_tete, {'Date de vente': 'Date', 'Ref': 'Plat', 'Qte': 'Quantite'})
+        regles.save()
+        ingestion.RULES_VERSION, version_regles = 'autres règles', ingestion.RULES_VERSION
+        try:
+            relu = MappingCache('bob', tmp_dir)
+        finally:
+            ingestion.RULES_VERSION = version_regles
+        gardes = [entry['columns'] for entry in relu.state['mappings'].values()]
+        if gardes == [en_tete] and relu.is_pinned(en_tete):
+            print("✅ Changement de règles: seules les correspondances épinglées sont gardées")
+        else:
+            print(f"❌ Correspondances gardées après changement de règles: {gardes}")
+
+        print("\n" + "=" * 60)
+        print("TEST 6 : Lecture vectorisée des textes (TXT, Word, PDF)")
+        print("=" * 60)
+
+        cas = [
+            "Date,Plat,Quantité\n2025-03-01, Burger ,12\n2025-03-02;Pizza;3 portions\n",
+            "01/03/2025\tCrème brûlée\t 7 \r\n02/03/2025|Café|x2|note\nligne sans séparateur\na,b\n\n",
+            "2025-03-01,Burger,aucune\n2025-03-02,Soupe,\n2025-03-03,Thé,٣ tasses\n2025-03-04,Thé,1٣\n",
+            "2025-03-01,Riz,00012\n2025-03-02,Riz,123456789012345678901234\n",
+            "2025-03-01,Riz,1 2 3\n\u00a02025-03-02\u2003,\u3000Riz\u00a0,\u20035\n",
+            "\t5,b,3\na,b,1\rc,d,2\nx,y\t", "a,b,\udcff1",
+            "", "   \n", "pas de ventes ici", "a,b,c"
+        ]
+        cas += [make_text(500, sep, seed) for seed, sep in enumerate(',;\t|')]
+        ecarts = [texte[:40] for texte in cas if not same_extract(texte)]
+        ingestion.PYARROW_AVAILABLE, avec_pyarrow = False, ingestion.PYARROW_AVAILABLE
+        try:
+            ecarts += [f"sans pyarrow: {texte[:40]}" for texte in cas if not same_extract(texte)]
+        finally:
+            ingestion.PYARROW_AVAILABLE = avec_pyarrow
+        if not ecarts:
+            print(f"✅ {len(cas)} textes: ventes et types identiques à la lecture ligne par ligne")
+        else:
+            print(f"❌ Résultats différents: {ecarts}")
+
+        # Meilleur de trois lectures de 1 million de lignes
+        texte = make_text(1_000_000, sep=';')
+        durees_reference, durees = [], []
+        for _ in range(3):
+            start = time.time()
+            attendu = extract_reference(texte)
+            durees_reference.append(time.time() - start)
+            start = time.time()
+            obtenu = extract_data_from_text(texte)
+            durees.append(time.time() - start)
+        duree_reference, duree = min(durees_reference), min(durees)
+        # Gain demandé (x10) avec pyarrow; sans pyarrow, seule l'identité des ventes est vérifiée
+        ok = attendu.equals(obtenu) and (duree_reference / duree >= 10 or not PYARROW_AVAILABLE)
+        print(f"{'✅' if ok else '❌'} {len(obtenu)} lignes: {duree_reference:.2f}s → {duree:.2f}s "
+              f"(x{duree_reference / duree:.0f}, au moins x10 attendu)")
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    print("\n" + "=" * 60)
+    print("✅ TESTS TERMINÉS")
+    print("=" * 60)
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""Test du registre des backends de prévision"""
+
+import shutil
+import tempfile
+
+import numpy as np
+
+from forecasting import build_daily_dataset, predict_sales_ml, update_model_incrementally
+from model_backends import MODEL_BACKENDS, DEFAULT_BACKENDS, backend_for_model, resolve_backends
+from model_store import ModelCache
+import model_selection
+from model_selection import rolling_origin_folds, cross_validate_backends, select_and_train
+from test_forecasting import make_sales
+
+
+if __name__ == "__main__":
+    print("🧪 Test des backends de prévision\n")
+
+    df = make_sales()
+    plat_data_agg, features, _ = build_daily_dataset(df, 'Burger')
+    X = plat_data_agg[features].to_numpy(dtype=float)
+    y = plat_data_agg['Quantite'].to_numpy(dtype=float)
+
+    print("=" * 60)
+    print("TEST 1 : Interface commune fit / predict / serialize")
+    print("=" * 60)
+
+    for name, backend in MODEL_BACKENDS.items():
+        model = backend.fit(X, y, features)
+        pred = backend.predict(model, X[-5:])
+        restored = backend.deserialize(backend.serialize(model))
+        ok = pred.shape == (5,) and np.allclose(pred, backend.predict(restored, X[-5:])) \
+            and backend_for_model(model) is backend
+        print(f"{'✅' if ok else '❌'} {name}")
+
+    print("\n" + "=" * 60)
+    print("TEST 2 : Mise à jour incrémentale portée par les backends")
+    print("=" * 60)
+
+    for name in ['RandomForest', 'GradientBoosting', 'HistGradientBoosting', 'Ridge']:
+        model = MODEL_BACKENDS[name].fit(X, y, features)
+        updated = update_model_incrementally(model, plat_data_agg, features)
+        supported = updated is not None
+        print(f"  • {name}: {'mise à jour incrémentale' if supported else 'réentraînement complet'}")
+
+    print("\n" + "=" * 60)
+    print("TEST 3 : Backends configurés par restaurant")
+    print("=" * 60)
+
+    if resolve_backends(None) == DEFAULT_BACKENDS and resolve_backends(['Ridge', 'Inconnu']) == ['Ridge']:
+        print("✅ Configuration par défaut et noms inconnus ignorés")
+    else:
+        print("❌ Résolution des backends incorrecte")
+
+    cache_dir = tempfile.mkdtemp()
+    try:
+        cache = ModelCache(cache_dir)
+        _, metrics_defaut, _ = predict_sales_ml(df, 'Burger', 7, restaurant='demo/Resto', cache=cache)
+        _, metrics_ridge, best_name = predict_sales_ml(df, 'Burger', 7, restaurant='demo/Resto', cache=cache,
+                                                       backends=['Ridge', 'HistGradientBoosting'])
+        if set(metrics_defaut) == set(DEFAULT_BACKENDS) and set(metrics_ridge) == {'Ridge', 'HistGradientBoosting'}:
+            print(f"✅ Chaque configuration a son propre modèle en cache (meilleur: {best_name})")
+        else:
+            print("❌ Les configurations partagent le même modèle")
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    print("\n" + "=" * 60)
+    print("TEST 4 : Validation croisée à origines glissantes")
+    print("=" * 60)
+
+    folds = rolling_origin_folds(100)
+    if folds == [(86, 100), (72, 86), (58, 72)]:
+        print("✅ Trois plis de 14 jours, du plus récent au plus ancien")
+    else:
+        print(f"❌ Plis inattendus: {folds}")
+
+    cv = cross_validate_backends(X, y, features, DEFAULT_BACKENDS)
+    cv_budget = cross_validate_backends(X, y, features, DEFAULT_BACKENDS, budget_s=0)
+    if all(cv[name]['folds'] == 3 for name in DEFAULT_BACKENDS) and \
+            all(cv_budget[name]['folds'] == 1 for name in DEFAULT_BACKENDS):
+        print("✅ Budget épuisé: les backends restent comparés sur le pli le plus récent")
+    else:
+        print("❌ Budget de temps non respecté")
+
+    iterations = cv['GradientBoosting']['params']['n_estimators']
+    print(f"  • GradientBoosting: {iterations} itérations retenues par arrêt anticipé (150 max)")
+
+    cache_dir = tempfile.mkdtemp()
+    try:
+        cache = ModelCache(cache_dir)
+        appels = []
+        original = model_selection.cross_validate_backends
+
+        def compte_appels(*args, **kwargs):
+            appels.append(1)
+            return original(*args, **kwargs)
+
+        model_selection.cross_validate_backends = compte_appels
+        select_and_train(plat_data_agg.iloc[:-1], features, cache=cache, restaurant='demo/Resto', plat='Burger')
+        _, best_name, _ = select_and_train(plat_data_agg, features, cache=cache, restaurant='demo/Resto', plat='Burger')
+        model_selection.cross_validate_backends = original
+
+        if len(appels) == 1:
+            print(f"✅ Configuration gagnante ({best_name}) réutilisée après l'ajout d'un jour")
+        else:
+            print("❌ La validation croisée a été relancée")
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    print("\n" + "=" * 60)
+    print("✅ TESTS TERMINÉS")
+    print("=" * 60)
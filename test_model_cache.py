@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""Test du cache persistant des modèles ML"""
+
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from model_store import ModelCache, data_fingerprint, make_model_key
+from forecasting import predict_sales_ml
+
+
+def make_sales(nb_jours=60, plats=('Burger', 'Pizza')):
+    """Génère des ventes journalières synthétiques"""
+    rng = np.random.default_rng(0)
+    dates = pd.date_range('2026-01-01', periods=nb_jours)
+    rows = []
+    for plat in plats:
+        for date in dates:
+            rows.append({'Date': date, 'Plat': plat, 'Quantite': int(rng.integers(20, 60))})
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    print("🧪 Test du cache des modèles ML\n")
+
+    cache_dir = tempfile.mkdtemp()
+
+    try:
+        print("=" * 60)
+        print("TEST 1 : Empreinte des données")
+        print("=" * 60)
+
+        df = make_sales()
+        fp1 = data_fingerprint(df)
+        fp2 = data_fingerprint(df.copy())
+        df_modifie = df.copy()
+        df_modifie.loc[0, 'Quantite'] += 1
+        fp3 = data_fingerprint(df_modifie)
+
+        if fp1 == fp2 and fp1 != fp3:
+            print("✅ Empreinte stable et sensible aux modifications")
+        else:
+            print("❌ Problème d'empreinte")
+
+        print("\n" + "=" * 60)
+        print("TEST 2 : Réutilisation du modèle entre deux appels")
+        print("=" * 60)
+
+        cache = ModelCache(cache_dir)
+
+        start = time.time()
+        pred1, metrics1, name1 = predict_sales_ml(df, 'Burger', 7, restaurant='demo/Resto', cache=cache)
+        duree_entrainement = time.time() - start
+
+        start = time.time()
+        pred2, metrics2, name2 = predict_sales_ml(df, 'Burger', 7, restaurant='demo/Resto', cache=cache)
+        duree_cache = time.time() - start
+
+        print(f"  • Avec entraînement: {duree_entrainement:.2f}s")
+        print(f"  • Depuis le cache: {duree_cache:.2f}s")
+
+        if pred1.equals(pred2) and name1 == name2:
+            print("✅ Prévisions identiques depuis le cache")
+        else:
+            print("❌ Les prévisions diffèrent")
+
+        # Un nouveau cache (nouveau processus) relit le modèle depuis le disque
+        cache_disque = ModelCache(cache_dir)
+        pred3, _, _ = predict_sales_ml(df, 'Burger', 7, restaurant='demo/Resto', cache=cache_disque)
+        # Le modèle et ses métadonnées, sa lignée (réentraînement incrémental)
+        # et la configuration gagnante de la validation croisée
+        if pred1.equals(pred3) and sorted(os.path.splitext(name)[1] for name in os.listdir(cache_dir)) == \
+                ['.joblib', '.json', '.pkl', '.pkl']:
+            print("✅ Modèle rechargé depuis le disque")
+        else:
+            print("❌ Modèle non persisté")
+
+        print("\n" + "=" * 60)
+        print("TEST 3 : Éviction LRU")
+        print("=" * 60)
+
+        petit_cache = ModelCache(os.path.join(cache_dir, 'lru'), max_entries=2)
+        for i, nom in enumerate(['a', 'b', 'c']):
+            petit_cache.put(make_model_key('demo/Resto', nom, 'fp', []), {'model': nom})
+            # Garantit des horodatages distincts
+            os.utime(petit_cache._index_path(make_model_key('demo/Resto', nom, 'fp', [])), (i, i))
+
+        petit_cache.evict()
+        if petit_cache.get(make_model_key('demo/Resto', 'a', 'fp', [])) is None and len(os.listdir(petit_cache.cache_dir)) == 4:
+            print("✅ L'entrée la moins récemment utilisée a été évincée")
+        else:
+            print("❌ Éviction incorrecte")
+
+        print("\n" + "=" * 60)
+        print("TEST 4 : Réentraînement incrémental après ajout d'un jour")
+        print("=" * 60)
+
+        cache_inc = ModelCache(os.path.join(cache_dir, 'incremental'))
+        df_long = make_sales(nb_jours=61)
+        df_court = df_long[df_long['Date'] < df_long['Date'].max()]
+
+        predict_sales_ml(df_court, 'Pizza', 7, restaurant='demo/Resto', cache=cache_inc)
+        start = time.time()
+        pred, _, _ = predict_sales_ml(df_long, 'Pizza', 7, restaurant='demo/Resto', cache=cache_inc)
+        duree = time.time() - start
+
+        modes = [entry.get('training_mode') for entry in cache_inc._memory.values() if 'training_mode' in entry]
+        if modes == ['full', 'incremental'] and pred is not None:
+            print(f"✅ Modèle complété sur les jours récents ({duree:.2f}s)")
+        else:
+            print(f"❌ Modes d'entraînement inattendus: {modes}")
+
+        print("\n" + "=" * 60)
+        print("TEST 5 : Format des modèles (mmap, métadonnées, archive)")
+        print("=" * 60)
+
+        for compress in (False, True):
+            dossier = os.path.join(cache_dir, 'archive' if compress else 'mmap')
+            predict_sales_ml(df, 'Burger', 7, restaurant='demo/Resto', cache=ModelCache(dossier, compress=compress))
+
+            relu = ModelCache(dossier, compress=compress)
+            pred, _, _ = predict_sales_ml(df, 'Burger', 7, restaurant='demo/Resto', cache=relu)
+            entry = next(entry for entry in relu._memory.values() if 'training_mode' in entry)
+            mmap = isinstance(entry['model'].value, np.memmap) if hasattr(entry['model'], 'value') else None
+            taille = sum(os.path.getsize(os.path.join(dossier, name)) for name in os.listdir(dossier)
+                         if name.endswith('.joblib'))
+
+            if pred.equals(pred1) and isinstance(entry['trained_until'], pd.Timestamp) and mmap is not compress:
+                print(f"✅ {'Archive compressée' if compress else 'Tableaux en mmap'}: prévisions identiques "
+                      f"({taille / 1024:.0f} Ko)")
+            else:
+                print(f"❌ Modèle {'compressé' if compress else 'mmap'} mal relu")
+
+        print("\n" + "=" * 60)
+        print("✅ TESTS TERMINÉS")
+        print("=" * 60)
+
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
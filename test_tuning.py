@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""Test de la recherche hors ligne des hyperparamètres"""
+
+import os
+import pickle
+import shutil
+import tempfile
+import time
+
+from forecasting import build_daily_dataset, create_features, get_or_train_model, ForecastService
+from model_backends import get_backend
+from test_forecasting import make_sales
+from tune_models import main as tune_main
+from tuning import TUNING_CANDIDATES, TUNING_FOLDS, load_tuned_params, successive_halving
+
+
+if __name__ == "__main__":
+    print("🧪 Test de la recherche d'hyperparamètres\n")
+
+    df = create_features(make_sales(nb_jours=150, plats=('Burger', 'Pizza')))
+    plat_data_agg, features, _ = build_daily_dataset(df, 'Burger')
+    X = plat_data_agg[features].to_numpy(dtype=float)
+    y = plat_data_agg['Quantite'].to_numpy(dtype=float)
+
+    print("=" * 60)
+    print("TEST 1 : Successive halving")
+    print("=" * 60)
+
+    start = time.time()
+    result = successive_halving(X, y, features, get_backend('Ridge'))
+    duree = time.time() - start
+
+    print(f"  • Meilleure configuration: {result['params'] or 'valeurs par défaut'}")
+    print(f"  • MAE {result['default_MAE']:.2f} → {result['MAE']:.2f}")
+    if result['MAE'] <= result['default_MAE'] and result['fits'] < TUNING_CANDIDATES * TUNING_FOLDS:
+        print(f"✅ {result['fits']} entraînements au lieu de {TUNING_CANDIDATES * TUNING_FOLDS} ({duree:.2f}s)")
+    else:
+        print("❌ Recherche incorrecte")
+
+    print("\n" + "=" * 60)
+    print("TEST 2 : Hyperparamètres utilisés à l'entraînement")
+    print("=" * 60)
+
+    model, best_name, _ = get_or_train_model(
+        plat_data_agg, features, 'Burger', backends=['RandomForest'],
+        tuned_params={'RandomForest': {'n_estimators': 30, 'max_depth': 4}}
+    )
+    if best_name == 'RandomForest' and model.n_estimators == 30 and model.max_depth == 4:
+        print("✅ Forêt entraînée avec les hyperparamètres du plat")
+    else:
+        print("❌ Hyperparamètres ignorés")
+
+    print("\n" + "=" * 60)
+    print("TEST 3 : Commande hors ligne puis prévisions")
+    print("=" * 60)
+
+    data_dir = tempfile.mkdtemp()
+    try:
+        restaurants = {'Chez Paul': {'name': 'Chez Paul', 'data': make_sales(nb_jours=150, plats=('Burger', 'Pizza')),
+                                     'model_backends': ['RandomForest']}}
+        with open(os.path.join(data_dir, 'demo_data.pkl'), 'wb') as f:
+            pickle.dump(restaurants, f)
+
+        code = tune_main(['--data-dir', data_dir, '--workers', '1', '--candidates', '6'])
+        tuned = load_tuned_params('demo', 'Chez Paul', data_dir)
+        print(f"  • Plats avec des hyperparamètres dédiés: {sorted(tuned)}")
+
+        service = ForecastService(df, restaurant='demo/Chez Paul', backends=['RandomForest'], tuned_params=tuned)
+        pred, _, _ = service.get('Pizza', 7)
+        if code == 0 and os.path.exists(os.path.join(data_dir, 'demo_tuning.pkl')) and pred is not None \
+                and ('tuning' in service.config) == bool(tuned):
+            print("✅ Hyperparamètres enregistrés et utilisés par les prévisions")
+        else:
+            print("❌ Hyperparamètres non enregistrés ou non utilisés")
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    print("\n" + "=" * 60)
+    print("✅ TESTS TERMINÉS")
+    print("=" * 60)
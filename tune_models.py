@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Recherche hors ligne des hyperparamètres de tous les restaurants
+Pour chaque plat, cherche les meilleurs hyperparamètres des backends configurés
+(voir tuning.py) et les enregistre dans {username}_tuning.pkl; l'application
+et le traitement par lots les utilisent ensuite à chaque entraînement
+
+Exemples:
+    python tune_models.py
+    python tune_models.py --workers 4 --users alice --candidates 20
+"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from batch_forecast import REQUIRED_COLUMNS, iter_restaurants
+from forecasting import create_features, shutdown_training_executor, training_workers
+from model_store import DATA_DIR
+from tuning import TUNING_CANDIDATES, save_tuning, tune_restaurant
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recherche les hyperparamètres de chaque plat")
+    parser.add_argument('--data-dir', default=DATA_DIR, help="Dossier des données (restaurant_data)")
+    parser.add_argument('--users', nargs='+', help="Limite la recherche à ces utilisateurs")
+    parser.add_argument('--workers', type=int, default=training_workers(),
+                        help="Processus de recherche en parallèle (1 = séquentiel)")
+    parser.add_argument('--candidates', type=int, default=TUNING_CANDIDATES,
+                        help="Configurations évaluées par backend et par plat")
+    args = parser.parse_args(argv)
+
+    print(f"🎛️  Recherche d'hyperparamètres ({args.workers} worker(s), {args.candidates} configurations)\n")
+
+    start = time.perf_counter()
+    total_dishes = 0
+    total_improved = 0
+
+    try:
+        for username, resto_name, resto in iter_restaurants(args.data_dir, args.users):
+            df = resto.get('data')
+            if df is None or not all(col in df.columns for col in REQUIRED_COLUMNS):
+                print(f"⏭️  {username}/{resto_name}: pas de données")
+                continue
+
+            resto_start = time.perf_counter()
+            backends = resto.get('model_backends')
+            dishes = tune_restaurant(create_features(df), backends=backends, n_candidates=args.candidates,
+                                     max_workers=args.workers)
+            save_tuning(username, resto_name, dishes, backends, data_dir=args.data_dir)
+
+            results = [result for backends_results in dishes.values() for result in backends_results.values()]
+            improved = [result for result in results if result['params']]
+            gains = [1 - result['MAE'] / result['default_MAE'] for result in improved if result['default_MAE'] > 0]
+            total_dishes += len(dishes)
+            total_improved += len(improved)
+
+            gain = f", MAE -{np.mean(gains) * 100:.1f}% en moyenne" if gains else ""
+            print(f"✅ {username}/{resto_name}: {len(dishes)} plats, {len(improved)}/{len(results)} "
+                  f"configurations améliorées{gain} ({time.perf_counter() - resto_start:.1f}s)")
+    finally:
+        shutdown_training_executor()
+
+    print("\n" + "=" * 60)
+    print("RÉSUMÉ")
+    print("=" * 60)
+    print(f"  • Plats analysés: {total_dishes}")
+    print(f"  • Configurations différentes des valeurs par défaut: {total_improved}")
+    print(f"  • Durée totale: {time.perf_counter() - start:.1f}s")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
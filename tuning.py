@@ -0,0 +1,186 @@
+"""
+Recherche hors ligne des hyperparamètres, plat par plat
+Successive halving sur des configurations tirées au hasard dans l'espace de
+chaque backend (ModelBackend.param_space), évaluées sur des origines
+glissantes. Les configurations gagnantes sont enregistrées à côté des données
+du restaurant ({username}_tuning.pkl) et utilisées par predict_sales_ml
+"""
+
+import os
+import pickle
+import time
+from concurrent.futures import as_completed
+
+import numpy as np
+from sklearn.metrics import mean_absolute_error
+from sklearn.model_selection import ParameterGrid, ParameterSampler
+
+from dish_panel import DishPanel
+from forecasting import build_daily_dataset, get_training_executor, inner_n_jobs, training_workers
+from model_backends import get_backend, resolve_backends
+from model_selection import rolling_origin_folds
+from model_store import DATA_DIR
+
+# Configurations évaluées par backend (dont la configuration par défaut)
+TUNING_CANDIDATES = 12
+TUNING_FOLDS = 4
+# À chaque tour, le meilleur 1/HALVING_FACTOR des configurations est évalué
+# sur HALVING_FACTOR fois plus de plis
+HALVING_FACTOR = 3
+# Gain minimal de MAE (relatif) pour remplacer la configuration par défaut
+MIN_IMPROVEMENT = 0.02
+
+
+def successive_halving(X, y, features, backend, n_candidates=TUNING_CANDIDATES, n_folds=TUNING_FOLDS,
+                       factor=HALVING_FACTOR, n_jobs=-1, seed=0):
+    """Meilleurs hyperparamètres d'un backend pour une série
+
+    Toutes les configurations sont évaluées sur le pli le plus récent, les
+    meilleures sur `factor` fois plus de plis, et ainsi de suite jusqu'à
+    tous les plis. La configuration par défaut ({}) est toujours candidate et
+    n'est remplacée que si le gagnant la bat d'au moins MIN_IMPROVEMENT sur
+    les mêmes plis.
+
+    Retourne {'params', 'MAE', 'default_MAE', 'fits'} ou None si
+    l'historique est trop court.
+    """
+    folds = rolling_origin_folds(len(X), n_folds=n_folds)
+    if not folds:
+        return None
+
+    candidates = [{}]
+    if backend.param_space:
+        n_samples = min(n_candidates - 1, len(ParameterGrid(backend.param_space)))
+        candidates += list(ParameterSampler(backend.param_space, n_samples, random_state=seed))
+
+    scores = {}
+
+    def score(i, k):
+        if (i, k) not in scores:
+            origin, test_end = folds[k]
+            model = backend.fit(X[:origin], y[:origin], features, n_jobs=n_jobs, params=candidates[i])
+            scores[(i, k)] = mean_absolute_error(y[origin:test_end], backend.predict(model, X[origin:test_end]))
+        return scores[(i, k)]
+
+    alive = list(range(len(candidates)))
+    n_used = 1
+    while True:
+        used = range(min(n_used, len(folds)))
+        mae = {i: float(np.mean([score(i, k) for k in used])) for i in alive}
+        alive.sort(key=lambda i: mae[i])
+        if len(alive) == 1 or n_used >= len(folds):
+            break
+        alive = alive[:max(1, len(alive) // factor)]
+        n_used *= factor
+
+    best = alive[0]
+    default_mae = float(np.mean([score(0, k) for k in used]))
+    if mae[best] > default_mae * (1 - MIN_IMPROVEMENT):
+        best = 0
+
+    return {
+        'params': candidates[best],
+        'MAE': default_mae if best == 0 else mae[best],
+        'default_MAE': default_mae,
+        'fits': len(scores)
+    }
+
+
+def tune_dish(plat_data_agg, features, backends, n_candidates=TUNING_CANDIDATES, n_jobs=-1, seed=0):
+    """Recherche les hyperparamètres de chaque backend pour un plat: {backend: résultat}"""
+    X = plat_data_agg[features].to_numpy(dtype=float)
+    y = plat_data_agg['Quantite'].to_numpy(dtype=float)
+
+    results = {}
+    for name in resolve_backends(backends):
+        result = successive_halving(X, y, features, get_backend(name), n_candidates=n_candidates,
+                                    n_jobs=n_jobs, seed=seed)
+        if result is not None:
+            results[name] = result
+    return results
+
+
+def tune_restaurant(df, backends=None, n_candidates=TUNING_CANDIDATES, max_workers=None, progress=None):
+    """Recherche les hyperparamètres de tous les plats d'un restaurant (après create_features)
+
+    Les plats sont répartis sur le pool de processus d'entraînement.
+    `progress(done, total, plat)` est appelé à chaque plat terminé.
+
+    Retourne {plat: {backend: résultat}} (plats à l'historique trop court exclus).
+    """
+    panel = DishPanel(df)
+    datasets = {}
+    for plat in panel.plats:
+        dataset = build_daily_dataset(df, plat, panel=panel)
+        if dataset is not None:
+            datasets[plat] = dataset[:2]
+
+    max_workers = max_workers or training_workers()
+    results = {}
+
+    if len(datasets) < 2 or max_workers < 2:
+        for done, (plat, (plat_data_agg, features)) in enumerate(datasets.items(), start=1):
+            results[plat] = tune_dish(plat_data_agg, features, backends, n_candidates)
+            if progress is not None:
+                progress(done, len(datasets), plat)
+    else:
+        executor = get_training_executor(max_workers)
+        futures = {
+            executor.submit(tune_dish, plat_data_agg, features, backends, n_candidates,
+                            inner_n_jobs(max_workers)): plat
+            for plat, (plat_data_agg, features) in datasets.items()
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            results[futures[future]] = future.result()
+            if progress is not None:
+                progress(done, len(datasets), futures[future])
+
+    return {plat: result for plat, result in results.items() if result}
+
+
+def tuning_path(username, data_dir=DATA_DIR):
+    return os.path.join(data_dir, f"{username}_tuning.pkl")
+
+
+def load_tuning(username, data_dir=DATA_DIR):
+    """Résultats de recherche de tous les restaurants d'un utilisateur"""
+    path = tuning_path(username, data_dir)
+    if not os.path.exists(path):
+        return {}
+
+    try:
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    except Exception:
+        return {}
+
+
+def save_tuning(username, restaurant, dishes, backends, data_dir=DATA_DIR):
+    """Enregistre les résultats de recherche d'un restaurant"""
+    tuning = load_tuning(username, data_dir)
+    tuning[restaurant] = {
+        'tuned_at': time.time(),
+        'backends': resolve_backends(backends),
+        'dishes': dishes
+    }
+
+    path = tuning_path(username, data_dir)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(tuning, f)
+    os.replace(tmp_path, path)
+
+
+def load_tuned_params(username, restaurant, data_dir=DATA_DIR):
+    """Hyperparamètres à utiliser par plat: {plat: {backend: hyperparamètres}}
+
+    Seuls les backends dont la configuration gagnante diffère des valeurs par
+    défaut sont retournés.
+    """
+    dishes = load_tuning(username, data_dir).get(restaurant, {}).get('dishes', {})
+    tuned = {}
+    for plat, results in dishes.items():
+        params = {name: result['params'] for name, result in results.items() if result['params']}
+        if params:
+            tuned[plat] = params
+    return tuned